@@ -0,0 +1,57 @@
+"""Size and CPU cost of compressing the app's largest bodies at each gzip level (and brotli quality).
+
+Run directly (not collected by pytest):
+
+    python Tests/bench_compression.py [iterations]
+
+Bodies: questions.json (served from a build-time copy, so only the ratio matters
+there) and a rendered dashboard page. Use the output to pick COMPRESSION_GZIP_LEVEL
+/ COMPRESSION_BROTLI_QUALITY: past level 6 the ratio barely moves while the time keeps growing.
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+BENCH_DIR = tempfile.mkdtemp(prefix='vi-bench-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(BENCH_DIR, 'bench.db')}")
+os.environ.setdefault('AVATAR_CACHE_DIR', os.path.join(BENCH_DIR, 'avatars'))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db, User, brotli, _compress_bytes  # noqa: E402
+
+
+def _dashboard_html():
+    with app.app_context():
+        user = User(name='Bench User', email='bench@example.org', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_email'] = 'bench@example.org'
+    return client.get('/dashboard').get_data()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with open(os.path.join(app.root_path, 'questions.json'), 'rb') as handle:
+        bodies = {'questions.json': handle.read(), 'dashboard.html': _dashboard_html()}
+    settings = [('gzip', level) for level in (1, 3, 6, 9)]
+    if brotli is not None:
+        settings += [('br', quality) for quality in (3, 5, 8, 11)]
+
+    print(f"{'body':<16} {'encoding':<9} {'level':>5} {'bytes':>10} {'ratio':>7} {'ms':>9}")
+    for name, data in bodies.items():
+        print(f"{name:<16} {'identity':<9} {'-':>5} {len(data):>10} {1:>7.3f} {0:>9.2f}")
+        for encoding, level in settings:
+            compressed = _compress_bytes(data, encoding, level=level)
+            number = max(1, iterations // (10 if level >= 9 else 1))
+            elapsed = timeit.timeit(lambda: _compress_bytes(data, encoding, level=level), number=number)
+            ratio = len(compressed) / len(data)
+            print(f'{name:<16} {encoding:<9} {level:>5} {len(compressed):>10} {ratio:>7.3f} {elapsed * 1000 / number:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Statement and bytes-fetched benchmark for the ORM hot paths that use column projections.
+
+Run directly (not collected by pytest):
+
+    python Tests/bench_projections.py [users]
+
+Seeds a throwaway SQLite database, then runs each hot path twice: once the way it
+used to load full entities, and once through the current app code. Every SELECT
+issued is captured and replayed to total the bytes the database hands back.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='vi-bench-'), 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ.setdefault('AVATAR_CACHE_DIR', os.path.join(os.path.dirname(DB_PATH), 'avatars'))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, func  # noqa: E402
+
+from app import (  # noqa: E402
+    app,
+    db,
+    User,
+    Profile,
+    UserMeta,
+    Result,
+    _aggregate_points_for_users,
+    _avatar_versions_for,
+    _compute_leaderboard_entries,
+    _get_excluded_user_ids,
+    _start_user_session,
+)
+
+
+def _value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return len(str(value).encode('utf-8'))
+
+
+class StatementCapture:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, _conn, _cursor, statement, parameters, _context, _executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def bytes_fetched(self):
+        total = 0
+        with self.engine.connect() as conn:
+            for statement, parameters in self.statements:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                for row in conn.exec_driver_sql(statement, parameters):
+                    total += sum(_value_size(value) for value in row)
+        return total
+
+
+def seed(user_count):
+    bio = 'Bio ' * 200
+    details = '{"questions": [%s]}' % ', '.join('{"question": "Q%d", "answer": "%s"}' % (i, 'x' * 200) for i in range(10))
+    for index in range(user_count):
+        user = User(name=f'Bench User {index}', email=f'bench{index}@example.org', password_hash='$2b$12$' + 'h' * 53)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Profile(user_id=user.id, username=f'bench{index}', bio=bio, location='Somewhere'))
+        db.session.add(UserMeta(user_id=user.id, address='1 Long Street ' * 10, profile_pic=None, dob='2000-01-01'))
+        for attempt in range(5):
+            db.session.add(Result(
+                user_id=user.id,
+                title='Quiz',
+                score=50 + attempt,
+                kind='quiz',
+                details=details,
+                timestamp=datetime.utcnow(),
+                points=10,
+                difficulty='beginner',
+                role='Aptitude',
+            ))
+    db.session.commit()
+
+
+def entity_leaderboard():
+    """The leaderboard as it was built before projections: full User/Profile/UserMeta rows."""
+    _get_excluded_user_ids()
+    score_subquery = (
+        db.session.query(Result.user_id.label('user_id'), func.avg(Result.score).label('avg_score'))
+        .group_by(Result.user_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(User, Profile, UserMeta, score_subquery.c.avg_score)
+        .join(score_subquery, score_subquery.c.user_id == User.id)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .outerjoin(UserMeta, UserMeta.user_id == User.id)
+        .all()
+    )
+    user_ids = [user.id for user, *_rest in rows]
+    _aggregate_points_for_users(user_ids)
+    _avatar_versions_for(user_ids)
+
+
+def entity_session(user):
+    UserMeta.query.filter_by(user_id=user.id).first()
+    Profile.query.filter_by(user_id=user.id).first()
+
+
+def entity_admin_users():
+    users = User.query.filter(User.is_excluded.is_(False)).order_by(User.id.desc()).all()
+    Profile.query.filter(Profile.user_id.in_([u.id for u in users])).all()
+
+
+def projected_admin_users():
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = -1
+            sess['is_admin'] = True
+        client.get('/admin/users')
+
+
+def measure(label, fn):
+    db.session.expunge_all()
+    with StatementCapture(db.engine) as capture:
+        fn()
+    db.session.rollback()
+    return label, len(capture.statements), capture.bytes_fetched()
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with app.app_context():
+        seed(user_count)
+        probe = User.query.filter_by(email='bench0@example.org').first()
+
+        def projected_session():
+            with app.test_request_context('/'):
+                _start_user_session(probe)
+
+        rows = [
+            ('leaderboard', measure('entities', entity_leaderboard), measure('projection', _compute_leaderboard_entries)),
+            ('session start', measure('entities', lambda: entity_session(probe)), measure('projection', projected_session)),
+            ('admin users', measure('entities', entity_admin_users), measure('projection', projected_admin_users)),
+        ]
+
+    print(f'{user_count} users, 5 results each ({DB_PATH})')
+    print(f"{'path':<14} {'before stmts':>12} {'before bytes':>13} {'after stmts':>12} {'after bytes':>12} {'bytes saved':>12}")
+    for path, (_l1, before_count, before_bytes), (_l2, after_count, after_bytes) in rows:
+        saved = 100.0 * (before_bytes - after_bytes) / before_bytes if before_bytes else 0.0
+        print(f'{path:<14} {before_count:>12} {before_bytes:>13} {after_count:>12} {after_bytes:>12} {saved:>11.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,110 @@
 # Unit tests for app.py
 import unittest
 from unittest.mock import patch
+from contextlib import contextmanager
 import sys
 import os
 import json
+import gzip
+import hashlib
 import time
 import string
-from datetime import datetime, timedelta
+import tempfile
+from datetime import date, datetime, timedelta
 
 from flask import session
+from sqlalchemy import and_, create_engine, event, func, or_, select, text
+from sqlalchemy.exc import OperationalError
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Keep avatar and template cache files out of the source tree
+os.environ.setdefault('AVATAR_CACHE_DIR', tempfile.mkdtemp(prefix='vi-avatars-'))
+os.environ.setdefault('TEMPLATE_CACHE_DIR', tempfile.mkdtemp(prefix='vi-templates-'))
+# Exercise the heartbeat buffer a long-lived server would use
+os.environ.setdefault('TIME_LOG_WRITE_BEHIND', '1')
 
+from services.password_hashing import HashPolicy, calibrate_policy, hash_parameters
 from app import (
     app,
+    _ensure_profile_username_index,
     user_sessions,
     db,
     User,
     UserMeta,
     Profile,
+    TimeLog,
+    TimeLogRollup,
     ProfileMedia,
     Result,
+    AUTH_TEMPLATES,
     calculate_points,
     _build_leaderboard,
+    _get_leaderboard_entry,
+    _invalidate_leaderboard_cache,
+    _leaderboard_cache_stats,
     _safe_env_int,
     _normalize_difficulty_label,
     _coerce_percentage,
     _extract_difficulty_from_details,
     _aggregate_points_for_users,
+    _result_scoring_fields,
+    _backfill_result_scoring_columns,
     _is_session_expired,
     _cleanup_sessions,
     _start_user_session,
     _get_or_create_oauth_user,
     _generate_unique_username,
+    _username_variants_query,
+    USERNAME_MAX_LENGTH,
+    USERNAME_SUFFIX_DIGITS,
+    _add_profile_with_unique_username,
     _sanitize_username,
     _find_user_by_login_identifier,
+    _login_account_query,
     _username_taken,
     _generate_temp_password,
+    _get_excluded_user_ids,
+    _is_excluded_email,
+    _flush_time_log_buffer,
+    _purge_user,
+    _collect_query_stats,
+    _avatar_cache_path,
+    _schedule_avatar_thumbnails,
+    Image,
+    _upsert_time_log_increments,
+    _increment_rows_portable,
+    _reconcile_time_log_counters,
+    _ensure_time_log_rollups,
+    AppCounter,
+    _claim_user_purge,
+    _sync_excluded_user_flags,
+    _resume_user_purges,
+    _rebuild_time_log_rollups,
+    _get_counter,
+    _precompile_templates,
+    _MemoryRateLimitBackend,
+    _RateLimitBackend,
+    _set_rate_limit_backend,
+    MailOutbox,
+    OTPVerification,
+    _SmtpMailTransport,
+    _set_mail_transport,
+    _dispatch_pending_mail,
+    _drain_mail_outbox,
+    _install_template_bytecode_cache,
+    _dashboard_bundle_stats,
+    _precompress_static_files,
+    brotli,
+    _invalidate_dashboard_bundles,
+    _add_flushed_time_to_bundles,
     SESSION_TTL_SECONDS,
 )
 import io
 import uuid
+import threading
+import smtplib
+from email.mime.text import MIMEText
 
 
 class TestFlaskApp(unittest.TestCase):
@@ -53,6 +116,10 @@ class TestFlaskApp(unittest.TestCase):
         self.app.config['TESTING'] = True
         self.client = self.app.test_client()
         user_sessions.clear()
+        # Every test client shares 127.0.0.1; start each test with full rate-limit buckets
+        _set_rate_limit_backend(_MemoryRateLimitBackend())
+        # SQLite can hand a deleted user's id to the next test's user
+        _invalidate_dashboard_bundles()
         # Ensure 'details' column exists on result table for legacy DBs
         with self.app.app_context():
             try:
@@ -412,6 +479,78 @@ class TestFlaskApp(unittest.TestCase):
         self.assertIn('date', data['results'][0])
         self.assertIn('time', data['results'][0])
 
+    def _save_quiz(self, score, total=5, difficulty='Easy'):
+        payload = {
+            'role': 'Aptitude',
+            'difficulty': difficulty,
+            'score': score,
+            'total': total,
+            'questions': [{'question': f'Q{i}'} for i in range(total)],
+            'duration_seconds': 90,
+        }
+        resp = self.client.post('/api/save_quiz_result', json=payload)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_results_cursor_pagination_and_projection(self):
+        self._create_user_and_login()
+        for score in range(5):
+            self._save_quiz(score)
+
+        first = json.loads(self.client.get('/api/results?limit=2&fields=id,score').data)
+        self.assertTrue(first['success'])
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(set(first['results'][0]), {'id', 'score'})
+        self.assertIsNotNone(first['next_cursor'])
+
+        seen = [row['id'] for row in first['results']]
+        cursor = first['next_cursor']
+        snos = []
+        while cursor:
+            page = json.loads(self.client.get(f'/api/results?limit=2&cursor={cursor}').data)
+            seen.extend(row['id'] for row in page['results'])
+            snos.extend(row['sno'] for row in page['results'])
+            self.assertNotIn('questions', page['results'][0])
+            self.assertEqual(page['results'][0]['question_count'], 5)
+            self.assertEqual(page['results'][0]['duration'], 1.5)
+            cursor = page['next_cursor']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(snos, [3, 4, 5])
+
+        with_questions = json.loads(self.client.get('/api/results?limit=1&fields=questions').data)
+        self.assertEqual(len(with_questions['results'][0]['questions']), 5)
+
+        bad = self.client.get('/api/results?cursor=not-a-cursor')
+        self.assertEqual(bad.status_code, 400)
+
+    def test_results_summary_counts_in_sql(self):
+        self._create_user_and_login()
+        self._save_quiz(4)
+        self._save_quiz(2)
+        resp = self.client.get('/api/results?summary=1')
+        data = json.loads(resp.data)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['summary']['quiz'], 2)
+        self.assertEqual(data['summary']['interview'], 0)
+        self.assertEqual(data['summary']['total'], 2)
+        self.assertEqual(data['summary']['average_score'], 60.0)
+
+    def test_result_detail_endpoint_returns_questions(self):
+        uid = self._create_user_and_login()
+        self._save_quiz(3)
+        listed = json.loads(self.client.get('/api/results').data)['results'][0]
+        resp = self.client.get(f"/api/results/{listed['id']}")
+        self.assertEqual(resp.status_code, 200)
+        detail = json.loads(resp.data)['result']
+        self.assertEqual(detail['id'], listed['id'])
+        self.assertEqual(len(detail['questions']), 5)
+        self.assertEqual(detail['details']['score'], 3)
+
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = uid + 100000
+        self.assertEqual(self.client.get(f"/api/results/{listed['id']}").status_code, 404)
+
     # ---------------- Profile tests ----------------
     def test_profile_requires_auth(self):
         r1 = self.client.get('/api/profile')
@@ -482,8 +621,889 @@ class TestFlaskApp(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['user_id'] = uid
             sess['user_email'] = unique_email
+            sess['user_checked_at'] = time.time()
         return uid
 
+    def test_time_log_heartbeats_coalesce_into_one_upsert(self):
+        uid = self._create_user_and_login()
+        with app.app_context():
+            _flush_time_log_buffer()
+        for _ in range(5):
+            resp = self.client.post('/api/time_log', json={'seconds': 15})
+            self.assertEqual(resp.status_code, 200)
+        with app.app_context():
+            self.assertIsNone(TimeLog.query.filter_by(user_id=uid).first())
+        stats = self.client.get('/api/time_stats?days=1').get_json()
+        self.assertEqual(stats['series'], [75])
+        with app.app_context():
+            self.assertEqual(_flush_time_log_buffer(), 1)
+            self.client.post('/api/time_log', json={'seconds': 5})
+            self.assertEqual(_flush_time_log_buffer(), 1)
+            rows = TimeLog.query.filter_by(user_id=uid).all()
+            self.assertEqual([r.seconds for r in rows], [80])
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+    def test_time_log_writes_directly_without_write_behind(self):
+        uid = self._create_user_and_login()
+        with patch('app.TIME_LOG_WRITE_BEHIND', False):
+            self.assertEqual(self.client.post('/api/time_log', json={'seconds': 20}).status_code, 200)
+        with app.app_context():
+            self.assertEqual([r.seconds for r in TimeLog.query.filter_by(user_id=uid)], [20])
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+    def test_time_stats_week_and_month_read_rollups(self):
+        uid = self._create_user_and_login()
+        today = date.today()
+        last_week = today - timedelta(days=7)
+        with app.app_context():
+            _rebuild_time_log_rollups()
+            rows_before = _get_counter('time_log_rows')
+            seconds_before = _get_counter('time_log_seconds')
+            _upsert_time_log_increments({(uid, today): 60, (uid, last_week): 30})
+            _upsert_time_log_increments({(uid, today): 15})
+            self.assertEqual(_get_counter('time_log_rows'), rows_before + 2)
+            self.assertEqual(_get_counter('time_log_seconds'), seconds_before + 105)
+
+        weekly = self.client.get('/api/time_stats?granularity=week&periods=2').get_json()
+        self.assertEqual(weekly['labels'][-1], (today - timedelta(days=today.weekday())).isoformat())
+        self.assertEqual(weekly['series'], [30, 75])
+
+        monthly = self.client.get('/api/time_stats?granularity=month&periods=3').get_json()
+        self.assertEqual(monthly['labels'][-1], today.replace(day=1).isoformat())
+        self.assertEqual(sum(monthly['series']), 105)
+        self.assertEqual(monthly['series'][-1], 75 + (30 if last_week.month == today.month else 0))
+
+        daily = self.client.get('/api/time_stats?days=8').get_json()
+        self.assertEqual(daily['series'][0], 30)
+        self.assertEqual(daily['series'][-1], 75)
+
+        resp = self.client.get('/api/time_stats?granularity=year')
+        self.assertEqual(resp.status_code, 400)
+
+        with app.app_context():
+            # Rebuilding from TimeLog yields the same rollups the flushes maintained
+            _rebuild_time_log_rollups()
+            self.assertEqual(_get_counter('time_log_seconds'), seconds_before + 105)
+            TimeLog.query.filter_by(user_id=uid).delete()
+            TimeLogRollup.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+            _rebuild_time_log_rollups()
+        again = self.client.get('/api/time_stats?granularity=week&periods=2').get_json()
+        self.assertEqual(again['series'], [0, 0])
+
+    def _hammer_time_log(self, uid, write, threads=8, per_thread=25):
+        day = date.today()
+        errors = []
+
+        def worker():
+            with app.app_context():
+                try:
+                    for _ in range(per_thread):
+                        write({(uid, day): 1})
+                except Exception as exc:  # pragma: no cover - surfaced below
+                    errors.append(exc)
+                finally:
+                    db.session.remove()
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        self.assertEqual(errors, [])
+        with app.app_context():
+            rows = TimeLog.query.filter_by(user_id=uid, day=day).all()
+            self.assertEqual([r.seconds for r in rows], [threads * per_thread])
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+    def test_time_log_native_upsert_is_exact_under_concurrency(self):
+        uid = self._create_user_and_login()
+        with app.app_context():
+            rows_before = _get_counter('time_log_rows')
+        self._hammer_time_log(uid, _upsert_time_log_increments)
+        with app.app_context():
+            # Only the writer that created the day row counts it, however many raced
+            self.assertEqual(_get_counter('time_log_rows'), rows_before + 1)
+            _reconcile_time_log_counters()
+
+    def test_time_log_flush_statement_count_does_not_grow_with_rows(self):
+        uid = self._create_user_and_login()
+        today = date.today()
+
+        def flush_statements(days):
+            with app.app_context():
+                _get_excluded_user_ids()
+                with _collect_query_stats() as stats:
+                    _upsert_time_log_increments({(uid, today - timedelta(days=n)): 5 for n in range(days)})
+                return stats.count
+
+        with app.app_context():
+            rows_before = _get_counter('time_log_rows')
+        flush_statements(1)
+        # Each flush mixes existing and new rows: one insert and one executemany update
+        few = flush_statements(2)
+        many = flush_statements(12)
+        self.assertEqual(few, many)
+        with app.app_context():
+            self.assertEqual(_get_counter('time_log_rows'), rows_before + 12)
+            self.assertEqual(TimeLog.query.filter_by(user_id=uid, day=today).one().seconds, 15)
+            TimeLog.query.filter_by(user_id=uid).delete()
+            TimeLogRollup.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+            _reconcile_time_log_counters()
+
+    def test_time_log_rollup_build_runs_once_across_workers(self):
+        with app.app_context():
+            AppCounter.query.filter_by(name='time_log_rows').delete()
+            db.session.commit()
+            with patch('app._rebuild_time_log_rollups', side_effect=RuntimeError('boom')):
+                with self.assertRaises(RuntimeError):
+                    _ensure_time_log_rollups()
+            # The failed build gave its claim back
+            self.assertIsNone(db.session.get(AppCounter, 'time_log_rows'))
+            self.assertTrue(_ensure_time_log_rollups())
+            # A worker starting later finds the claim taken and leaves the build alone
+            with patch('app._rebuild_time_log_rollups') as rebuild:
+                self.assertFalse(_ensure_time_log_rollups())
+            rebuild.assert_not_called()
+
+    def test_reconcile_time_log_counters_follows_exclusion_changes(self):
+        uid = self._create_user_and_login()
+        with app.app_context():
+            _reconcile_time_log_counters()
+            rows_before = _get_counter('time_log_rows')
+            seconds_before = _get_counter('time_log_seconds')
+            _upsert_time_log_increments({(uid, date.today()): 40})
+            self.assertEqual(_get_counter('time_log_rows'), rows_before + 1)
+
+            # A settings change excludes the user without touching the counters
+            db.session.execute(User.__table__.update().where(User.id == uid).values(is_excluded=True))
+            db.session.commit()
+            _reconcile_time_log_counters()
+            self.assertEqual(_get_counter('time_log_rows'), rows_before)
+            self.assertEqual(_get_counter('time_log_seconds'), seconds_before)
+
+            db.session.execute(User.__table__.update().where(User.id == uid).values(is_excluded=False))
+            db.session.commit()
+            _reconcile_time_log_counters()
+            self.assertEqual(_get_counter('time_log_seconds'), seconds_before + 40)
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+            _reconcile_time_log_counters()
+
+    def test_time_log_fallback_increment_is_exact_under_concurrency(self):
+        uid = self._create_user_and_login()
+
+        def fallback(increments):
+            _increment_rows_portable(
+                TimeLog,
+                ['user_id', 'day'],
+                [{'user_id': u, 'day': d, 'seconds': n} for (u, d), n in increments.items()],
+            )
+            db.session.commit()
+
+        self._hammer_time_log(uid, fallback)
+
+    def _capture_statements(self, fn):
+        statements = []
+
+        def capture(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        return statements
+
+    def test_hot_paths_project_only_needed_columns(self):
+        uid = self._create_user_and_login()
+        self._save_quiz(4)
+        with self.client.session_transaction() as sess:
+            sess['is_admin'] = True
+
+        def run():
+            with app.app_context():
+                _invalidate_leaderboard_cache()
+                self.assertIsNotNone(_get_leaderboard_entry(uid))
+                user = db.session.get(User, uid)
+                with app.test_request_context('/'):
+                    _start_user_session(user)
+            self.assertEqual(self.client.get('/admin/users').status_code, 200)
+            self.assertEqual(self.client.get('/admin/').status_code, 200)
+
+        statements = [sql for sql in self._capture_statements(run) if sql.lstrip().upper().startswith('SELECT')]
+        self.assertTrue(statements)
+        # The legacy-points fallback reads details only for rows that predate the points column
+        current = [sql for sql in statements if 'points IS NULL' not in sql]
+        for heavy in ('result.details', 'profile.bio', 'user_meta.address, user_meta.course'):
+            self.assertFalse([sql for sql in current if heavy in sql], heavy)
+        # Only the session's own user lookup may read the password hash
+        self.assertLessEqual(len([sql for sql in statements if 'password_hash' in sql]), 1)
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """Fail when the wrapped block (requests included) runs more than `budget` SQL statements."""
+        with _collect_query_stats() as stats:
+            yield stats
+        if stats.count > budget:
+            listing = '\n'.join(f"{n}x {' '.join(sql.split())[:160]}" for sql, n in stats.statements.most_common())
+            self.fail(f'{stats.count} queries exceeds budget of {budget}:\n{listing}')
+
+    def test_endpoint_query_budgets(self):
+        self._create_user_and_login()
+        self._save_quiz(3)
+        with self.client.session_transaction() as sess:
+            sess['is_admin'] = True
+        with app.app_context():
+            _invalidate_leaderboard_cache()
+        budgets = [
+            ('/api/results', 2),
+            ('/api/results?summary=1', 2),
+            ('/api/leaderboard/me', 5),
+            ('/api/time_stats?granularity=week', 2),
+            ('/api/profile', 3),
+            ('/dashboard', 8),
+            ('/api/dashboard_bootstrap?days=7', 1),
+            ('/admin/users', 2),
+            ('/admin/', 3),
+        ]
+        for url, budget in budgets:
+            with self.subTest(url=url), self.assertMaxQueries(budget):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertMaxQueries(1):
+            self.client.post('/api/time_log', json={'seconds': 15})
+        with self.assertMaxQueries(2):
+            self.client.post('/api/save_quiz_result', json={'role': 'Aptitude', 'difficulty': 'Easy', 'score': 1, 'total': 2})
+
+    def test_dashboard_shows_rank_without_a_badge(self):
+        uid = self._create_user_and_login()
+        # Outside the top three, so there is no badge asset to hang the rank on
+        entry = {'user_id': uid, 'rank': 57, 'badge_asset': None, 'badge_label': None}
+        rank = {'rank': 57, 'total': 80, 'percentile': 29.1, 'entry': None, 'above': [], 'below': []}
+        with patch('app._get_leaderboard_entry', return_value=entry), patch('app._get_leaderboard_rank', return_value=rank):
+            html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertIn('id="viewRank"', html)
+        line = next(line for line in html.splitlines() if 'const dashboardLeaderboardRank = ' in line)
+        embedded = json.loads(line.split(' = ', 1)[1].rstrip(';'))
+        self.assertEqual(embedded, {'rank': 57, 'total': 80, 'percentile': 29.1})
+
+    def _dashboard_bootstrap_json(self, html):
+        prefix = 'const dashboardBootstrap = '
+        line = next(line for line in html.splitlines() if prefix in line)
+        return json.loads(line.split(prefix, 1)[1].rsplit(' || {};', 1)[0])
+
+    def test_dashboard_embeds_bootstrap_from_cached_bundle(self):
+        uid = self._create_user_and_login()
+        self._save_quiz(4)
+        self.client.post('/api/time_log', json={'seconds': 15})
+
+        html = self.client.get('/dashboard').get_data(as_text=True)
+        bootstrap = self._dashboard_bootstrap_json(html)
+        # Each section matches what its JSON endpoint returns
+        self.assertEqual(bootstrap['profile'], self.client.get('/api/profile').get_json())
+        api_results = self.client.get('/api/results?limit=200').get_json()
+        self.assertEqual(bootstrap['results']['results'], api_results['results'])
+        self.assertEqual(bootstrap['results']['summary']['quiz'], 1)
+        self.assertEqual(bootstrap['time_stats'], self.client.get('/api/time_stats?days=30').get_json())
+        self.assertEqual(bootstrap['time_stats']['series'][-1], 15)
+
+        # A second render reads the bundle; buffered heartbeats still show up
+        self.client.post('/api/time_log', json={'seconds': 15})
+        before = _dashboard_bundle_stats()
+        with self.assertMaxQueries(0):
+            html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertEqual(_dashboard_bundle_stats()['hits'], before['hits'] + 1)
+        self.assertEqual(self._dashboard_bootstrap_json(html)['time_stats']['series'][-1], 30)
+
+        # Flushing heartbeats keeps the bundle and moves their seconds into its stored series
+        with app.app_context():
+            _flush_time_log_buffer()
+        before = _dashboard_bundle_stats()
+        with self.assertMaxQueries(0):
+            html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertEqual(_dashboard_bundle_stats()['hits'], before['hits'] + 1)
+        self.assertEqual(self._dashboard_bootstrap_json(html)['time_stats']['series'][-1], 30)
+
+        # Committed writes to the user's rows drop the bundle
+        self._save_quiz(2)
+        self.client.post('/api/profile', json={'name': 'Renamed', 'bio': 'Fresh'})
+        bootstrap = self._dashboard_bootstrap_json(self.client.get('/dashboard').get_data(as_text=True))
+        self.assertEqual(len(bootstrap['results']['results']), 2)
+        self.assertEqual(bootstrap['profile']['profile']['name'], 'Renamed')
+        self.assertEqual(bootstrap['profile']['profile']['bio'], 'Fresh')
+        with app.app_context():
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+        with patch('app.DASHBOARD_BOOTSTRAP', False):
+            html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertIsNone(self._dashboard_bootstrap_json(html))
+
+    def test_bundle_built_during_flush_does_not_count_seconds_twice(self):
+        uid = self._create_user_and_login()
+        self.client.post('/api/time_log', json={'seconds': 15})
+
+        def rebuild_then_add(increments, generation):
+            # The bundle expires and is rebuilt after the flush committed, before its seconds are moved
+            _invalidate_dashboard_bundles([uid])
+            self.client.get('/dashboard')
+            _add_flushed_time_to_bundles(increments, generation)
+
+        with app.app_context():
+            with patch('app._add_flushed_time_to_bundles', side_effect=rebuild_then_add):
+                _flush_time_log_buffer()
+        html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertEqual(self._dashboard_bootstrap_json(html)['time_stats']['series'][-1], 15)
+        with app.app_context():
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+    def test_dashboard_bootstrap_api_skips_unchanged_sections(self):
+        self.assertEqual(self.client.get('/api/dashboard_bootstrap').status_code, 401)
+        uid = self._create_user_and_login()
+        self._save_quiz(3)
+
+        with self.assertMaxQueries(4):
+            data = self.client.get('/api/dashboard_bootstrap').get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(set(data['sections']), {'profile', 'results', 'time_stats'})
+        self.assertEqual(data['unchanged'], [])
+        self.assertEqual(data['sections']['profile'], self.client.get('/api/profile').get_json())
+        self.assertEqual(data['sections']['time_stats'], self.client.get('/api/time_stats?days=30').get_json())
+        etags = data['etags']
+
+        # The page embeds the same ETags, so its first refresh can skip everything
+        html = self.client.get('/dashboard').get_data(as_text=True)
+        self.assertIn(json.dumps(etags['results']), html)
+
+        known = ', '.join(f'"{tag}"' for tag in etags.values())
+        with self.assertMaxQueries(0):
+            again = self.client.get('/api/dashboard_bootstrap', headers={'If-None-Match': known}).get_json()
+        self.assertEqual(again['sections'], {})
+        self.assertEqual(sorted(again['unchanged']), ['profile', 'results', 'time_stats'])
+
+        # Only the sections whose content moved come back
+        self._save_quiz(5)
+        self.client.post('/api/time_log', json={'seconds': 15})
+        changed = self.client.get('/api/dashboard_bootstrap', headers={'If-None-Match': known}).get_json()
+        self.assertEqual(set(changed['sections']), {'results', 'time_stats'})
+        self.assertEqual(changed['unchanged'], ['profile'])
+        self.assertEqual(len(changed['sections']['results']['results']), 2)
+        self.assertEqual(changed['sections']['time_stats']['series'][-1], 15)
+        self.assertNotEqual(changed['etags']['results'], etags['results'])
+
+        week = self.client.get('/api/dashboard_bootstrap?days=7').get_json()
+        self.assertEqual(len(week['sections']['time_stats']['series']), 7)
+        self.assertNotEqual(week['etags']['time_stats'], changed['etags']['time_stats'])
+        with app.app_context():
+            _flush_time_log_buffer()
+            TimeLog.query.filter_by(user_id=uid).delete()
+            db.session.commit()
+
+    def test_query_stats_header_and_metrics(self):
+        self._create_user_and_login()
+        with patch('app.QUERY_STATS_HEADER', True):
+            resp = self.client.get('/api/results')
+        self.assertEqual(resp.headers['X-DB-Query-Count'], '1')
+        self.assertIn('db;dur=', resp.headers['Server-Timing'])
+        self.assertNotIn('X-DB-Query-Count', self.client.get('/api/results').headers)
+
+        with self.client.session_transaction() as sess:
+            sess['is_admin'] = True
+        metrics = self.client.get('/admin/metrics/queries').get_json()['endpoints']
+        self.assertGreaterEqual(metrics['api_results']['requests'], 2)
+        self.assertEqual(metrics['api_results']['max_queries'], 1)
+
+        # Unknown paths are pooled rather than keyed one by one
+        for index in range(3):
+            self.assertEqual(self.client.get(f'/no-such-page-{index}').status_code, 404)
+        metrics = self.client.get('/admin/metrics/queries').get_json()['endpoints']
+        self.assertGreaterEqual(metrics['<unmatched>']['requests'], 3)
+        self.assertFalse(any(name.startswith('/no-such-page') for name in metrics))
+
+    def test_query_stats_flags_repeated_statements(self):
+        uid = self._create_user_and_login()
+        with app.app_context():
+            with _collect_query_stats() as stats:
+                for _ in range(6):
+                    db.session.query(User.name).filter(User.id == uid).scalar()
+                db.session.query(func.count(User.id)).scalar()
+        self.assertEqual(stats.count, 7)
+        self.assertEqual(list(stats.repeated(threshold=5).values()), [6])
+
+    def test_query_stats_failed_statement_leaves_no_timing_state(self):
+        with app.app_context():
+            conn = db.session.connection()
+            info_before = dict(conn.info)
+            with _collect_query_stats() as stats:
+                with self.assertRaises(OperationalError):
+                    with db.session.begin_nested():
+                        db.session.execute(text('SELECT * FROM no_such_table'))
+                time.sleep(0.2)
+                db.session.query(func.count(User.id)).scalar()
+            self.assertEqual(dict(conn.info), info_before)
+            db.session.rollback()
+        # Only the statement that completed is timed, and from its own start
+        self.assertFalse(any('no_such_table' in sql for sql in stats.statements))
+        self.assertLess(stats.seconds, 0.2)
+
+    class _RecordingTransport:
+        configured = True
+        sender = 'tests@example.org'
+
+        def __init__(self, fail_with=None):
+            self.sent = []
+            self.fail_with = fail_with
+            self.delivered = threading.Event()
+
+        def send(self, recipient, message):
+            if self.fail_with is not None:
+                raise self.fail_with
+            self.sent.append((recipient, message['Subject'], message.get_payload()))
+            self.delivered.set()
+
+        def close(self):
+            pass
+
+    @contextmanager
+    def _mail_transport(self, transport):
+        previous = _set_mail_transport(transport)
+        try:
+            yield transport
+        finally:
+            _set_mail_transport(previous)
+            with app.app_context():
+                MailOutbox.query.delete()
+                db.session.commit()
+
+    def _create_password_user(self, password_hash):
+        with app.app_context():
+            email = f"hash_{uuid.uuid4().hex[:8]}@example.com"
+            user = User(name='Hash User', email=email, password_hash=password_hash)
+            db.session.add(user)
+            db.session.commit()
+            return user.id, email
+
+    def test_login_rehashes_stale_password_hashes(self):
+        policy = HashPolicy('scrypt', 14)
+        legacy_hashes = [HashPolicy('pbkdf2', 200).hash('secret123'), HashPolicy('bcrypt', 10).hash('secret123')]
+        with patch('app._PASSWORD_POLICY', policy):
+            for legacy in legacy_hashes:
+                uid, email = self._create_password_user(legacy)
+                with self.subTest(legacy=legacy[:6]):
+                    resp = self.client.post('/login', data={'email': email, 'password': 'secret123'})
+                    self.assertEqual(resp.status_code, 302)
+                    with app.app_context():
+                        stored = db.session.get(User, uid).password_hash
+                    self.assertEqual(hash_parameters(stored), ('scrypt', 14))
+                    self.client.get('/logout')
+
+            # Current hashes are left alone on later logins
+            resp = self.client.post('/login', data={'email': email, 'password': 'secret123'})
+            self.assertEqual(resp.status_code, 302)
+            with app.app_context():
+                self.assertEqual(db.session.get(User, uid).password_hash, stored)
+
+    def test_login_returns_503_when_hashing_pool_is_saturated(self):
+        _uid, email = self._create_password_user(HashPolicy('scrypt', 14).hash('secret123'))
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with patch('app._PASSWORD_HASH_SLOTS', slots), patch('app.PASSWORD_HASH_WAIT_SECONDS', 0):
+            resp = self.client.post('/login', data={'email': email, 'password': 'secret123'})
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers['Retry-After'], '5')
+        with self.client.session_transaction() as sess:
+            self.assertNotIn('user_id', sess)
+
+    def test_login_rate_limit_rejects_before_db_or_hash(self):
+        form = {'email': 'nobody@example.com', 'password': 'wrong-password'}
+        for _ in range(5):
+            self.assertEqual(self.client.post('/login', data=form).status_code, 200)
+        with patch('app._verify_password') as verify, self.assertMaxQueries(0):
+            resp = self.client.post('/login', data=form)
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreaterEqual(int(resp.headers['Retry-After']), 1)
+        self.assertIn(b'Too Many Attempts', resp.data)
+        verify.assert_not_called()
+
+        # Other accounts from the same address still get through until the IP bucket is spent
+        _set_rate_limit_backend(_MemoryRateLimitBackend())
+        with patch('app.RATE_LIMIT_IP_BURST', 3):
+            statuses = [
+                self.client.post('/login', data={'email': f'spray{n}@example.com', 'password': 'x'}).status_code
+                for n in range(4)
+            ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_successful_login_clears_identifier_bucket(self):
+        _uid, email = self._create_password_user(HashPolicy('scrypt', 14).hash('secret123'))
+        for _ in range(4):
+            self.client.post('/login', data={'email': email, 'password': 'nope'})
+        self.assertEqual(self.client.post('/login', data={'email': email, 'password': 'secret123'}).status_code, 302)
+        self.client.get('/logout')
+        for _ in range(5):
+            self.assertEqual(self.client.post('/login', data={'email': email, 'password': 'nope'}).status_code, 200)
+
+    def test_verify_otp_rate_limited_per_email(self):
+        form = {'email': 'otp-limit@example.com', 'otp': '000000'}
+        for _ in range(5):
+            self.assertEqual(self.client.post('/verify-otp', data=form).status_code, 200)
+        with self.assertMaxQueries(0):
+            resp = self.client.post('/verify-otp', data=form)
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn('Retry-After', resp.headers)
+
+    def test_login_resolves_identifier_and_session_in_one_query(self):
+        policy = HashPolicy('scrypt', 14)
+        uid, email = self._create_password_user(policy.hash('secret123'))
+        username = f"login{uid}"
+        with app.app_context():
+            db.session.add(Profile(user_id=uid, username=username, location='Pune'))
+            db.session.add(UserMeta(user_id=uid, profile_pic='media/profile/1', dob='2001-02-03'))
+            db.session.add(ProfileMedia(user_id=uid, content_type='image/png', data=b'x', content_hash='ab' * 32))
+            # Someone whose username collides with the first user's email must not win the email lookup
+            decoy = User(name='Decoy', email=f"decoy{uid}@example.com", password_hash='x')
+            db.session.add(decoy)
+            db.session.flush()
+            db.session.add(Profile(user_id=decoy.id, username=_sanitize_username(email)))
+            db.session.commit()
+            self.assertEqual(_find_user_by_login_identifier(email).id, uid)
+
+        with patch('app._PASSWORD_POLICY', policy), self.assertMaxQueries(1):
+            resp = self.client.post('/login', data={'email': username.upper(), 'password': 'secret123'})
+        self.assertEqual(resp.status_code, 302)
+        with self.client.session_transaction() as sess:
+            self.assertEqual(sess['user_id'], uid)
+            self.assertEqual(sess['user_location'], 'Pune')
+            self.assertEqual(sess['user_dob'], '2001-02-03')
+            self.assertEqual(sess['avatar_url'], f"/media/profile/{uid}?v={'ab' * 8}&size=256")
+
+    def test_signup_queues_otp_mail_without_sending_inline(self):
+        email = f"outbox_{uuid.uuid4().hex[:8]}@example.com"
+        with self._mail_transport(self._RecordingTransport()) as transport, patch('app._wake_mail_dispatcher') as wake:
+            resp = self.client.post('/signup', data={'name': 'Outbox', 'email': email, 'password': 'secret123'})
+            self.assertEqual(resp.status_code, 302)
+            self.assertEqual(transport.sent, [])
+            wake.assert_called_once()
+            with app.app_context():
+                entry = MailOutbox.query.filter_by(recipient=email).one()
+                self.assertEqual(entry.status, 'pending')
+                self.assertIsNotNone(entry.expires_at)
+                self.assertEqual(_dispatch_pending_mail(), 1)
+                self.assertEqual(MailOutbox.query.filter_by(recipient=email).count(), 0)
+                otp = OTPVerification.query.filter_by(email=email).one().otp
+                OTPVerification.query.filter_by(email=email).delete()
+                db.session.commit()
+        self.assertEqual(len(transport.sent), 1)
+        self.assertIn(otp, transport.sent[0][2])
+
+    def test_mail_dispatch_retries_then_gives_up(self):
+        transport = self._RecordingTransport(fail_with=OSError('connection refused'))
+        with self._mail_transport(transport), app.app_context():
+            db.session.add(MailOutbox(recipient='retry@example.com', subject='S', body='secret'))
+            db.session.add(MailOutbox(recipient='late@example.com', subject='S', body='otp',
+                                      expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.session.commit()
+            self.assertEqual(_dispatch_pending_mail(), 2)
+
+            retry = MailOutbox.query.filter_by(recipient='retry@example.com').one()
+            self.assertEqual((retry.status, retry.attempts), ('pending', 1))
+            self.assertGreater(retry.next_attempt_at, datetime.utcnow())
+            self.assertIn('connection refused', retry.last_error)
+            late = MailOutbox.query.filter_by(recipient='late@example.com').one()
+            self.assertEqual((late.status, late.body), ('failed', ''))
+
+            # Nothing is due until the backoff passes
+            self.assertEqual(_dispatch_pending_mail(), 0)
+            retry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            with patch('app.MAIL_MAX_ATTEMPTS', 2):
+                self.assertEqual(_dispatch_pending_mail(), 1)
+            db.session.refresh(retry)
+            self.assertEqual((retry.status, retry.attempts, retry.body), ('failed', 2, ''))
+
+    def test_forgot_password_mail_delivered_by_background_dispatcher(self):
+        self._create_user_and_login()
+        with self.client.session_transaction() as sess:
+            email = sess['user_email']
+        with self._mail_transport(self._RecordingTransport()) as transport, patch('app.MAIL_DISPATCH_ASYNC', True):
+            resp = self.client.post('/forgot-password', data={'email': email})
+            self.assertEqual(resp.status_code, 302)
+            self.assertTrue(transport.delivered.wait(5))
+            with app.app_context():
+                deadline = time.monotonic() + 5
+                while MailOutbox.query.filter_by(recipient=email).count() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+        recipient, subject, body = transport.sent[0]
+        self.assertEqual(recipient, email)
+        temp_password = body.split('temporary password is: ')[1].split()[0]
+        with app.app_context():
+            self.assertTrue(User.query.filter_by(email=email).one().check_password(temp_password))
+
+    def test_forgot_password_keeps_old_password_until_delivery(self):
+        uid = self._create_user_and_login()
+        with self.client.session_transaction() as sess:
+            email = sess['user_email']
+        with app.app_context():
+            original_hash = db.session.get(User, uid).password_hash
+        transport = self._RecordingTransport(fail_with=OSError('connection refused'))
+        with self._mail_transport(transport), patch('app._wake_mail_dispatcher'):
+            for _ in range(2):
+                self.assertEqual(self.client.post('/forgot-password', data={'email': email}).status_code, 302)
+            with app.app_context():
+                # The second reset supersedes the first; neither has touched the stored hash yet
+                older, entry = MailOutbox.query.filter_by(recipient=email).order_by(MailOutbox.id).all()
+                self.assertEqual((older.status, older.last_error), ('failed', 'superseded by a newer message'))
+                self.assertEqual((entry.status, entry.template, entry.user_id), ('pending', 'password_reset', uid))
+                # No temporary password is stored before it is sent
+                self.assertEqual(entry.body, '')
+                self.assertGreater(entry.expires_at, datetime.utcnow())
+                self.assertEqual(db.session.get(User, uid).password_hash, original_hash)
+
+                with patch('app.MAIL_MAX_ATTEMPTS', 1):
+                    self.assertEqual(_dispatch_pending_mail(), 1)
+                db.session.refresh(entry)
+                self.assertEqual((entry.status, entry.body), ('failed', ''))
+                self.assertEqual(db.session.get(User, uid).password_hash, original_hash)
+
+    def test_superseded_reset_in_flight_does_not_change_password(self):
+        uid = self._create_user_and_login()
+        with self.client.session_transaction() as sess:
+            email = sess['user_email']
+        with app.app_context():
+            original_hash = db.session.get(User, uid).password_hash
+        test = self
+
+        class NewerResetDuringSend(self._RecordingTransport):
+            def send(self, recipient, message):
+                if not self.sent:
+                    # The user asks again while the first mail is on the wire
+                    test.assertEqual(test.client.post('/forgot-password', data={'email': email}).status_code, 302)
+                super().send(recipient, message)
+
+        transport = NewerResetDuringSend()
+        with self._mail_transport(transport), patch('app._wake_mail_dispatcher'):
+            self.client.post('/forgot-password', data={'email': email})
+            with app.app_context():
+                self.assertEqual(_dispatch_pending_mail(), 1)
+                self.assertEqual(db.session.get(User, uid).password_hash, original_hash)
+                self.assertEqual(_dispatch_pending_mail(), 1)
+                db.session.expire_all()
+                newest = transport.sent[-1][2].split('temporary password is: ')[1].split()[0]
+                self.assertTrue(db.session.get(User, uid).check_password(newest))
+                self.assertEqual(MailOutbox.query.filter_by(recipient=email, status='pending').count(), 0)
+
+    def test_failed_mail_rows_are_pruned_after_retention(self):
+        with self._mail_transport(self._RecordingTransport()), app.app_context():
+            db.session.add(MailOutbox(recipient='old@example.com', subject='S', body='', status='failed',
+                                      created_at=datetime.utcnow() - timedelta(days=30)))
+            db.session.add(MailOutbox(recipient='new@example.com', subject='S', body='', status='failed'))
+            db.session.commit()
+            _drain_mail_outbox()
+            self.assertEqual([row.recipient for row in MailOutbox.query.all()], ['new@example.com'])
+
+    def test_smtp_transport_reuses_one_authenticated_connection(self):
+        transport = _SmtpMailTransport('smtp.test', 587, username='bot@example.org', password='pw')
+        message = MIMEText('hello')
+        with patch('app.smtplib.SMTP') as smtp_cls:
+            server = smtp_cls.return_value
+            for _ in range(3):
+                transport.send('someone@example.org', message)
+            self.assertEqual(smtp_cls.call_count, 1)
+            server.login.assert_called_once_with('bot@example.org', 'pw')
+            self.assertEqual(server.sendmail.call_count, 3)
+
+            # A dropped connection is re-established once, transparently
+            server.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), None]
+            transport.send('someone@example.org', message)
+            self.assertEqual(smtp_cls.call_count, 2)
+            transport.close()
+            server.quit.assert_called()
+        self.assertFalse(_SmtpMailTransport('localhost', 1025).configured)
+        self.assertTrue(_SmtpMailTransport('localhost', 1025, starttls=False).configured)
+
+    def _seed_user_rows(self, uid, results=3, days=4):
+        with app.app_context():
+            for index in range(results):
+                db.session.add(Result(user_id=uid, title='Quiz', score=50, kind='quiz', points=5))
+            for offset in range(days):
+                db.session.add(TimeLog(user_id=uid, day=date.today() - timedelta(days=offset), seconds=30))
+            db.session.add(Profile(user_id=uid, username=f'purge{uid}', location='Here'))
+            db.session.add(UserMeta(user_id=uid, dob='2000-01-01'))
+            db.session.add(ProfileMedia(user_id=uid, content_type='image/png', data=b'x'))
+            db.session.commit()
+
+    def _user_rows_left(self, uid):
+        with app.app_context():
+            return {
+                model.__name__: model.query.filter(model.user_id == uid).count()
+                for model in (Result, TimeLog, TimeLogRollup, Profile, UserMeta, ProfileMedia)
+            }
+
+    def _login_as_admin(self):
+        with app.app_context():
+            admin = User(name='Admin', email=f"admin_{uuid.uuid4().hex[:8]}@example.com", password_hash='x', is_admin=True)
+            db.session.add(admin)
+            db.session.commit()
+            admin_id = admin.id
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = admin_id
+            sess['is_admin'] = True
+            sess['user_checked_at'] = time.time()
+        return admin_id
+
+    def test_admin_delete_user_uses_set_based_deletes(self):
+        uid = self._create_user_and_login()
+        self._seed_user_rows(uid, results=20, days=30)
+        self._login_as_admin()
+        with self.assertMaxQueries(14):
+            resp = self.client.post(f'/admin/users/{uid}/delete')
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(set(self._user_rows_left(uid).values()), {0})
+        with app.app_context():
+            self.assertIsNone(db.session.get(User, uid))
+
+    def test_admin_delete_user_async_tombstones_then_purges(self):
+        uid = self._create_user_and_login()
+        self._seed_user_rows(uid)
+        with app.app_context():
+            email = db.session.get(User, uid).email
+        self._login_as_admin()
+        with patch('app._schedule_user_purge') as schedule:
+            resp = self.client.post(f'/admin/users/{uid}/delete', data={'mode': 'async'})
+        self.assertEqual(resp.status_code, 302)
+        schedule.assert_called_once_with(uid)
+        with app.app_context():
+            user = db.session.get(User, uid)
+            self.assertIsNotNone(user.deleted_at)
+            self.assertIsNone(_find_user_by_login_identifier(email))
+            self.assertIsNone(_get_leaderboard_entry(uid))
+        self.assertNotIn(email, self.client.get('/admin/users').get_data(as_text=True))
+        self.assertGreater(self._user_rows_left(uid)['Result'], 0)
+
+        with patch('app.USER_PURGE_BATCH_SIZE', 2):
+            self.assertTrue(_purge_user(uid))
+        self.assertEqual(set(self._user_rows_left(uid).values()), {0})
+        with app.app_context():
+            self.assertIsNone(db.session.get(User, uid))
+
+    def test_sync_excluded_flags_matches_demo_emails_case_insensitively(self):
+        email = f"Demo_{uuid.uuid4().hex[:8]}@Example.COM"
+        with app.app_context():
+            # Legacy rows may keep mixed case; insert below the ORM hook that sets the flag
+            db.session.execute(User.__table__.insert().values(
+                name='Demo', email=email, password_hash='x', is_admin=False, is_excluded=False,
+            ))
+            db.session.commit()
+            try:
+                with patch('app.DEMO_USER_EMAILS', {email.lower()}):
+                    _sync_excluded_user_flags()
+                self.assertTrue(User.query.filter_by(email=email).one().is_excluded)
+            finally:
+                User.query.filter_by(email=email).delete()
+                db.session.commit()
+
+    def test_tombstoned_user_is_signed_out_and_purged_once(self):
+        uid = self._create_user_and_login()
+        self._seed_user_rows(uid)
+        with app.app_context():
+            db.session.get(User, uid).deleted_at = datetime.utcnow()
+            db.session.commit()
+        # Within the recheck window the session is trusted as is
+        self.assertEqual(self.client.get('/api/results').status_code, 200)
+        with self.client.session_transaction() as sess:
+            sess['user_checked_at'] = 0
+        self.assertEqual(self.client.get('/api/results').status_code, 401)
+        with self.client.session_transaction() as sess:
+            self.assertNotIn('user_id', sess)
+
+        with app.app_context():
+            self.assertTrue(_claim_user_purge(uid))
+            # Another worker starting up skips the claimed purge
+            with patch('app._schedule_user_purge') as schedule:
+                _resume_user_purges()
+            self.assertNotIn(uid, [c.args[0] for c in schedule.call_args_list])
+        self.assertFalse(_purge_user(uid))
+        self.assertGreater(self._user_rows_left(uid)['Result'], 0)
+
+        # An abandoned claim can be taken over once it lapses
+        with patch('app.USER_PURGE_CLAIM_SECONDS', 0):
+            self.assertTrue(_purge_user(uid))
+        self.assertEqual(set(self._user_rows_left(uid).values()), {0})
+
+    def test_profile_username_race_returns_taken_error(self):
+        with app.app_context():
+            other = User(name='Holder', email=f"holder_{uuid.uuid4().hex[:8]}@example.com", password_hash='x')
+            db.session.add(other)
+            db.session.flush()
+            taken_name = f"holder{other.id}"
+            db.session.add(Profile(user_id=other.id, username=taken_name))
+            db.session.commit()
+            other_id = other.id
+        uid = self._create_user_and_login()
+
+        # The name is claimed between the availability check and the commit
+        with patch('app._username_taken', return_value=False):
+            for path in ('/api/profile', '/update_profile'):
+                resp = self.client.post(path, json={'username': taken_name})
+                self.assertEqual(resp.status_code, 400)
+                self.assertEqual(resp.get_json()['error'], 'Username already taken. Choose another.')
+
+        with app.app_context():
+            Profile.query.filter(Profile.user_id.in_([uid, other_id])).delete()
+            User.query.filter(User.id.in_([uid, other_id])).delete()
+            db.session.commit()
+
+    def test_failed_purge_releases_claim_for_cli_retry(self):
+        uid = self._create_user_and_login()
+        self._seed_user_rows(uid)
+        with app.app_context():
+            db.session.get(User, uid).deleted_at = datetime.utcnow()
+            db.session.commit()
+
+        with patch('app._delete_user_rows', side_effect=RuntimeError('boom')):
+            self.assertFalse(_purge_user(uid))
+        with app.app_context():
+            self.assertIsNone(db.session.get(User, uid).purge_claimed_at)
+
+        result = app.test_cli_runner().invoke(args=['purge-deleted-users'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('deleted users', result.output)
+        self.assertEqual(set(self._user_rows_left(uid).values()), {0})
+
+    def test_leaderboard_me_returns_rank_outside_top_fifty(self):
+        uid = self._create_user_and_login()
+        others = [{'user_id': -(i + 1), 'rank': None, 'points_total': 200 - i} for i in range(60)]
+        ranked = others[:54] + [{'user_id': uid, 'rank': None, 'points_total': 10}] + others[54:]
+        for idx, entry in enumerate(ranked, start=1):
+            entry['rank'] = idx
+
+        with patch('app._compute_leaderboard_entries', return_value=ranked):
+            _invalidate_leaderboard_cache()
+            resp = self.client.get('/api/leaderboard/me?neighbours=1')
+        _invalidate_leaderboard_cache()
+
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.data)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['rank'], 55)
+        self.assertEqual(data['total'], 61)
+        self.assertEqual(data['percentile'], 10.0)
+        self.assertEqual(data['entry']['user_id'], uid)
+        self.assertEqual([e['rank'] for e in data['above']], [54])
+        self.assertEqual([e['rank'] for e in data['below']], [56])
+
+    def test_leaderboard_me_requires_auth(self):
+        resp = self.client.get('/api/leaderboard/me')
+        self.assertEqual(resp.status_code, 401)
+
     def test_profile_get_post_cycle(self):
         uid = self._create_user_and_login()
         # initial GET should succeed
@@ -554,6 +1574,254 @@ class TestFlaskApp(unittest.TestCase):
             meta = UserMeta.query.filter_by(user_id=uid).first()
             self.assertIsNone(meta.profile_pic)
 
+    def test_profile_media_served_from_content_hashed_cache(self):
+        uid = self._create_user_and_login()
+        blob = b'cached-avatar-bytes'
+        data = {'file': (io.BytesIO(blob), 'avatar.png', 'image/png')}
+        r = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data')
+        self.assertEqual(r.status_code, 200)
+        digest = hashlib.sha256(blob).hexdigest()
+        cache_path = _avatar_cache_path(digest, 'image/png')
+        self.assertTrue(os.path.exists(cache_path))
+
+        resp = self.client.get(f'/media/profile/{uid}?v={digest[:16]}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, blob)
+        self.assertEqual(resp.headers['ETag'], f'"{digest}"')
+        self.assertIn('immutable', resp.headers['Cache-Control'])
+        resp.close()
+
+        # A missing cache file is rebuilt from the DB blob
+        os.remove(cache_path)
+        resp = self.client.get(f'/media/profile/{uid}')
+        self.assertEqual(resp.data, blob)
+        self.assertNotIn('immutable', resp.headers['Cache-Control'])
+        resp.close()
+        self.assertTrue(os.path.exists(cache_path))
+
+        resp = self.client.get(f'/media/profile/{uid}', headers={'If-None-Match': f'"{digest}"'})
+        self.assertEqual(resp.status_code, 304)
+        self.client.delete('/api/profile_picture')
+
+    def test_profile_media_conditional_get_and_stable_urls(self):
+        uid = self._create_user_and_login()
+        data = {'file': (io.BytesIO(b'conditional-avatar'), 'avatar.png', 'image/png')}
+        url = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data').get_json()['url']
+        digest = hashlib.sha256(b'conditional-avatar').hexdigest()
+        self.assertTrue(url.endswith(f'?v={digest[:16]}&size=256'))
+        # Rendering the profile again yields the same URL, so browsers keep their copy
+        profile_url = self.client.get('/api/profile').get_json()['profile']['avatar_url']
+        self.assertEqual(profile_url, url)
+        # Undecodable uploads never get thumbnails; check the original's own caching
+        url = url.split('&size=')[0]
+
+        first = self.client.get(url)
+        last_modified = first.headers['Last-Modified']
+        first.close()
+        statements = []
+
+        def capture(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            resp = self.client.get(url, headers={'If-None-Match': f'"{digest}"'})
+            self.assertEqual(resp.status_code, 304)
+            self.assertIn('immutable', resp.headers['Cache-Control'])
+            resp = self.client.get(url, headers={'If-Modified-Since': last_modified})
+            self.assertEqual(resp.status_code, 304)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        # Revalidation never reads the blob column
+        self.assertTrue(statements)
+        self.assertFalse([sql for sql in statements if 'profile_media.data' in sql])
+        resp = self.client.get(url, headers={'If-None-Match': '"stale"'})
+        self.assertEqual(resp.status_code, 200)
+        resp.close()
+        self.client.delete('/api/profile_picture')
+
+    @unittest.skipIf(Image is None, 'Pillow not installed')
+    def test_profile_media_serves_generated_thumbnails(self):
+        uid = self._create_user_and_login()
+        source = io.BytesIO()
+        Image.new('RGB', (600, 400), (200, 40, 40)).save(source, format='PNG')
+        blob = source.getvalue()
+        data = {'file': (io.BytesIO(blob), 'avatar.png', 'image/png')}
+        url = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data').get_json()['url']
+        url = url.split('&size=')[0]
+        with self.app.app_context():
+            stored = db.session.get(ProfileMedia, uid)
+            digest, blob = stored.content_hash, stored.data
+        job = _schedule_avatar_thumbnails(digest, blob)
+        if job is not None:
+            job.result(timeout=30)
+
+        resp = self.client.get(f'{url}&size=100', headers={'Accept': 'image/webp,*/*'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'image/webp')
+        self.assertEqual(resp.headers['ETag'], f'"{digest}-128.webp"')
+        self.assertIn('Accept', resp.headers['Vary'])
+        with Image.open(io.BytesIO(resp.data)) as thumb:
+            self.assertEqual(thumb.size, (128, 128))
+        self.assertLess(len(resp.data), len(blob))
+        resp.close()
+
+        resp = self.client.get(f'{url}&size=64', headers={'Accept': '*/*'})
+        self.assertEqual(resp.mimetype, 'image/png')
+        with Image.open(io.BytesIO(resp.data)) as thumb:
+            self.assertEqual(thumb.size, (64, 64))
+        resp.close()
+        self.client.delete('/api/profile_picture')
+
+    @unittest.skipIf(Image is None, 'Pillow not installed')
+    def test_profile_picture_upload_strips_metadata(self):
+        uid = self._create_user_and_login()
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'PhoneMaker'
+        exif.get_ifd(0x8825)[2] = (18.0, 31.0, 12.0)  # GPSLatitude
+        source = io.BytesIO()
+        Image.new('RGB', (60, 40), (10, 120, 200)).save(source, format='JPEG', exif=exif, comment=b'secret')
+        self.assertIn(b'PhoneMaker', source.getvalue())
+        data = {'file': (io.BytesIO(source.getvalue()), 'avatar.jpg', 'image/jpeg')}
+        url = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data').get_json()['url']
+        self.assertIn('size=256', url)
+
+        resp = self.client.get(url.split('&size=')[0])
+        self.assertEqual(resp.mimetype, 'image/jpeg')
+        self.assertNotIn(b'PhoneMaker', resp.data)
+        self.assertNotIn(b'secret', resp.data)
+        with Image.open(io.BytesIO(resp.data)) as served:
+            self.assertFalse(served.getexif())
+            # Orientation was applied to the pixels before the tag was dropped
+            self.assertEqual(served.size, (40, 60))
+        resp.close()
+        self.client.delete('/api/profile_picture')
+
+    def test_profile_media_thumbnail_request_for_non_image_serves_original(self):
+        uid = self._create_user_and_login()
+        data = {'file': (io.BytesIO(b'not-really-an-image'), 'avatar.png', 'image/png')}
+        url = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data').get_json()['url']
+        job = _schedule_avatar_thumbnails(hashlib.sha256(b'not-really-an-image').hexdigest(), b'not-really-an-image')
+        if job is not None:
+            self.assertEqual(job.result(timeout=30), 0)
+        resp = self.client.get(f'{url}&size=64')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, b'not-really-an-image')
+        resp.close()
+        self.client.delete('/api/profile_picture')
+
+    def test_json_and_html_responses_are_compressed_when_accepted(self):
+        self._create_user_and_login()
+        for _ in range(12):
+            self._save_quiz(4, total=8)
+        plain = self.client.get('/api/results?fields=questions')
+        self.assertGreater(len(plain.data), 1024)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+
+        resp = self.client.get('/api/results?fields=questions', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(resp.headers['Content-Length']), len(resp.data))
+        self.assertEqual(gzip.decompress(resp.data), plain.data)
+
+        page = self.client.get('/dashboard', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(page.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'dashboardBootstrap', gzip.decompress(page.data))
+
+        # Small bodies, refused encodings and a disabled switch go out as-is
+        small = self.client.get('/api/profile', headers={'Accept-Encoding': 'gzip'})
+        self.assertLess(len(small.data), 1024)
+        self.assertNotIn('Content-Encoding', small.headers)
+        refused = self.client.get('/api/results?fields=questions', headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', refused.headers)
+        with patch('app.COMPRESSION_ENABLED', False):
+            off = self.client.get('/api/results?fields=questions', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', off.headers)
+
+        with patch('app.COMPRESSION_MIN_BYTES', 10):
+            data = {'file': (io.BytesIO(b'x' * 4096), 'avatar.png', 'image/png')}
+            url = self.client.post('/api/profile_picture', data=data, content_type='multipart/form-data').get_json()['url']
+            avatar = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+            self.assertNotIn('Content-Encoding', avatar.headers)
+            self.assertEqual(avatar.data, b'x' * 4096)
+            avatar.close()
+        self.client.delete('/api/profile_picture')
+
+    @unittest.skipIf(brotli is None, 'brotli not installed')
+    def test_brotli_preferred_when_available(self):
+        self._create_user_and_login()
+        resp = self.client.get('/dashboard', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(resp.headers['Content-Encoding'], 'br')
+        self.assertIn(b'dashboardBootstrap', brotli.decompress(resp.data))
+
+    def test_precompressed_static_copies_are_served_directly(self):
+        static_dir = tempfile.mkdtemp(prefix='vi-static-')
+        script = os.path.join(static_dir, 'bundle.js')
+        with open(script, 'w') as handle:
+            handle.write('console.log("precompressed");\n' * 200)
+        tiny = os.path.join(static_dir, 'tiny.css')
+        with open(tiny, 'w') as handle:
+            handle.write('body{}')
+        with open(os.path.join(static_dir, 'logo.png'), 'wb') as handle:
+            handle.write(b'\x89PNG' + b'0' * 4096)
+
+        paths = [script, tiny, os.path.join(static_dir, 'logo.png')]
+        self.assertEqual(_precompress_static_files(paths), 2 if brotli is not None else 1)
+        self.assertFalse(os.path.exists(tiny + '.gz'))
+        # Up-to-date copies are not rewritten
+        self.assertEqual(_precompress_static_files(paths), 0)
+
+        original_static = app.static_folder
+        app.static_folder = static_dir
+        try:
+            resp = self.client.get('/static/bundle.js', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(resp.mimetype, 'text/javascript')
+            self.assertIn('Accept-Encoding', resp.headers['Vary'])
+            with open(script, 'rb') as handle:
+                self.assertEqual(gzip.decompress(resp.data), handle.read())
+            resp.close()
+
+            plain = self.client.get('/static/bundle.js')
+            self.assertNotIn('Content-Encoding', plain.headers)
+            plain.close()
+
+            # A copy older than its source is ignored; the fresh file is compressed in memory instead
+            with open(script, 'w') as handle:
+                handle.write('console.log("edited");\n' * 200)
+            later = os.path.getmtime(script + '.gz') + 10
+            os.utime(script, (later, later))
+            stale = self.client.get('/static/bundle.js', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(stale.headers['Content-Encoding'], 'gzip')
+            self.assertIn(b'edited', gzip.decompress(stale.data))
+            stale.close()
+        finally:
+            app.static_folder = original_static
+
+    def test_questions_json_is_compressed_without_build_copies(self):
+        source = os.path.join(app.root_path, 'questions.json')
+        if any(os.path.exists(source + suffix) for suffix in ('.gz', '.br')):
+            self.skipTest('precompressed copies present')
+        with open(source, 'rb') as handle:
+            raw = handle.read()
+        resp = self.client.get('/questions.json', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(resp.data), raw)
+        self.assertIn('Accept-Encoding', resp.headers['Vary'])
+        etag = resp.headers['ETag']
+        resp.close()
+        # Cached per process and revalidated like the file itself
+        again = self.client.get('/questions.json', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        again.close()
+        plain = self.client.get('/questions.json')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.data, raw)
+        plain.close()
+
     def test_quiz_result_persists_and_listed(self):
         uid = self._create_user_and_login()
         payload = {
@@ -577,6 +1845,11 @@ class TestFlaskApp(unittest.TestCase):
         out = json.loads(r.data)
         kinds = [row['type'] for row in out['results']]
         self.assertIn('Quiz', kinds)
+        with self.app.app_context():
+            stored = Result.query.filter_by(user_id=uid, kind='quiz').first()
+            self.assertEqual(stored.difficulty, 'Medium')
+            self.assertEqual(stored.role, 'Aptitude')
+            self.assertEqual(stored.points, calculate_points('quiz', 60, 'Medium'))
 
 
 class TestSessionManagement(unittest.TestCase):
@@ -709,6 +1982,135 @@ class TestAppHelpers(unittest.TestCase):
 
         self._cleanup_user(user_id)
 
+    def test_result_scoring_fields_compute_points(self):
+        fields = _result_scoring_fields('quiz', 70, 'Aptitude', 'Medium')
+        self.assertEqual(fields, {'role': 'Aptitude', 'difficulty': 'Medium', 'points': 14})
+        fields = _result_scoring_fields('interview', 85, None, None)
+        self.assertEqual(fields, {'role': None, 'difficulty': None, 'points': 8})
+
+    def test_backfill_populates_legacy_results(self):
+        with self.app.app_context():
+            email = f"backfill_{uuid.uuid4().hex[:8]}@example.com"
+            user = User(name='Backfill Tester', email=email, password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+            legacy = Result(
+                user_id=user_id,
+                title='Legacy',
+                score=80,
+                kind='interview',
+                details=json.dumps({'role': 'HR Round', 'difficulty': 'Hard'}),
+            )
+            db.session.add(legacy)
+            db.session.commit()
+            self.assertIsNone(legacy.points)
+
+            self.assertGreaterEqual(_backfill_result_scoring_columns(batch_size=1), 1)
+            refreshed = db.session.get(Result, legacy.id)
+            self.assertEqual(refreshed.role, 'HR Round')
+            self.assertEqual(refreshed.difficulty, 'Hard')
+            self.assertEqual(refreshed.points, calculate_points('ai', 80, 'Hard'))
+
+            totals = _aggregate_points_for_users([user_id])
+            self.assertEqual(totals[user_id]['ai'], refreshed.points)
+
+        self._cleanup_user(user_id)
+
+    def test_leaderboard_cache_rebuilds_once_for_concurrent_misses(self):
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return [{'user_id': 7, 'rank': 1, 'points_total': 5}]
+
+        with patch('app._compute_leaderboard_entries', side_effect=slow_compute):
+            _invalidate_leaderboard_cache()
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(_build_leaderboard(limit=50)))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(results), 8)
+            self.assertTrue(all(r == results[0] for r in results))
+            self.assertEqual(_get_leaderboard_entry(7)['rank'], 1)
+            self.assertIsNone(_get_leaderboard_entry(8))
+
+            stats = _leaderboard_cache_stats()
+            self.assertFalse(stats['stale'])
+            self.assertGreaterEqual(stats['hits'], 2)
+            self.assertGreaterEqual(stats['coalesced'], 1)
+        _invalidate_leaderboard_cache()
+
+    def test_leaderboard_cache_invalidated_on_result_commit(self):
+        with patch('app._compute_leaderboard_entries', return_value=[]):
+            _invalidate_leaderboard_cache()
+            _build_leaderboard(limit=5)
+            self.assertFalse(_leaderboard_cache_stats()['stale'])
+
+            with self.app.app_context():
+                email = f"cache_{uuid.uuid4().hex[:8]}@example.com"
+                user = User(name='Cache Tester', email=email, password_hash='x')
+                db.session.add(user)
+                db.session.commit()
+                user_id = user.id
+                self.assertFalse(_leaderboard_cache_stats()['stale'])
+
+                db.session.add(Result(user_id=user_id, title='Quiz', score=50, kind='quiz'))
+                db.session.commit()
+                self.assertTrue(_leaderboard_cache_stats()['stale'])
+
+                _build_leaderboard(limit=5)
+                self.assertFalse(_leaderboard_cache_stats()['stale'])
+
+            self._cleanup_user(user_id)
+            self.assertTrue(_leaderboard_cache_stats()['stale'])
+
+    def test_is_excluded_email_matches_demo_and_patterns(self):
+        with patch('app.DEMO_USER_EMAILS', {'demo@example.com'}), \
+                patch('app.TEST_USER_EMAIL_PATTERNS', ['qa-bot']):
+            self.assertTrue(_is_excluded_email('Demo@Example.com'))
+            self.assertTrue(_is_excluded_email('team+QA-BOT@example.com'))
+            self.assertFalse(_is_excluded_email('someone@example.com'))
+            self.assertFalse(_is_excluded_email(None))
+
+    def test_excluded_user_ids_follow_user_writes(self):
+        marker = f"excl{uuid.uuid4().hex[:6]}"
+        with patch('app.TEST_USER_EMAIL_PATTERNS', [marker]), self.app.app_context():
+            before = _get_excluded_user_ids()
+            user = User(name='Excluded', email=f"{marker}@example.com", password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            self.assertTrue(user.is_excluded)
+            self.assertIn(user_id, _get_excluded_user_ids())
+            self.assertNotIn(user_id, before)
+
+            user.email = f"regular_{marker[4:]}@example.com"
+            db.session.commit()
+            self.assertFalse(user.is_excluded)
+            self.assertNotIn(user_id, _get_excluded_user_ids())
+
+            user.email = f"{marker}@example.com"
+            db.session.commit()
+            self.assertIn(user_id, _get_excluded_user_ids())
+
+            # A cached hit must not re-query the user table
+            with patch.object(db.session, 'query', side_effect=AssertionError('unexpected query')):
+                self.assertIn(user_id, _get_excluded_user_ids())
+
+            db.session.delete(user)
+            db.session.commit()
+            self.assertNotIn(user_id, _get_excluded_user_ids())
+
     def test_is_session_expired_checks_datetime_and_timestamp(self):
         old_dt = datetime.utcnow() - timedelta(seconds=SESSION_TTL_SECONDS + 5)
         recent_dt = datetime.utcnow()
@@ -749,11 +2151,181 @@ class TestAppHelpers(unittest.TestCase):
 
         self._cleanup_user(first_user_id)
 
+    def test_generate_unique_username_uses_one_query_for_common_names(self):
+        with self.app.app_context():
+            # Letters only, so the suffix digits are unambiguous
+            base = 'rahul' + uuid.uuid4().hex[:8].translate(str.maketrans('0123456789', 'ghijklmnop'))
+            users = [User(name='Rahul', email=f"{base}{n}@example.com", password_hash='x') for n in range(5)]
+            db.session.add_all(users)
+            db.session.flush()
+            taken = [base, f"{base}07", f"{base}12", f"{base}3", f"{base}lal"]
+            db.session.add_all(Profile(user_id=user.id, username=name) for user, name in zip(users, taken))
+            db.session.commit()
+            user_ids = [user.id for user in users]
+
+            with _collect_query_stats() as stats:
+                candidate = _generate_unique_username('Rahul ' + base[5:])
+            self.assertEqual(stats.count, 1)
+            self.assertEqual(candidate, f"{base}13")
+            self.assertEqual(_generate_unique_username(base + 'lal'), f"{base}lal1")
+
+        for user_id in user_ids:
+            self._cleanup_user(user_id)
+
+    def test_generate_unique_username_stays_within_column_length(self):
+        with self.app.app_context():
+            base = 'cap' + uuid.uuid4().hex[:8].translate(str.maketrans('0123456789', 'ghijklmnop'))
+            users = [User(name='Cap', email=f"{base}{n}@example.com", password_hash='x') for n in range(3)]
+            db.session.add_all(users)
+            db.session.flush()
+            # A user-chosen name of the base plus a huge number must not push generated names past 120
+            huge = _sanitize_username(base + '9' * 200)
+            self.assertEqual(len(huge), USERNAME_MAX_LENGTH)
+            taken = [base, huge, f"{base}999999"]
+            db.session.add_all(Profile(user_id=user.id, username=name) for user, name in zip(users, taken))
+            db.session.commit()
+            user_ids = [user.id for user in users]
+
+            candidate = _generate_unique_username(base)
+            self.assertRegex(candidate, rf"^{base}\d{{{USERNAME_SUFFIX_DIGITS}}}$")
+            self.assertNotEqual(candidate, f"{base}999999")
+            self.assertLessEqual(len(_generate_unique_username('x' * 300)), USERNAME_MAX_LENGTH)
+            self.assertLessEqual(len(_generate_unique_username('x' * 300, randomize=True)), USERNAME_MAX_LENGTH)
+
+        for user_id in user_ids:
+            self._cleanup_user(user_id)
+
+    def test_username_variants_query_ignores_collation_order(self):
+        # en_US/ICU-style ordering: punctuation sorts before digits
+        engine = create_engine('sqlite://')
+
+        @event.listens_for(engine, 'connect')
+        def _register_collation(dbapi_connection, _record):
+            def punctuation_first(left, right):
+                left, right = left.replace(':', '/'), right.replace(':', '/')
+                return (left > right) - (left < right)
+            dbapi_connection.create_collation('PUNCT_FIRST', punctuation_first)
+
+        with engine.connect() as conn:
+            conn.exec_driver_sql('CREATE TABLE profile (id INTEGER PRIMARY KEY, user_id INTEGER, username TEXT COLLATE PUNCT_FIRST)')
+            conn.exec_driver_sql('CREATE UNIQUE INDEX uq_profile_username ON profile (username)')
+            for idx, name in enumerate(['rahul', 'rahul1', 'rahul2', 'rahulx', 'raj']):
+                conn.exec_driver_sql(f"INSERT INTO profile (user_id, username) VALUES ({idx}, '{name}')")
+            # The old `rahul0` <= name < `rahul:` range is empty under this ordering
+            legacy = conn.exec_driver_sql(
+                "SELECT username FROM profile WHERE username >= 'rahul0' AND username < 'rahul:'"
+            ).fetchall()
+            self.assertEqual(legacy, [])
+            found = set(conn.execute(_username_variants_query('rahul')).scalars())
+        engine.dispose()
+        self.assertEqual(found, {'rahul', 'rahul1', 'rahul2'})
+
+    def test_add_profile_retries_when_username_is_taken_concurrently(self):
+        with self.app.app_context():
+            first = User(name='Race', email=f"race_{uuid.uuid4().hex[:8]}@example.com", password_hash='x')
+            second = User(name='Race', email=f"race_{uuid.uuid4().hex[:8]}@example.com", password_hash='x')
+            db.session.add_all([first, second])
+            db.session.flush()
+            taken_name = f"race{first.id}x"
+            db.session.add(Profile(user_id=first.id, username=taken_name))
+            db.session.commit()
+            user_ids = [first.id, second.id]
+
+            # The first pick loses the race to the row inserted above; the retry looks again
+            with patch('app._generate_unique_username', side_effect=[taken_name, f"{taken_name}1"]):
+                profile = _add_profile_with_unique_username(second.id, 'Race')
+            db.session.commit()
+            self.assertEqual(profile.username, f"{taken_name}1")
+            self.assertEqual(Profile.query.filter_by(user_id=second.id).count(), 1)
+
+        for user_id in user_ids:
+            self._cleanup_user(user_id)
+
+    def test_password_hash_policy_parameters(self):
+        scrypt_hash = HashPolicy('scrypt', 14).hash('pw')
+        self.assertEqual(hash_parameters(scrypt_hash), ('scrypt', 14))
+        self.assertEqual(hash_parameters('pbkdf2:sha256:600000$salt$abc'), ('pbkdf2', 600))
+        self.assertEqual(hash_parameters('$2b$12$' + 'a' * 53), ('bcrypt', 12))
+        self.assertIsNone(hash_parameters('plaintext'))
+
+        policy = HashPolicy('scrypt', 15)
+        self.assertTrue(policy.needs_rehash(scrypt_hash))
+        self.assertFalse(policy.needs_rehash('scrypt:65536:8:1$salt$abc'))
+        self.assertTrue(policy.needs_rehash('$2b$14$' + 'a' * 53))
+        # Costs are clamped to the module's limits
+        self.assertEqual(HashPolicy('scrypt', 30).cost, 16)
+        self.assertEqual(HashPolicy('bcrypt', 4).cost, 10)
+        with self.assertRaises(ValueError):
+            HashPolicy('md5')
+
+    def test_password_hash_calibration_targets_budget(self):
+        def fake_timer(elapsed_seconds):
+            ticks = iter([0.0, elapsed_seconds])
+            return lambda: next(ticks)
+
+        # 10 ms at the floor cost: 40 ms leaves room for two doublings, or 4x the iterations
+        self.assertEqual(calibrate_policy('scrypt', 40, samples=1, timer=fake_timer(0.010)).cost, 16)
+        self.assertEqual(calibrate_policy('bcrypt', 40, samples=1, timer=fake_timer(0.010)).cost, 12)
+        self.assertEqual(calibrate_policy('pbkdf2', 40, samples=1, timer=fake_timer(0.010)).cost, 800)
+        # A host slower than the budget still gets the floor, never less
+        self.assertEqual(calibrate_policy('scrypt', 40, samples=1, timer=fake_timer(0.500)).cost, 14)
+
+    def test_memory_rate_limit_backend_refills_and_evicts(self):
+        now = [0.0]
+        backend = _MemoryRateLimitBackend(max_keys=2, clock=lambda: now[0])
+        self.assertEqual(backend.consume('a', 2, 0.5), (True, 0))
+        self.assertEqual(backend.consume('a', 2, 0.5), (True, 0))
+        self.assertEqual(backend.consume('a', 2, 0.5), (False, 2))
+        now[0] = 2.0
+        self.assertEqual(backend.consume('a', 2, 0.5), (True, 0))
+
+        backend.consume('b', 1, 0.5)
+        backend.consume('c', 1, 0.5)
+        # 'a' was least recently used and is dropped; it comes back with a full bucket
+        self.assertEqual(backend.consume('a', 1, 0.5), (True, 0))
+        self.assertEqual(backend.consume('c', 1, 0.5)[0], False)
+
+    def test_rate_limit_backend_requires_both_operations(self):
+        class ConsumeOnly(_RateLimitBackend):
+            def consume(self, key, capacity, refill_per_second, cost=1):
+                return True, 0
+
+        with self.assertRaises(TypeError):
+            ConsumeOnly()
+
     def test_sanitize_username_filters_invalid_chars(self):
         self.assertEqual(_sanitize_username('User.Name '), 'username')
         self.assertEqual(_sanitize_username('USER-NAME123'), 'username123')
         self.assertIsNone(_sanitize_username('!!!'))
 
+    def test_auth_pages_render_from_cached_templates(self):
+        client = self.app.test_client()
+        for path in ('/signup', '/login', '/forgot-password'):
+            response = client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+        for name in AUTH_TEMPLATES:
+            first = app.jinja_env.get_template(name)
+            self.assertIs(app.jinja_env.get_template(name), first, name)
+
+    def test_precompiled_templates_load_without_recompiling(self):
+        cache_dir = tempfile.mkdtemp(prefix='vi-templates-')
+        previous_cache = app.jinja_env.bytecode_cache
+        try:
+            _install_template_bytecode_cache(cache_dir)
+            app.jinja_env.cache.clear()
+            compiled = _precompile_templates()
+            self.assertGreaterEqual(compiled, len(AUTH_TEMPLATES) + 2)
+            self.assertEqual(len(os.listdir(cache_dir)), compiled)
+
+            # A cold worker only has the on-disk cache: nothing should go through the compiler
+            app.jinja_env.cache.clear()
+            with patch.object(app.jinja_env, 'compile', side_effect=AssertionError('recompiled')):
+                app.jinja_env.get_template('dashboard.html')
+                app.jinja_env.get_template('auth/login.html')
+        finally:
+            app.jinja_env.bytecode_cache = previous_cache
+            app.jinja_env.cache.clear()
+
     def test_find_user_by_login_identifier_supports_email_and_username(self):
         with self.app.app_context():
             email = f"lookup_{uuid.uuid4().hex[:8]}@example.com"
@@ -793,6 +2365,37 @@ class TestAppHelpers(unittest.TestCase):
 
         self._cleanup_user(user_id)
 
+    def test_dedupe_usernames_renames_duplicates_and_creates_index(self):
+        with self.app.app_context():
+            users = [
+                User(name='Twin', email=f"twin_{uuid.uuid4().hex[:8]}@example.com", password_hash='x')
+                for _ in range(3)
+            ]
+            db.session.add_all(users)
+            db.session.commit()
+            user_ids = [user.id for user in users]
+            twin_name = f"twin{user_ids[0]}"
+            db.session.execute(text('DROP INDEX uq_profile_username'))
+            for user_id in user_ids:
+                db.session.execute(Profile.__table__.insert().values(user_id=user_id, username=twin_name))
+            db.session.commit()
+
+        try:
+            result = self.app.test_cli_runner().invoke(args=['dedupe-usernames'])
+            self.assertIn('Renamed 2 duplicate usernames; unique index present', result.output)
+            with self.app.app_context():
+                rows = dict(
+                    db.session.query(Profile.user_id, Profile.username).filter(Profile.user_id.in_(user_ids)).all()
+                )
+                self.assertEqual(rows[user_ids[0]], twin_name)
+                self.assertEqual(len(set(rows.values())), 3)
+                self.assertTrue(_ensure_profile_username_index())
+        finally:
+            with self.app.app_context():
+                _ensure_profile_username_index()
+            for user_id in user_ids:
+                self._cleanup_user(user_id)
+
     def test_generate_temp_password_respects_length_and_charset(self):
         password = _generate_temp_password(12)
         self.assertEqual(len(password), 12)
@@ -864,5 +2467,92 @@ class TestAppHelpers(unittest.TestCase):
             self._cleanup_user(user_id)
 
 
+class TestQueryPlans(unittest.TestCase):
+    """EXPLAIN the hot per-user lookups so a dropped or mismatched index fails loudly."""
+
+    def _statements(self):
+        return {
+            'results_page': (
+                select(Result.id, Result.score)
+                .where(Result.user_id == 1)
+                .order_by(Result.timestamp.desc(), Result.id.desc())
+                .limit(51),
+                ('ix_result_user_timestamp',),
+            ),
+            'results_summary': (
+                select(Result.kind, func.count(Result.id))
+                .where(Result.user_id == 1)
+                .group_by(Result.kind),
+                ('ix_result_user_kind', 'ix_result_user_timestamp'),
+            ),
+            'results_for_user': (
+                select(Result.id).where(Result.user_id == 1),
+                ('ix_result_user_kind', 'ix_result_user_timestamp'),
+            ),
+            'profile_by_username': (
+                select(Profile.user_id).where(Profile.username == 'someone'),
+                ('uq_profile_username',),
+            ),
+            'username_suffixes': (
+                _username_variants_query('rahul'),
+                ('uq_profile_username',),
+            ),
+        }
+
+    def _compile(self, stmt, engine):
+        return str(stmt.compile(engine, compile_kwargs={'literal_binds': True}))
+
+    def test_sqlite_plans_use_indexes(self):
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        with engine.connect() as conn:
+            for name, (stmt, indexes) in self._statements().items():
+                sql = self._compile(stmt, engine)
+                plan = ' | '.join(str(row[-1]) for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+                with self.subTest(query=name, plan=plan):
+                    self.assertTrue(any(index in plan for index in indexes))
+                    self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        engine.dispose()
+
+    def test_sqlite_login_lookup_uses_indexes(self):
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        with app.app_context():
+            stmt = _login_account_query('Some.One@example.com').limit(1).statement
+        sql = self._compile(stmt, engine)
+        with engine.connect() as conn:
+            plan = ' | '.join(str(row[-1]) for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+        engine.dispose()
+        self.assertIn('uq_profile_username', plan)
+        for table in ('user', 'profile', 'user_meta', 'profile_media'):
+            self.assertNotRegex(plan, rf'SCAN {table}\b')
+
+    def test_postgres_plans_use_indexes(self):
+        url = os.getenv('TEST_POSTGRES_URL')
+        if not url:
+            self.skipTest('TEST_POSTGRES_URL not set')
+        engine = create_engine(url)
+        schema = f"plan_check_{uuid.uuid4().hex[:8]}"
+        with engine.connect() as conn:
+            conn.execute(text(f'CREATE SCHEMA {schema}'))
+            try:
+                conn.execute(text(f'SET search_path TO {schema}'))
+                db.metadata.create_all(conn)
+                # Empty tables make sequential scans look cheapest; force the index question
+                conn.execute(text('SET enable_seqscan = off'))
+                for name, (stmt, indexes) in self._statements().items():
+                    sql = self._compile(stmt, engine)
+                    plan = ' | '.join(row[0] for row in conn.execute(text(f'EXPLAIN {sql}')))
+                    with self.subTest(query=name, plan=plan):
+                        self.assertTrue(any(index in plan for index in indexes))
+                        if name == 'results_page':
+                            self.assertNotIn('Sort', plan)
+            finally:
+                conn.rollback()
+                conn.execute(text(f'DROP SCHEMA IF EXISTS {schema} CASCADE'))
+                conn.commit()
+        engine.dispose()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -8,16 +8,15 @@ from flask import (
     flash,
     redirect,
     url_for,
-    render_template_string,
     Blueprint,
     send_from_directory,
     send_file,
     abort,
     has_request_context,
+    g,
 )
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 import os
 import io
 from dotenv import load_dotenv
@@ -29,21 +28,57 @@ from services.api_service import (
     get_random_quiz_questions,
     ALLOWED_ROLES as SERVICE_ALLOWED_ROLES,
 )
+from services.password_hashing import (
+    ALGORITHMS as PASSWORD_HASH_ALGORITHMS,
+    HashPolicy,
+    calibrate_policy,
+    verify_password,
+)
 
+import abc
 import json
+import base64
 import uuid
 import time
-import random
 import re
 import smtplib
 import string
 from email.mime.text import MIMEText
 import secrets
 import math
-from datetime import datetime, date, timedelta
-from sqlalchemy import text, or_, func, case, LargeBinary
-from werkzeug.security import generate_password_hash as wz_generate_password_hash, check_password_hash as wz_check_password_hash
-from werkzeug.http import http_date
+import threading
+import atexit
+import hashlib
+import gzip
+import mimetypes
+import tempfile
+import contextvars
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import (
+    text, and_, or_, func, case, inspect, event, false, bindparam, literal, literal_column, select, union_all,
+    Boolean, LargeBinary,
+)
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Session as OrmSession, load_only, object_session, undefer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import click
+from werkzeug.security import safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import ChoiceLoader, DictLoader, FileSystemBytecodeCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it avatars are served exactly as uploaded
+    Image = None
+    ImageOps = None
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses are only gzip-compressed
+    brotli = None
 
 load_dotenv()
 
@@ -90,7 +125,8 @@ CORS(app)
 
 @app.after_request
 def _apply_secure_cache_headers(response):
-    if request.endpoint == 'static':
+    # Avatars are public and carry their own validators/cache policy
+    if request.endpoint in ('static', 'profile_media'):
         return response
 
     is_protected_path = (
@@ -107,6 +143,362 @@ def _apply_secure_cache_headers(response):
 
     return response
 
+# -------- Response compression --------
+COMPRESSION_ENABLED = (os.getenv('COMPRESSION_ENABLED') or '1').strip().lower() not in ('0', 'false', 'no')
+COMPRESSION_MIN_BYTES = _safe_env_int('COMPRESSION_MIN_BYTES', 1024)
+COMPRESSION_GZIP_LEVEL = min(9, _safe_env_int('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = min(11, _safe_env_int('COMPRESSION_BROTLI_QUALITY', 5))
+# Images (avatars included), fonts and archives are already compressed; recompressing
+# them only costs CPU, so only text types are considered
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+}
+# Suffix of the build-time copies written by `flask precompress-static`, by encoding
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+_COMPRESSION_STATS = {
+    'compressed': 0,
+    'precompressed': 0,
+    'skipped_small': 0,
+    'bytes_in': 0,
+    'bytes_out': 0,
+}
+_COMPRESSION_STATS_LOCK = threading.Lock()
+# (path, encoding) -> (source stat key, encoded bytes or None): files compressed in memory
+# because no up-to-date copy from `flask precompress-static` was shipped
+_MEMORY_COMPRESSED = {}
+_MEMORY_COMPRESSED_LOCK = threading.Lock()
+
+
+def _available_encodings():
+    """Encodings this process can produce, in order of preference."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _negotiate_encoding(offers):
+    """Pick the client's preferred encoding among `offers`, honouring q-values; None for identity."""
+    if not offers or not request.accept_encodings:
+        return None
+    return request.accept_encodings.best_match(offers)
+
+
+def _compress_bytes(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output stable across runs
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def _bump_compression_stats(**deltas):
+    with _COMPRESSION_STATS_LOCK:
+        for key, value in deltas.items():
+            _COMPRESSION_STATS[key] += value
+
+
+def _compression_stats():
+    """Return compressed-response counts and the overall size ratio."""
+    with _COMPRESSION_STATS_LOCK:
+        stats = dict(_COMPRESSION_STATS)
+    stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else None
+    stats['encodings'] = list(_available_encodings())
+    stats['gzip_level'] = COMPRESSION_GZIP_LEVEL
+    stats['brotli_quality'] = COMPRESSION_BROTLI_QUALITY if brotli is not None else None
+    return stats
+
+
+@app.after_request
+def _compress_response(response):
+    """Compress HTML/JSON/text bodies for clients that accept brotli or gzip.
+
+    Files (static assets, avatars) stream straight from disk and are left alone;
+    static text assets get their encoded copies from `_send_precompressed` instead.
+    """
+    if (
+        not COMPRESSION_ENABLED
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not 200 <= response.status_code < 300
+        or response.status_code == 204
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate_encoding(_available_encodings())
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        _bump_compression_stats(skipped_small=1)
+        return response
+    compressed = _compress_bytes(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # The encoded body must not share a strong validator with the identity one
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    _bump_compression_stats(compressed=1, bytes_in=len(data), bytes_out=len(compressed))
+    return response
+
+
+def _compressed_in_memory(path, encoding):
+    """Return (`path` encoded with `encoding`, stat) from a per-process cache, or (None, stat)
+    when the file is too small or does not shrink. Rebuilt when the file changes."""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _MEMORY_COMPRESSED_LOCK:
+        cached = _MEMORY_COMPRESSED.get((path, encoding))
+    if cached is not None and cached[0] == key:
+        return cached[1], stat
+    data = None
+    if stat.st_size >= COMPRESSION_MIN_BYTES:
+        with open(path, 'rb') as handle:
+            raw = handle.read()
+        data = _compress_bytes(raw, encoding)
+        if len(data) >= len(raw):
+            data = None
+        else:
+            _bump_compression_stats(compressed=1, bytes_in=len(raw), bytes_out=len(data))
+    with _MEMORY_COMPRESSED_LOCK:
+        _MEMORY_COMPRESSED[(path, encoding)] = (key, data)
+    return data, stat
+
+
+def _send_precompressed(directory, filename, **kwargs):
+    """send_from_directory() that serves a `.br`/`.gz` copy of the file when the client accepts it.
+
+    Copies older than the file itself are ignored. Without an up-to-date copy (e.g. a
+    deploy that skipped `flask precompress-static`), the file is compressed once per
+    process at the runtime level and kept in memory.
+    """
+    mimetype = kwargs.pop('mimetype', None) or mimetypes.guess_type(filename)[0]
+    if not COMPRESSION_ENABLED or mimetype not in COMPRESSIBLE_MIMETYPES:
+        return send_from_directory(directory, filename, mimetype=mimetype, **kwargs)
+
+    variants = {}
+    source = safe_join(directory, filename)
+    if not source or not os.path.isfile(source):
+        return send_from_directory(directory, filename, mimetype=mimetype, **kwargs)
+    source_mtime = os.path.getmtime(source)
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+        copy = source + suffix
+        if os.path.isfile(copy) and os.path.getmtime(copy) >= source_mtime:
+            variants[encoding] = filename + suffix
+    encoding = _negotiate_encoding(tuple(dict.fromkeys(tuple(variants) + _available_encodings())))
+    response = None
+    if encoding in variants:
+        response = send_from_directory(directory, variants[encoding], mimetype=mimetype, **kwargs)
+        response.headers['Content-Encoding'] = encoding
+        _bump_compression_stats(precompressed=1)
+    elif encoding is not None:
+        data, stat = _compressed_in_memory(source, encoding)
+        if data is not None:
+            response = send_file(
+                io.BytesIO(data),
+                mimetype=mimetype,
+                etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding}",
+                last_modified=stat.st_mtime,
+                max_age=kwargs.get('max_age'),
+            )
+            response.headers['Content-Encoding'] = encoding
+    if response is None:
+        response = send_from_directory(directory, filename, mimetype=mimetype, **kwargs)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _serve_static(filename):
+    return _send_precompressed(app.static_folder, filename, max_age=app.get_send_file_max_age(filename))
+
+
+# Flask's own static view, with precompressed copies
+app.view_functions['static'] = _serve_static
+
+
+def _precompressed_sources():
+    """Static assets and questions.json: the files served through `_send_precompressed`."""
+    for root, _dirs, files in os.walk(app.static_folder):
+        for name in sorted(files):
+            if not name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+                yield os.path.join(root, name)
+    yield os.path.join(app.root_path, 'questions.json')
+
+
+def _precompress_static_files(paths=None, force=False):
+    """Write maximum-level .gz (and .br when brotli is installed) copies next to each file
+    in `paths` (default: `_precompressed_sources()`).
+
+    Non-text files, files below COMPRESSION_MIN_BYTES and files that do not shrink get
+    no copy; existing copies are only rewritten when older than their source unless
+    `force` is set.
+    Returns the number of copies written.
+    """
+    levels = {'gzip': 9, 'br': 11}
+    written = 0
+    for path in (_precompressed_sources() if paths is None else paths):
+        if mimetypes.guess_type(path)[0] not in COMPRESSIBLE_MIMETYPES:
+            continue
+        if not os.path.isfile(path) or os.path.getsize(path) < COMPRESSION_MIN_BYTES:
+            continue
+        source_mtime = os.path.getmtime(path)
+        data = None
+        for encoding in _available_encodings():
+            target = path + PRECOMPRESSED_SUFFIXES[encoding]
+            if not force and os.path.isfile(target) and os.path.getmtime(target) >= source_mtime:
+                continue
+            if data is None:
+                with open(path, 'rb') as handle:
+                    data = handle.read()
+            compressed = _compress_bytes(data, encoding, level=levels[encoding])
+            if len(compressed) >= len(data):
+                continue
+            # Write then rename so a request never reads a half-written copy
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.precompress-')
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(compressed)
+            # mkstemp creates 0600; copies must be as readable as their source
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+            os.replace(tmp_path, target)
+            written += 1
+    return written
+
+# -------- SQL statement instrumentation --------
+QUERY_STATS_HEADER = (os.getenv('QUERY_STATS_HEADER') or '').strip().lower() in ('1', 'true', 'yes')
+QUERY_REPEAT_THRESHOLD = _safe_env_int('QUERY_REPEAT_THRESHOLD', 5)
+
+# Collectors currently interested in SQL statements (request scope, test budgets)
+_QUERY_COLLECTORS = contextvars.ContextVar('query_collectors', default=())
+_QUERY_METRICS = {}
+_QUERY_METRICS_LOCK = threading.Lock()
+
+
+class _QueryStats:
+    """Statement count, DB time and per-statement repeats seen by one collector."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.seconds += elapsed
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=None):
+        """Statements issued at least `threshold` times; the usual N+1 signature."""
+        threshold = threshold or QUERY_REPEAT_THRESHOLD
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+@contextmanager
+def _collect_query_stats():
+    """Record every SQL statement executed in this context (and nested requests)."""
+    stats = _QueryStats()
+    token = _QUERY_COLLECTORS.set(_QUERY_COLLECTORS.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _QUERY_COLLECTORS.reset(token)
+
+
+# The start time lives on the statement's execution context rather than on the
+# connection, so a statement that raises leaves nothing behind for the next one
+def _before_cursor_execute(_conn, _cursor, _statement, _parameters, context, _executemany):
+    if context is not None and _QUERY_COLLECTORS.get():
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(_conn, _cursor, statement, _parameters, context, _executemany):
+    collectors = _QUERY_COLLECTORS.get()
+    started = getattr(context, '_query_started', None)
+    if not collectors or started is None:
+        return
+    del context._query_started
+    elapsed = time.perf_counter() - started
+    for stats in collectors:
+        stats.record(statement, elapsed)
+
+
+def _install_query_instrumentation(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@app.before_request
+def _start_request_query_stats():
+    stats = _QueryStats()
+    g.query_stats = stats
+    g.query_stats_token = _QUERY_COLLECTORS.set(_QUERY_COLLECTORS.get() + (stats,))
+
+
+@app.after_request
+def _report_request_query_stats(response):
+    stats = g.get('query_stats')
+    if stats is None:
+        return response
+    repeated = stats.repeated()
+    if repeated:
+        sql, times = max(repeated.items(), key=lambda item: item[1])
+        app.logger.warning(
+            'Possible N+1 on %s: statement ran %d times: %s', request.endpoint, times, ' '.join(sql.split())[:200]
+        )
+    with _QUERY_METRICS_LOCK:
+        # Unrouted paths (404 scans) share one key so the table stays bounded by the routes
+        metrics = _QUERY_METRICS.setdefault(request.endpoint or '<unmatched>', {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_seconds': 0.0,
+            'repeated_requests': 0,
+        })
+        metrics['requests'] += 1
+        metrics['queries'] += stats.count
+        metrics['max_queries'] = max(metrics['max_queries'], stats.count)
+        metrics['db_seconds'] += stats.seconds
+        if repeated:
+            metrics['repeated_requests'] += 1
+    if app.debug or QUERY_STATS_HEADER:
+        db_ms = stats.seconds * 1000.0
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Time-Ms'] = f'{db_ms:.2f}'
+        response.headers['Server-Timing'] = f'db;dur={db_ms:.2f};desc="{stats.count} queries"'
+    return response
+
+
+@app.teardown_request
+def _finish_request_query_stats(_exc):
+    token = g.pop('query_stats_token', None)
+    if token is not None:
+        try:
+            _QUERY_COLLECTORS.reset(token)
+        except ValueError:
+            # Token from another context (e.g. streamed response); just drop ours
+            pass
+
+
+def _query_metrics_snapshot():
+    with _QUERY_METRICS_LOCK:
+        snapshot = {endpoint: dict(values) for endpoint, values in _QUERY_METRICS.items()}
+    for values in snapshot.values():
+        requests_seen = values['requests'] or 1
+        values['avg_queries'] = round(values['queries'] / requests_seen, 2)
+        values['avg_db_ms'] = round(values['db_seconds'] * 1000.0 / requests_seen, 2)
+        values['db_seconds'] = round(values['db_seconds'], 4)
+    return snapshot
+
+
 DEFAULT_ADMIN_EMAIL = (os.getenv('DEFAULT_ADMIN_EMAIL') or '').strip().lower()
 DEFAULT_ADMIN_PASSWORD = (os.getenv('DEFAULT_ADMIN_PASSWORD') or '').strip() or None
 DEMO_USER_EMAILS = {
@@ -124,6 +516,8 @@ TEST_USER_EMAIL_PATTERNS = [
 ]
 
 SESSION_TTL_SECONDS = max(300, _safe_env_int('SESSION_TTL_SECONDS', 1800))
+# How often a signed-in session re-reads its account to notice deletion
+SESSION_USER_RECHECK_SECONDS = _safe_env_int('SESSION_USER_RECHECK_SECONDS', 60)
 MAX_ACTIVE_SESSIONS = max(25, _safe_env_int('MAX_ACTIVE_SESSIONS', 200))
 MAX_SESSION_QUESTIONS = min(25, max(1, _safe_env_int('MAX_SESSION_QUESTIONS', 10)))
 ALLOWED_ROLES = set(SERVICE_ALLOWED_ROLES)
@@ -136,9 +530,55 @@ ALLOWED_IMAGE_MIMETYPES = {
     'image/gif',
     'image/webp',
 }
+AVATAR_FILE_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR') or os.path.join(app.instance_path, 'avatar_cache')
+AVATAR_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+AVATAR_THUMBNAIL_SIZES = (64, 128, 256)
+# Thumbnail size used for the user's own avatar (dashboard, navbar); leaderboard rows use 128
+AVATAR_PROFILE_SIZE = 256
+AVATAR_THUMBNAIL_FORMATS = {'webp': 'image/webp', 'png': 'image/png'}
+AVATAR_MAX_PIXELS = 40_000_000
 OTP_MAX_ATTEMPTS = max(1, _safe_env_int('OTP_MAX_ATTEMPTS', 5))
+USERNAME_INSERT_ATTEMPTS = 3
+# Profile.username is String(120); generated names keep room for a suffix of up to
+# USERNAME_SUFFIX_DIGITS characters (a numeric counter or the random fallback)
+USERNAME_MAX_LENGTH = 120
+USERNAME_SUFFIX_DIGITS = 6
+RATE_LIMIT_ENABLED = (os.getenv('RATE_LIMIT_ENABLED') or '1').strip().lower() not in ('0', 'false', 'no')
+RATE_LIMIT_IP_BURST = _safe_env_int('RATE_LIMIT_IP_BURST', 20)
+RATE_LIMIT_IP_PER_MINUTE = _safe_env_int('RATE_LIMIT_IP_PER_MINUTE', 10)
+RATE_LIMIT_IDENTIFIER_BURST = _safe_env_int('RATE_LIMIT_IDENTIFIER_BURST', 5)
+RATE_LIMIT_IDENTIFIER_PER_MINUTE = _safe_env_int('RATE_LIMIT_IDENTIFIER_PER_MINUTE', 2)
+RATE_LIMIT_MAX_KEYS = _safe_env_int('RATE_LIMIT_MAX_KEYS', 100_000)
+# Reverse proxies in front of the app whose X-Forwarded-For can be trusted for the client IP
+TRUSTED_PROXY_COUNT = _safe_env_int('TRUSTED_PROXY_COUNT', 0)
+USER_PURGE_ASYNC_THRESHOLD = _safe_env_int('USER_PURGE_ASYNC_THRESHOLD', 5000)
+USER_PURGE_BATCH_SIZE = _safe_env_int('USER_PURGE_BATCH_SIZE', 1000)
+# How long a worker's claim on a purge holds before another worker may take it over
+USER_PURGE_CLAIM_SECONDS = _safe_env_int('USER_PURGE_CLAIM_SECONDS', 3600)
+LEADERBOARD_CACHE_TTL_SECONDS = _safe_env_int('LEADERBOARD_CACHE_TTL_SECONDS', 30)
+# Embed the first profile/results/time-stats payloads in the dashboard render
+DASHBOARD_BOOTSTRAP = (os.getenv('DASHBOARD_BOOTSTRAP') or '1').strip().lower() not in ('0', 'false', 'no')
+DASHBOARD_BUNDLE_TTL_SECONDS = _safe_env_int('DASHBOARD_BUNDLE_TTL_SECONDS', 15)
+DASHBOARD_BUNDLE_MAX_USERS = _safe_env_int('DASHBOARD_BUNDLE_MAX_USERS', 500)
+# Off by default: the buffer lives in process memory and is drained by a daemon thread and
+# atexit, which a frozen or recycled serverless instance (the Vercel deploy) never runs
+TIME_LOG_WRITE_BEHIND = (os.getenv('TIME_LOG_WRITE_BEHIND') or '').strip().lower() in ('1', 'true', 'yes')
+TIME_LOG_FLUSH_INTERVAL_SECONDS = _safe_env_int('TIME_LOG_FLUSH_INTERVAL_SECONDS', 10)
+TIME_LOG_FLUSH_THRESHOLD = _safe_env_int('TIME_LOG_FLUSH_THRESHOLD', 500)
+# How often the flusher recounts the admin time-log counters from TimeLog
+TIME_LOG_RECONCILE_SECONDS = _safe_env_int('TIME_LOG_RECONCILE_SECONDS', 3600)
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+TEMPLATE_WARMUP = (os.getenv('TEMPLATE_WARMUP') or '').strip().lower() in ('1', 'true', 'yes')
 
 app.config['MAX_CONTENT_LENGTH'] = PROFILE_UPLOAD_MAX_BYTES
+if TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
 
 LEADERBOARD_BADGES = [
     {'label': 'Interview Hero', 'asset': 'assets/interviewhero.png'},
@@ -222,15 +662,74 @@ def _extract_difficulty_from_details(details):
     return None
 
 
+def _load_details_dict(details):
+    """Decode a stored result details payload into a dict (empty when unusable)."""
+    if isinstance(details, dict):
+        return details
+    if not details or not isinstance(details, str):
+        return {}
+    try:
+        payload = json.loads(details)
+    except (TypeError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _result_scoring_fields(kind, score, role=None, difficulty=None):
+    """Compute the denormalized role/difficulty/points columns stored on a Result."""
+    mode = 'quiz' if (kind or '').lower() == 'quiz' else 'ai'
+    role_value = str(role).strip()[:120] if role else ''
+    difficulty_value = str(difficulty).strip()[:32] if difficulty else ''
+    return {
+        'role': role_value or None,
+        'difficulty': difficulty_value or None,
+        'points': calculate_points(mode, score, difficulty_value or 'Beginner'),
+    }
+
+
+def _result_detail_summary(details):
+    """Extract the list-view columns (question count, duration) from a details payload."""
+    payload = _load_details_dict(details)
+    questions = payload.get('questions')
+    duration_seconds = payload.get('duration_seconds')
+    if duration_seconds is None and payload.get('duration_minutes') is not None:
+        try:
+            duration_seconds = float(payload.get('duration_minutes')) * 60.0
+        except (TypeError, ValueError):
+            duration_seconds = None
+    try:
+        duration_seconds = round(float(duration_seconds), 2) if duration_seconds is not None else None
+    except (TypeError, ValueError):
+        duration_seconds = None
+    return {
+        'question_count': len(questions) if isinstance(questions, list) else 0,
+        'duration_seconds': duration_seconds,
+    }
+
+
 def _aggregate_points_for_users(user_ids):
     """Return per-user point totals split by mode for leaderboard aggregation."""
     if not user_ids:
         return {}
 
     initial = {uid: {'total': 0, 'ai': 0, 'quiz': 0} for uid in user_ids}
+    mode_expr = case((Result.kind == 'quiz', 'quiz'), else_='ai')
 
     try:
-        rows = (
+        summed_rows = (
+            db.session.query(
+                Result.user_id,
+                mode_expr.label('mode'),
+                func.sum(Result.points).label('points'),
+            )
+            .filter(Result.user_id.in_(list(user_ids)))
+            .filter(Result.score.isnot(None))
+            .filter(Result.points.isnot(None))
+            .group_by(Result.user_id, mode_expr)
+            .all()
+        )
+        # Rows written before the points column existed and not yet backfilled
+        legacy_rows = (
             db.session.query(
                 Result.user_id,
                 Result.score,
@@ -239,30 +738,38 @@ def _aggregate_points_for_users(user_ids):
             )
             .filter(Result.user_id.in_(list(user_ids)))
             .filter(Result.score.isnot(None))
+            .filter(Result.points.is_(None))
             .all()
         )
     except Exception as exc:
         app.logger.exception('Failed to aggregate leaderboard points: %s', exc)
         return initial
 
-    for user_id, score, kind, details in rows:
-        mode = 'quiz' if (kind or '').lower() == 'quiz' else 'ai'
-        difficulty = _extract_difficulty_from_details(details) or 'Beginner'
-        points_value = calculate_points(mode, score, difficulty)
+    def _add(user_id, mode, points_value):
         if points_value <= 0:
-            continue
+            return
         bucket = initial.setdefault(user_id, {'total': 0, 'ai': 0, 'quiz': 0})
         bucket['total'] += points_value
-        if mode == 'quiz':
-            bucket['quiz'] += points_value
-        else:
-            bucket['ai'] += points_value
+        bucket['quiz' if mode == 'quiz' else 'ai'] += points_value
+
+    for user_id, mode, points_value in summed_rows:
+        _add(user_id, mode, int(points_value or 0))
+
+    for user_id, score, kind, details in legacy_rows:
+        mode = 'quiz' if (kind or '').lower() == 'quiz' else 'ai'
+        difficulty = _extract_difficulty_from_details(details) or 'Beginner'
+        _add(user_id, mode, calculate_points(mode, score, difficulty))
 
     return initial
 
 
-def _avatar_url_for(profile_pic_value, user_id, *, cache_bust=False):
-    """Resolve stored profile picture value to a usable URL."""
+def _avatar_url_for(profile_pic_value, user_id, *, version=None, size=None):
+    """Resolve stored profile picture value to a usable URL.
+
+    `version` (see `_avatar_version`) is appended to DB-backed avatar URLs so
+    they stay stable until the image changes and can be cached as immutable;
+    `size` asks for a square thumbnail of roughly that many pixels.
+    """
     value = (profile_pic_value or '').strip()
     if not value:
         return None
@@ -273,15 +780,104 @@ def _avatar_url_for(profile_pic_value, user_id, *, cache_bust=False):
             base = url_for('profile_media', user_id=user_id)
         else:
             base = f"/media/profile/{user_id}"
-        if cache_bust:
+        params = []
+        if version:
+            params.append(f"v={version}")
+        if size:
+            params.append(f"size={int(size)}")
+        if params:
             separator = '&' if '?' in base else '?'
-            return f"{base}{separator}v={int(time.time())}"
+            return f"{base}{separator}{'&'.join(params)}"
         return base
     if value.startswith('/'):
         return value
     return f"/static/{value}".replace('\\', '/')
 
-bcrypt = Bcrypt(app)
+# -------- Password hashing --------
+PASSWORD_HASH_ALGORITHM = (os.getenv('PASSWORD_HASH_ALGORITHM') or 'scrypt').strip().lower()
+# Unset means calibrate the cost to PASSWORD_HASH_TARGET_MS on this host at startup
+PASSWORD_HASH_COST = _safe_env_int('PASSWORD_HASH_COST', 0)
+PASSWORD_HASH_TARGET_MS = _safe_env_int('PASSWORD_HASH_TARGET_MS', 100)
+PASSWORD_HASH_WORKERS = _safe_env_int('PASSWORD_HASH_WORKERS', os.cpu_count() or 2)
+PASSWORD_HASH_QUEUE_LIMIT = _safe_env_int('PASSWORD_HASH_QUEUE_LIMIT', 32)
+PASSWORD_HASH_WAIT_SECONDS = _safe_env_int('PASSWORD_HASH_WAIT_SECONDS', 10)
+
+
+class _PasswordHashingBusy(RuntimeError):
+    """Raised when every hashing slot stays taken for PASSWORD_HASH_WAIT_SECONDS."""
+
+
+def _build_password_policy():
+    algorithm = PASSWORD_HASH_ALGORITHM
+    if algorithm not in PASSWORD_HASH_ALGORITHMS:
+        app.logger.warning('Unknown PASSWORD_HASH_ALGORITHM %r, using scrypt', algorithm)
+        algorithm = 'scrypt'
+    if PASSWORD_HASH_COST:
+        return HashPolicy(algorithm, PASSWORD_HASH_COST)
+    try:
+        return calibrate_policy(algorithm, PASSWORD_HASH_TARGET_MS)
+    except Exception as exc:
+        app.logger.warning('Password hash calibration failed, using default cost: %s', exc)
+        return HashPolicy(algorithm)
+
+
+_PASSWORD_POLICY = _build_password_policy()
+_PASSWORD_HASH_EXECUTOR = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+# Running hashes plus the ones allowed to wait for a worker; beyond that callers block, then give up
+_PASSWORD_HASH_SLOTS = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+_PASSWORD_HASH_STATS = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0}
+_PASSWORD_HASH_STATS_LOCK = threading.Lock()
+
+
+def _count_password_hash(name):
+    with _PASSWORD_HASH_STATS_LOCK:
+        _PASSWORD_HASH_STATS[name] += 1
+
+
+def _run_password_hash(fn, *args):
+    """Run a hash or verify on the bounded pool so bursts cannot put every request thread on CPU."""
+    if not _PASSWORD_HASH_SLOTS.acquire(timeout=PASSWORD_HASH_WAIT_SECONDS):
+        _count_password_hash('rejected')
+        raise _PasswordHashingBusy('Password hashing capacity exhausted')
+    try:
+        return _PASSWORD_HASH_EXECUTOR.submit(fn, *args).result()
+    finally:
+        _PASSWORD_HASH_SLOTS.release()
+
+
+def _hash_password(password):
+    _count_password_hash('hashed')
+    return _run_password_hash(_PASSWORD_POLICY.hash, password)
+
+
+def _verify_password(stored, password):
+    _count_password_hash('verified')
+    return _run_password_hash(verify_password, stored, password)
+
+
+def _rehash_password_if_stale(user, password):
+    """After a successful login, re-hash under the current policy if the stored hash is older or weaker."""
+    if not _PASSWORD_POLICY.needs_rehash(user.password_hash):
+        return False
+    try:
+        user.password_hash = _hash_password(password)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Password rehash for user %s skipped: %s', user.id, exc)
+        return False
+    _count_password_hash('rehashed')
+    return True
+
+
+def _password_hash_stats():
+    with _PASSWORD_HASH_STATS_LOCK:
+        stats = dict(_PASSWORD_HASH_STATS)
+    stats['policy'] = _PASSWORD_POLICY.describe()
+    stats['workers'] = PASSWORD_HASH_WORKERS
+    stats['queue_limit'] = PASSWORD_HASH_QUEUE_LIMIT
+    return stats
+
 
 oauth = OAuth(app)
 
@@ -359,6 +955,24 @@ def _cleanup_sessions():
 SMTP_EMAIL = (os.getenv('SMTP_EMAIL_ADDRESS') or '').strip()
 _raw_smtp_password = os.getenv('SMTP_APP_PASSWORD') or ''
 SMTP_APP_PASSWORD = ''.join(_raw_smtp_password.split())
+MAIL_TRANSPORT = (os.getenv('MAIL_TRANSPORT') or 'smtp').strip().lower()
+MAIL_SMTP_HOST = (os.getenv('MAIL_SMTP_HOST') or 'smtp.gmail.com').strip()
+MAIL_SMTP_PORT = _safe_env_int('MAIL_SMTP_PORT', 587)
+MAIL_SMTP_STARTTLS = (os.getenv('MAIL_SMTP_STARTTLS') or '1').strip().lower() not in ('0', 'false', 'no')
+MAIL_SMTP_IDLE_SECONDS = _safe_env_int('MAIL_SMTP_IDLE_SECONDS', 60)
+# Off by default: serverless hosts (the Vercel deploy) may never run a background thread after
+# the response. Enable it only under a long-lived server such as gunicorn.
+MAIL_DISPATCH_ASYNC = (os.getenv('MAIL_DISPATCH_ASYNC') or '').strip().lower() in ('1', 'true', 'yes')
+MAIL_BATCH_SIZE = _safe_env_int('MAIL_BATCH_SIZE', 20)
+MAIL_MAX_ATTEMPTS = _safe_env_int('MAIL_MAX_ATTEMPTS', 5)
+MAIL_RETRY_BASE_SECONDS = _safe_env_int('MAIL_RETRY_BASE_SECONDS', 15)
+MAIL_POLL_SECONDS = _safe_env_int('MAIL_POLL_SECONDS', 30)
+# How long a claimed message is reserved for one dispatcher before another may retry it
+MAIL_CLAIM_SECONDS = _safe_env_int('MAIL_CLAIM_SECONDS', 300)
+# Failed rows (recipient, subject and error only) are kept this long for /admin/metrics/mail
+MAIL_FAILED_RETENTION_DAYS = _safe_env_int('MAIL_FAILED_RETENTION_DAYS', 7)
+# A temporary password not delivered within this window is dropped; the old password stays valid
+PASSWORD_RESET_MAIL_TTL_SECONDS = _safe_env_int('PASSWORD_RESET_MAIL_TTL_SECONDS', 3600)
 
 
 # --- User model for auth ---
@@ -369,25 +983,15 @@ class User(db.Model):
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     is_admin = db.Column(db.Boolean, nullable=False, default=False)
+    # Derived from DEMO_USER_EMAILS / TEST_USER_EMAIL_PATTERNS whenever the email is written
+    is_excluded = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    # Set when an admin deletion is queued; the account is hidden and its rows purged in the background
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Set by the worker running the purge so other workers leave it alone
+    purge_claimed_at = db.Column(db.DateTime, nullable=True)
 
     def check_password(self, password):
-        stored = self.password_hash or ''
-        if not stored:
-            return False
-
-        if stored.startswith(('$2a$', '$2b$', '$2y$')):
-            try:
-                return bcrypt.check_password_hash(stored, password)
-            except ValueError:
-                return False
-
-        if ':' in stored:
-            try:
-                return wz_check_password_hash(stored, password)
-            except ValueError:
-                return False
-
-        return False
+        return _verify_password(self.password_hash, password)
 
 
 # Optional: store past interview/quiz results
@@ -396,9 +1000,100 @@ class Result(db.Model):
     user_id = db.Column(db.Integer, nullable=False)
     title = db.Column(db.String(255), nullable=False)
     score = db.Column(db.Float, nullable=True)
-    details = db.Column(db.Text, nullable=True)
+    # Full question/answer payload; deferred so listing and scoring never pull it by accident
+    details = db.deferred(db.Column(db.Text, nullable=True))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     kind = db.Column(db.String(32), nullable=True)  # 'interview' or 'quiz'
+    # Denormalized from details at write time so leaderboard math stays in SQL
+    role = db.Column(db.String(120), nullable=True, index=True)
+    difficulty = db.Column(db.String(32), nullable=True, index=True)
+    points = db.Column(db.Integer, nullable=True, index=True)
+    question_count = db.Column(db.Integer, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        # History pages: WHERE user_id = ? ORDER BY timestamp DESC, id DESC
+        db.Index('ix_result_user_timestamp', user_id, timestamp.desc(), id.desc()),
+        # Per-kind counts and point sums for one or many users
+        db.Index('ix_result_user_kind', 'user_id', 'kind'),
+    )
+
+
+def _mark_caches_dirty(session_obj, *names):
+    """Record which in-process caches must be dropped once the session commits.
+
+    Names are cache names, or ('dashboard', user_id) for one user's dashboard bundle.
+    """
+    if session_obj is not None:
+        session_obj.info.setdefault('dirty_caches', set()).update(names)
+
+
+@event.listens_for(Result, 'after_insert')
+@event.listens_for(Result, 'after_update')
+@event.listens_for(Result, 'after_delete')
+def _result_row_changed(_mapper, _connection, target):
+    _mark_caches_dirty(object_session(target), 'leaderboard', ('dashboard', target.user_id))
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def _sync_user_excluded_flag(_mapper, _connection, target):
+    if target.is_excluded is not None and not inspect(target).attrs.email.history.has_changes():
+        return
+    previous = bool(target.is_excluded)
+    target.is_excluded = _is_excluded_email(target.email)
+    if target.is_excluded != previous:
+        _mark_caches_dirty(object_session(target), 'excluded_users')
+
+
+@event.listens_for(User, 'after_delete')
+def _user_row_deleted(_mapper, _connection, target):
+    _mark_caches_dirty(object_session(target), ('dashboard', target.id))
+    if target.is_excluded:
+        _mark_caches_dirty(object_session(target), 'excluded_users')
+
+
+@event.listens_for(User, 'after_update')
+def _user_row_updated(_mapper, _connection, target):
+    # Name, email and gender are part of the dashboard profile
+    _mark_caches_dirty(object_session(target), ('dashboard', target.id))
+
+
+@event.listens_for(OrmSession, 'after_bulk_delete')
+@event.listens_for(OrmSession, 'after_bulk_update')
+def _rows_bulk_changed(context):
+    # Bulk statements do not say which users they touched, so every dashboard bundle goes
+    _mark_caches_dirty(context.session, 'dashboard')
+    if context.mapper.class_ in (Result, ProfileMedia):
+        _mark_caches_dirty(context.session, 'leaderboard')
+    elif context.mapper.class_ is User:
+        _mark_caches_dirty(context.session, 'excluded_users')
+
+
+@event.listens_for(OrmSession, 'after_commit')
+def _invalidate_caches_on_commit(session_obj):
+    dirty = session_obj.info.pop('dirty_caches', None)
+    if not dirty:
+        return
+    if 'excluded_users' in dirty:
+        _invalidate_excluded_user_ids()
+        # Exclusions filter the ranking, so the leaderboard must follow
+        dirty.add('leaderboard')
+    if 'leaderboard' in dirty:
+        _invalidate_leaderboard_cache()
+    if 'mail_outbox' in dirty:
+        _wake_mail_dispatcher()
+    if 'dashboard' in dirty:
+        _invalidate_dashboard_bundles()
+    else:
+        user_ids = {name[1] for name in dirty if isinstance(name, tuple) and name[0] == 'dashboard'}
+        if user_ids:
+            _invalidate_dashboard_bundles(user_ids)
+
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _discard_dirty_caches(session_obj):
+    session_obj.info.pop('dirty_caches', None)
 
 def _ensure_result_details_column():
     """Best-effort migration to add 'details' column to result table if missing.
@@ -422,6 +1117,174 @@ def _ensure_result_details_column():
             pass
 
 
+def _add_missing_columns(model, column_ddl):
+    """Add columns declared on `model` but missing from its existing table, then create its indexes.
+
+    Uses the SQLAlchemy inspector so it also applies to PostgreSQL deployments.
+    """
+    table = model.__table__
+    try:
+        existing = {col['name'] for col in inspect(db.engine).get_columns(table.name)}
+        preparer = db.engine.dialect.identifier_preparer
+        missing = [(name, ddl) for name, ddl in column_ddl if name not in existing]
+        for name, ddl in missing:
+            db.session.execute(
+                text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(name)} {ddl}")
+            )
+        if missing:
+            db.session.commit()
+    except Exception:
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+    _ensure_table_indexes(model)
+
+
+def _ensure_table_indexes(model):
+    """Create any index declared on `model` that an existing table is missing.
+
+    Each index is attempted separately so one failure (e.g. duplicate usernames
+    blocking a unique index) does not prevent the others from being created.
+    """
+    for index in model.__table__.indexes:
+        try:
+            index.create(bind=db.engine, checkfirst=True)
+        except Exception as exc:
+            app.logger.warning('Could not create index %s: %s', index.name, exc)
+
+
+def _dedupe_profile_usernames():
+    """Rename all but the oldest profile of each duplicated username; returns how many were renamed.
+
+    Databases created before uq_profile_username may hold duplicates, which block the index.
+    """
+    profile = Profile.__table__
+    duplicated = [
+        row[0]
+        for row in db.session.execute(
+            select(profile.c.username)
+            .where(profile.c.username.isnot(None))
+            .group_by(profile.c.username)
+            .having(func.count() > 1)
+        )
+    ]
+    renamed = 0
+    for username in duplicated:
+        extra_ids = [
+            row[0]
+            for row in db.session.execute(
+                select(profile.c.id).where(profile.c.username == username).order_by(profile.c.id).offset(1)
+            )
+        ]
+        for profile_id in extra_ids:
+            # Core UPDATE so each rename is visible to the next _generate_unique_username lookup
+            db.session.execute(
+                profile.update()
+                .where(profile.c.id == profile_id)
+                .values(username=_generate_unique_username(username))
+            )
+            renamed += 1
+    db.session.commit()
+    return renamed
+
+
+def _has_index(model, name):
+    return any(index['name'] == name for index in inspect(db.engine).get_indexes(model.__table__.name))
+
+
+def _ensure_profile_username_index():
+    """Create uq_profile_username, removing duplicate usernames first if they block it.
+
+    Returns True when the index exists. Without it concurrent updates can store the same
+    username twice, so a failure is logged as an error rather than a warning.
+    """
+    if _has_index(Profile, 'uq_profile_username'):
+        return True
+    try:
+        renamed = _dedupe_profile_usernames()
+        if renamed:
+            app.logger.warning('Renamed %s profiles with duplicate usernames', renamed)
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Duplicate username cleanup failed: %s', exc)
+    _ensure_table_indexes(Profile)
+    if _has_index(Profile, 'uq_profile_username'):
+        return True
+    app.logger.error(
+        'Unique index uq_profile_username is missing; usernames are not protected against duplicates. '
+        'Run `flask --app app dedupe-usernames` to repair the table.'
+    )
+    return False
+
+
+def _ensure_result_scoring_columns():
+    """Add the denormalized role/difficulty/points and list-view columns to result on existing databases."""
+    _add_missing_columns(
+        Result,
+        (
+            ('role', 'VARCHAR(120)'),
+            ('difficulty', 'VARCHAR(32)'),
+            ('points', 'INTEGER'),
+            ('question_count', 'INTEGER'),
+            ('duration_seconds', 'FLOAT'),
+        ),
+    )
+
+
+def _ensure_user_excluded_column():
+    """Add the indexed is_excluded flag and deletion tombstone columns to the user table on existing databases."""
+    _add_missing_columns(
+        User,
+        (
+            ('is_excluded', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+            ('deleted_at', 'TIMESTAMP'),
+            ('purge_claimed_at', 'TIMESTAMP'),
+        ),
+    )
+
+
+def _ensure_mail_outbox_columns():
+    """Add the template and password-reset columns to mail_outbox on existing databases."""
+    _add_missing_columns(MailOutbox, (('template', 'VARCHAR(32)'), ('user_id', 'INTEGER')))
+
+
+def _ensure_profile_media_columns():
+    """Add the avatar content hash column to profile_media on existing databases."""
+    _add_missing_columns(ProfileMedia, (('content_hash', 'VARCHAR(64)'),))
+
+
+def _backfill_result_scoring_columns(batch_size=500):
+    """Populate the denormalized result columns for rows saved before those columns existed.
+
+    Processes rows in batches and returns the number of rows updated.
+    """
+    updated = 0
+    while True:
+        rows = (
+            db.session.query(Result.id, Result.kind, Result.score, Result.details)
+            .filter(or_(Result.points.is_(None), Result.question_count.is_(None)))
+            .order_by(Result.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        mappings = []
+        for result_id, kind, score, details in rows:
+            payload = _load_details_dict(details)
+            fields = _result_scoring_fields(kind, score, payload.get('role'), payload.get('difficulty'))
+            fields.update(_result_detail_summary(payload))
+            fields['id'] = result_id
+            mappings.append(fields)
+        db.session.bulk_update_mappings(Result, mappings)
+        db.session.commit()
+        updated += len(mappings)
+        if len(rows) < batch_size:
+            break
+    return updated
+
+
 def _ensure_user_admin_column():
     """Make sure the user table has an is_admin flag for access control."""
     try:
@@ -457,25 +1320,82 @@ class UserMeta(db.Model):
 class Profile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, unique=True, nullable=False)
-    username = db.Column(db.String(120), nullable=True)
+    username = db.Column(db.String(USERNAME_MAX_LENGTH), nullable=True)
     bio = db.Column(db.Text, nullable=True)
     university = db.Column(db.String(255), nullable=True)
     location = db.Column(db.String(255), nullable=True)
     pronouns = db.Column(db.String(64), nullable=True)
 
+    __table_args__ = (
+        # Login-by-username and availability checks; NULL usernames are allowed to repeat
+        db.Index('uq_profile_username', 'username', unique=True),
+    )
+
 
 class ProfileMedia(db.Model):
     user_id = db.Column(db.Integer, primary_key=True)
     content_type = db.Column(db.String(128), nullable=True)
-    data = db.Column(LargeBinary, nullable=True)
+    # Only loaded on an avatar cache miss; metadata queries never pull the blob
+    data = db.deferred(db.Column(LargeBinary, nullable=True))
+    # sha256 of `data`; names the on-disk cache file and doubles as the ETag
+    content_hash = db.Column(db.String(64), nullable=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+@event.listens_for(ProfileMedia, 'after_insert')
+@event.listens_for(ProfileMedia, 'after_update')
+@event.listens_for(ProfileMedia, 'after_delete')
+def _profile_media_changed(_mapper, _connection, target):
+    # Leaderboard entries and the dashboard profile embed versioned avatar URLs
+    _mark_caches_dirty(object_session(target), 'leaderboard', ('dashboard', target.user_id))
+
+
+@event.listens_for(Profile, 'after_insert')
+@event.listens_for(Profile, 'after_update')
+@event.listens_for(Profile, 'after_delete')
+@event.listens_for(UserMeta, 'after_insert')
+@event.listens_for(UserMeta, 'after_update')
+@event.listens_for(UserMeta, 'after_delete')
+def _profile_row_changed(_mapper, _connection, target):
+    _mark_caches_dirty(object_session(target), ('dashboard', target.user_id))
+
+
 class OTPVerification(db.Model):
     email = db.Column(db.String(255), primary_key=True)
     otp = db.Column(db.String(6), nullable=False)
     expiry_time = db.Column(db.DateTime, nullable=False)
     attempts = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MailOutbox(db.Model):
+    """Outbound email waiting for delivery (or a retry) by the mail dispatcher.
+
+    OTP and password-reset rows carry a `template` and no body: the code is read from
+    OTPVerification, and the temporary password is generated, when the message is sent.
+    Rows are deleted once sent; undeliverable rows are kept as 'failed' with the body
+    cleared for MAIL_FAILED_RETENTION_DAYS.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending | sending | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Mail about a short-lived secret is pointless once the secret has expired
+    expires_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # 'otp' | 'password_reset'; the body is rendered at send time
+    template = db.Column(db.String(32), nullable=True)
+    # Password resets: the account whose password changes in the commit that records delivery
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index('ix_mail_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+
 def _ensure_usermeta_columns():
     """Ensure recently added columns exist on user_meta for backward compatibility."""
     try:
@@ -514,35 +1434,84 @@ def _ensure_otp_attempts_column():
             pass
 
 
-def _get_excluded_user_ids():
-    """Return user IDs that should be hidden from admin views (demo/test accounts)."""
-    ids = set()
+def _is_excluded_email(email):
+    """Return True when an email belongs to a demo/test account hidden from analytics."""
+    normalized = (email or '').strip().lower()
+    if not normalized:
+        return False
+    if normalized in DEMO_USER_EMAILS:
+        return True
+    return any(pattern in normalized for pattern in TEST_USER_EMAIL_PATTERNS)
+
 
+def _sync_excluded_user_flags():
+    """Recompute User.is_excluded for every row from the current exclusion settings.
+
+    Runs once at startup so a change to DEMO_USER_EMAILS or TEST_USER_EMAIL_PATTERNS
+    takes effect; request paths only read the indexed flag. Returns the number of
+    users whose flag changed.
+    """
+    filters = []
     if DEMO_USER_EMAILS:
-        try:
-            rows = User.query.filter(User.email.in_(list(DEMO_USER_EMAILS))).all()
-            ids.update({row.id for row in rows if row and row.id is not None})
-        except Exception:
-            pass
+        # The allowlist is lowercased; stored emails may not be
+        filters.append(func.lower(User.email).in_(list(DEMO_USER_EMAILS)))
+    filters.extend(User.email.ilike(f"%{pattern}%") for pattern in TEST_USER_EMAIL_PATTERNS)
+    matches = or_(*filters) if filters else false()
 
-    if TEST_USER_EMAIL_PATTERNS:
-        try:
-            filters = [User.email.ilike(f"%{pattern}%") for pattern in TEST_USER_EMAIL_PATTERNS]
-            if filters:
-                for row in User.query.filter(or_(*filters)).all():
-                    if row and row.id is not None:
-                        ids.add(row.id)
-        except Exception:
-            pass
+    changed = User.query.filter(User.is_excluded.is_(False)).filter(matches).update(
+        {User.is_excluded: True}, synchronize_session=False
+    )
+    changed += User.query.filter(User.is_excluded.is_(True)).filter(~matches).update(
+        {User.is_excluded: False}, synchronize_session=False
+    )
+    db.session.commit()
+    return changed
 
-    return ids
 
+# Excluded IDs change only when users are created, re-emailed or deleted; those
+# commits invalidate the set, and the TTL bounds staleness across worker processes.
+_EXCLUDED_USER_IDS_TTL_SECONDS = 300
+_EXCLUDED_USER_IDS_CACHE = {
+    'ids': None,
+    'loaded_at': 0.0,
+    'generation': 0,
+}
+_EXCLUDED_USER_IDS_LOCK = threading.Lock()
 
-def _build_leaderboard(limit=20):
-    """Return aggregated leaderboard entries ordered by point totals."""
-    excluded_ids = _get_excluded_user_ids()
 
-    try:
+def _invalidate_excluded_user_ids():
+    with _EXCLUDED_USER_IDS_LOCK:
+        _EXCLUDED_USER_IDS_CACHE['ids'] = None
+        _EXCLUDED_USER_IDS_CACHE['generation'] += 1
+
+
+def _get_excluded_user_ids():
+    """Return user IDs that should be hidden from admin views (demo/test accounts)."""
+    with _EXCLUDED_USER_IDS_LOCK:
+        ids = _EXCLUDED_USER_IDS_CACHE['ids']
+        age = time.monotonic() - _EXCLUDED_USER_IDS_CACHE['loaded_at']
+        if ids is not None and age < _EXCLUDED_USER_IDS_TTL_SECONDS:
+            return ids
+        generation = _EXCLUDED_USER_IDS_CACHE['generation']
+
+    try:
+        rows = db.session.query(User.id).filter(User.is_excluded.is_(True)).all()
+    except Exception:
+        return frozenset()
+    ids = frozenset(row.id for row in rows if row.id is not None)
+
+    with _EXCLUDED_USER_IDS_LOCK:
+        if _EXCLUDED_USER_IDS_CACHE['generation'] == generation:
+            _EXCLUDED_USER_IDS_CACHE['ids'] = ids
+            _EXCLUDED_USER_IDS_CACHE['loaded_at'] = time.monotonic()
+    return ids
+
+
+def _compute_leaderboard_entries():
+    """Return every ranked leaderboard entry, or None when the query fails."""
+    excluded_ids = _get_excluded_user_ids()
+
+    try:
         score_query = (
             db.session.query(
                 Result.user_id.label('user_id'),
@@ -564,9 +1533,11 @@ def _build_leaderboard(limit=20):
 
         rows = (
             db.session.query(
-                User,
-                Profile,
-                UserMeta,
+                User.id,
+                User.name,
+                User.email,
+                Profile.username,
+                UserMeta.profile_pic,
                 score_subquery.c.avg_score,
                 score_subquery.c.quiz_avg_score,
                 score_subquery.c.interview_avg_score,
@@ -578,23 +1549,27 @@ def _build_leaderboard(limit=20):
             .join(score_subquery, score_subquery.c.user_id == User.id)
             .outerjoin(Profile, Profile.user_id == User.id)
             .outerjoin(UserMeta, UserMeta.user_id == User.id)
+            .filter(User.deleted_at.is_(None))
             .all()
         )
     except Exception as exc:
         app.logger.exception('Failed to build leaderboard: %s', exc)
-        return []
+        return None
 
     if not rows:
         return []
 
-    user_ids = [user.id for (user, *_rest) in rows]
+    user_ids = [row.id for row in rows]
     points_by_user = _aggregate_points_for_users(user_ids)
+    avatar_versions = _avatar_versions_for(user_ids)
 
     entries = []
     for (
-        user,
-        profile,
-        meta,
+        user_id,
+        user_name,
+        user_email,
+        profile_username,
+        profile_pic,
         avg_score,
         quiz_avg_score,
         interview_avg_score,
@@ -603,9 +1578,9 @@ def _build_leaderboard(limit=20):
         attempt_count,
         last_activity,
     ) in rows:
-        profile_username = (profile.username if profile and profile.username else None)
-        fallback_name = user.name or ''
-        fallback_email = (user.email.split('@')[0] if user and user.email else f'User {user.id}')
+        profile_username = profile_username or None
+        fallback_name = user_name or ''
+        fallback_email = (user_email.split('@')[0] if user_email else f'User {user_id}')
         display_name_raw = profile_username or fallback_name or fallback_email
         display_name = display_name_raw.strip() or fallback_email
 
@@ -615,9 +1590,10 @@ def _build_leaderboard(limit=20):
             initials = 'U'
 
         avatar_url = None
-        if meta and meta.profile_pic:
-            needs_bust = (meta.profile_pic or '').strip().startswith('media/profile/')
-            avatar_url = _avatar_url_for(meta.profile_pic, user.id, cache_bust=needs_bust)
+        avatar_url_large = None
+        if profile_pic:
+            avatar_url = _avatar_url_for(profile_pic, user_id, version=avatar_versions.get(user_id), size=128)
+            avatar_url_large = _avatar_url_for(profile_pic, user_id, version=avatar_versions.get(user_id), size=256)
 
         quiz_pct = int(round(quiz_avg_score)) if quiz_avg_score is not None else 0
         interview_pct = int(round(interview_avg_score)) if interview_avg_score is not None else 0
@@ -625,18 +1601,19 @@ def _build_leaderboard(limit=20):
         quiz_attempts = int(quiz_count or 0)
         interview_attempts = int(interview_count or 0)
 
-        points_data = points_by_user.get(user.id, {'total': 0, 'ai': 0, 'quiz': 0})
+        points_data = points_by_user.get(user_id, {'total': 0, 'ai': 0, 'quiz': 0})
 
         entries.append({
-            'user_id': user.id,
+            'user_id': user_id,
             'display_name': display_name,
-            'name': user.name,
+            'name': user_name,
             'username': profile_username,
             'average_score': float(avg_score) if avg_score is not None else 0.0,
             'score': int(round(avg_score)) if avg_score is not None else 0,
             'attempts': int(attempt_count or 0),
             'last_activity': last_activity,
             'avatar_url': avatar_url,
+            'avatar_url_large': avatar_url_large,
             'initials': initials,
             'badge_label': None,
             'badge_asset': None,
@@ -661,16 +1638,328 @@ def _build_leaderboard(limit=20):
         reverse=True,
     )
 
-    top_limit = max(1, int(limit or 0))
-    trimmed = entries[:top_limit]
-
-    for idx, entry in enumerate(trimmed, start=1):
+    for idx, entry in enumerate(entries, start=1):
         entry['rank'] = idx
         badge = LEADERBOARD_BADGES[idx - 1] if idx <= len(LEADERBOARD_BADGES) else None
         entry['badge_label'] = badge['label'] if badge else None
         entry['badge_asset'] = badge['asset'] if badge else None
 
-    return trimmed
+    return entries
+
+
+# Rankings only change when results are written, so the computed leaderboard is
+# shared across requests until it expires or a Result insert/update/delete commits.
+_LEADERBOARD_CACHE = {
+    'snapshot': None,
+    'generation': 0,
+}
+_LEADERBOARD_CACHE_STATS = {
+    'hits': 0,
+    'misses': 0,
+    'rebuilds': 0,
+    'coalesced': 0,
+    'invalidations': 0,
+}
+_LEADERBOARD_CACHE_LOCK = threading.Lock()
+_LEADERBOARD_REBUILD_LOCK = threading.Lock()
+
+
+def _leaderboard_snapshot_is_fresh(snapshot, now):
+    return (
+        snapshot is not None
+        and snapshot['generation'] == _LEADERBOARD_CACHE['generation']
+        and (now - snapshot['built_at']) < LEADERBOARD_CACHE_TTL_SECONDS
+    )
+
+
+def _invalidate_leaderboard_cache():
+    """Force the next leaderboard read to recompute rankings."""
+    with _LEADERBOARD_CACHE_LOCK:
+        _LEADERBOARD_CACHE['generation'] += 1
+        _LEADERBOARD_CACHE_STATS['invalidations'] += 1
+
+
+def _get_leaderboard_snapshot():
+    """Return the cached leaderboard snapshot, rebuilding it once when stale.
+
+    Concurrent callers that miss wait on a single rebuild instead of each
+    recomputing the rankings.
+    """
+    with _LEADERBOARD_CACHE_LOCK:
+        snapshot = _LEADERBOARD_CACHE['snapshot']
+        if _leaderboard_snapshot_is_fresh(snapshot, time.monotonic()):
+            _LEADERBOARD_CACHE_STATS['hits'] += 1
+            return snapshot
+        _LEADERBOARD_CACHE_STATS['misses'] += 1
+
+    with _LEADERBOARD_REBUILD_LOCK:
+        with _LEADERBOARD_CACHE_LOCK:
+            snapshot = _LEADERBOARD_CACHE['snapshot']
+            if _leaderboard_snapshot_is_fresh(snapshot, time.monotonic()):
+                _LEADERBOARD_CACHE_STATS['coalesced'] += 1
+                return snapshot
+            generation = _LEADERBOARD_CACHE['generation']
+
+        entries = _compute_leaderboard_entries()
+        if entries is None:
+            # Serve the previous rankings (if any) rather than caching a failure
+            return snapshot or {'entries': [], 'by_user': {}, 'built_at': 0.0, 'generation': -1}
+
+        rebuilt = {
+            'entries': entries,
+            'by_user': {entry['user_id']: entry for entry in entries},
+            'built_at': time.monotonic(),
+            'generation': generation,
+        }
+        with _LEADERBOARD_CACHE_LOCK:
+            _LEADERBOARD_CACHE['snapshot'] = rebuilt
+            _LEADERBOARD_CACHE_STATS['rebuilds'] += 1
+        return rebuilt
+
+
+def _build_leaderboard(limit=20):
+    """Return aggregated leaderboard entries ordered by point totals."""
+    entries = _get_leaderboard_snapshot()['entries']
+    top_limit = max(1, int(limit or 0))
+    return entries[:top_limit]
+
+
+def _get_leaderboard_entry(user_id):
+    """Return the ranked leaderboard entry for a single user, if they have one."""
+    if user_id is None:
+        return None
+    return _get_leaderboard_snapshot()['by_user'].get(user_id)
+
+
+def _public_leaderboard_entry(entry):
+    """Trim a cached leaderboard entry to the fields exposed over the JSON API."""
+    return {
+        'user_id': entry['user_id'],
+        'rank': entry.get('rank'),
+        'display_name': entry.get('display_name'),
+        'username': entry.get('username'),
+        'avatar_url': entry.get('avatar_url'),
+        'initials': entry.get('initials'),
+        'score': entry.get('score'),
+        'attempts': entry.get('attempts'),
+        'points_total': entry.get('points_total'),
+        'points_ai': entry.get('points_ai'),
+        'points_quiz': entry.get('points_quiz'),
+        'badge_label': entry.get('badge_label'),
+        'badge_asset': entry.get('badge_asset'),
+    }
+
+
+def _get_leaderboard_rank(user_id, neighbours=2):
+    """Return a user's rank, percentile and surrounding entries from the cached ranking.
+
+    The snapshot keeps every ranked user in order plus a user-id map, so the lookup
+    is constant time regardless of where the user sits in the ranking.
+    """
+    snapshot = _get_leaderboard_snapshot()
+    entries = snapshot['entries']
+    total = len(entries)
+    entry = snapshot['by_user'].get(user_id) if user_id is not None else None
+    if entry is None:
+        return {'rank': None, 'total': total, 'percentile': None, 'entry': None, 'above': [], 'below': []}
+
+    rank = entry['rank']
+    span = max(0, int(neighbours or 0))
+    index = rank - 1
+    percentile = 100.0 if total <= 1 else round(100.0 * (total - rank) / (total - 1), 1)
+    return {
+        'rank': rank,
+        'total': total,
+        'percentile': percentile,
+        'entry': _public_leaderboard_entry(entry),
+        'above': [_public_leaderboard_entry(e) for e in entries[max(0, index - span):index]],
+        'below': [_public_leaderboard_entry(e) for e in entries[index + 1:index + 1 + span]],
+    }
+
+
+def _leaderboard_cache_stats():
+    """Return hit/miss counters and staleness for the leaderboard cache."""
+    with _LEADERBOARD_CACHE_LOCK:
+        stats = dict(_LEADERBOARD_CACHE_STATS)
+        snapshot = _LEADERBOARD_CACHE['snapshot']
+        now = time.monotonic()
+        stats['ttl_seconds'] = LEADERBOARD_CACHE_TTL_SECONDS
+        stats['entries'] = len(snapshot['entries']) if snapshot else 0
+        stats['age_seconds'] = round(now - snapshot['built_at'], 3) if snapshot else None
+        stats['stale'] = not _leaderboard_snapshot_is_fresh(snapshot, now)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+# What the dashboard asks for on first paint, cached per user so a render (and the
+# fetches it used to trigger) costs a few queries once per TTL instead of on every load.
+# Listeners on the user-owned tables drop a user's bundle when their rows commit.
+DASHBOARD_BOOTSTRAP_DAYS = 30
+_DASHBOARD_BUNDLE_CACHE = {
+    'bundles': OrderedDict(),
+    # user_id -> token of the build in progress; an invalidation voids it so a
+    # build that read the old rows does not store them afterwards
+    'building': {},
+    # Bumped by each time-log flush before it commits; a bundle records the value
+    # its build started at, which tells a flush whether the bundle saw its rows
+    'flush_generation': 0,
+}
+_DASHBOARD_BUNDLE_STATS = {
+    'hits': 0,
+    'misses': 0,
+    'invalidations': 0,
+    'evictions': 0,
+}
+_DASHBOARD_BUNDLE_LOCK = threading.Lock()
+
+
+def _invalidate_dashboard_bundles(user_ids=None):
+    """Drop the cached dashboard bundle of `user_ids`, or of every user."""
+    with _DASHBOARD_BUNDLE_LOCK:
+        if user_ids is None:
+            _DASHBOARD_BUNDLE_CACHE['bundles'].clear()
+            _DASHBOARD_BUNDLE_CACHE['building'].clear()
+        else:
+            for user_id in user_ids:
+                _DASHBOARD_BUNDLE_CACHE['bundles'].pop(user_id, None)
+                _DASHBOARD_BUNDLE_CACHE['building'].pop(user_id, None)
+        _DASHBOARD_BUNDLE_STATS['invalidations'] += 1
+
+
+def _begin_bundle_flush(user_ids):
+    """Start a time-log flush for `user_ids`; call before its commit and pass the
+    returned generation to _add_flushed_time_to_bundles() after it.
+
+    Builds already running for these users are voided: they may read TimeLog on
+    either side of the commit. Builds started from here on record the new generation.
+    """
+    with _DASHBOARD_BUNDLE_LOCK:
+        _DASHBOARD_BUNDLE_CACHE['flush_generation'] += 1
+        for user_id in user_ids:
+            _DASHBOARD_BUNDLE_CACHE['building'].pop(user_id, None)
+        return _DASHBOARD_BUNDLE_CACHE['flush_generation']
+
+
+def _add_flushed_time_to_bundles(increments, generation):
+    """Move seconds just flushed from the time-log buffer into the cached daily series.
+
+    Cached series hold stored seconds only, so without this a flush would hide
+    them until the bundle expires; the rest of the bundle stays valid. Only bundles
+    from before the flush's generation are known to predate its commit; newer ones
+    may already hold the seconds and are dropped rather than counted twice.
+    """
+    with _DASHBOARD_BUNDLE_LOCK:
+        bundles = _DASHBOARD_BUNDLE_CACHE['bundles']
+        for (user_id, day), seconds in increments.items():
+            # A build started since _begin_bundle_flush may have read either side of the commit
+            _DASHBOARD_BUNDLE_CACHE['building'].pop(user_id, None)
+            bundle = bundles.get(user_id)
+            if bundle is None:
+                continue
+            if bundle['flush_generation'] >= generation:
+                del bundles[user_id]
+                continue
+            if bundle['day'] - timedelta(days=DASHBOARD_BOOTSTRAP_DAYS - 1) <= day <= bundle['day']:
+                # Readers hold the old dict outside the lock, so swap in a copy
+                time_by_day = dict(bundle['time_by_day'])
+                time_by_day[day] = time_by_day.get(day, 0) + seconds
+                bundle['time_by_day'] = time_by_day
+
+
+def _dashboard_section_etag(name, payload):
+    """Strong ETag for one dashboard section, derived from its JSON content."""
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"{name}-{digest[:20]}"
+
+
+def _build_dashboard_bundle(user_id):
+    today = date.today()
+    results, next_cursor = _results_page(user_id, _parse_result_fields(None), RESULTS_PAGE_MAX)
+    start_day = _shift_period(today, 'day', -(DASHBOARD_BOOTSTRAP_DAYS - 1))
+    sections = {
+        'profile': {'success': True, 'profile': _profile_payload(user_id)},
+        'results': {
+            'success': True,
+            'results': results,
+            'next_cursor': next_cursor,
+            'summary': _results_summary(user_id),
+        },
+    }
+    return {
+        'sections': sections,
+        # Hashed once per build rather than on every revalidation
+        'etags': {name: _dashboard_section_etag(name, payload) for name, payload in sections.items()},
+        'time_by_day': _stored_time_by_period(user_id, 'day', start_day, today),
+        'day': today,
+        'built_at': time.monotonic(),
+    }
+
+
+def _get_dashboard_bundle(user_id):
+    """Return the cached dashboard bundle for a user, building it on a miss.
+
+    Bundles expire after DASHBOARD_BUNDLE_TTL_SECONDS or at midnight (the time
+    series is anchored on today), and the least recently used are evicted past
+    DASHBOARD_BUNDLE_MAX_USERS. The cache is per process: commits invalidate only
+    this worker's copy, so with several workers the TTL bounds how stale another
+    worker's bundle can be.
+    """
+    bundles = _DASHBOARD_BUNDLE_CACHE['bundles']
+    with _DASHBOARD_BUNDLE_LOCK:
+        bundle = bundles.get(user_id)
+        if (
+            bundle is not None
+            and bundle['day'] == date.today()
+            and (time.monotonic() - bundle['built_at']) < DASHBOARD_BUNDLE_TTL_SECONDS
+        ):
+            bundles.move_to_end(user_id)
+            _DASHBOARD_BUNDLE_STATS['hits'] += 1
+            return bundle
+        _DASHBOARD_BUNDLE_STATS['misses'] += 1
+        token = object()
+        _DASHBOARD_BUNDLE_CACHE['building'][user_id] = token
+        generation = _DASHBOARD_BUNDLE_CACHE['flush_generation']
+
+    bundle = _build_dashboard_bundle(user_id)
+    with _DASHBOARD_BUNDLE_LOCK:
+        if _DASHBOARD_BUNDLE_CACHE['building'].get(user_id) is token:
+            del _DASHBOARD_BUNDLE_CACHE['building'][user_id]
+            bundle['flush_generation'] = generation
+            bundles[user_id] = bundle
+            bundles.move_to_end(user_id)
+            while len(bundles) > max(1, DASHBOARD_BUNDLE_MAX_USERS):
+                bundles.popitem(last=False)
+                _DASHBOARD_BUNDLE_STATS['evictions'] += 1
+    return bundle
+
+
+def _dashboard_bootstrap(user_id, days=DASHBOARD_BOOTSTRAP_DAYS):
+    """The first /api/profile, /api/results and /api/time_stats?days=`days` responses the
+    dashboard needs, plus an ETag per section; returns (sections, etags).
+
+    Heartbeats still waiting in the time-log buffer are added on every call rather than
+    cached; a range other than the cached 30 days costs one extra query.
+    """
+    bundle = _get_dashboard_bundle(user_id)
+    stored = bundle['time_by_day'] if days == DASHBOARD_BOOTSTRAP_DAYS else None
+    time_stats = _time_series_payload(user_id, 'day', days, stored=stored)
+    sections = dict(bundle['sections'], time_stats=time_stats)
+    etags = dict(bundle['etags'], time_stats=_dashboard_section_etag('time_stats', time_stats))
+    return sections, etags
+
+
+def _dashboard_bundle_stats():
+    """Return hit/miss counters and occupancy for the dashboard bundle cache."""
+    with _DASHBOARD_BUNDLE_LOCK:
+        stats = dict(_DASHBOARD_BUNDLE_STATS)
+        stats['users'] = len(_DASHBOARD_BUNDLE_CACHE['bundles'])
+    stats['ttl_seconds'] = DASHBOARD_BUNDLE_TTL_SECONDS
+    stats['max_users'] = DASHBOARD_BUNDLE_MAX_USERS
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
 
 
 def _ensure_seed_admin():
@@ -686,7 +1975,7 @@ def _ensure_seed_admin():
     user = User.query.filter_by(email=admin_email).first()
     if user is None:
         try:
-            pw_hash = wz_generate_password_hash(admin_password)
+            pw_hash = _hash_password(admin_password)
             user = User(name='Administrator', email=admin_email, password_hash=pw_hash, is_admin=True)
             db.session.add(user)
             db.session.commit()
@@ -701,42 +1990,102 @@ def _ensure_seed_admin():
                 db.session.rollback()
 
 
-def _start_user_session(user, avatar_override=None, extras=None):
-    """Populate the Flask session with user details after login."""
+def _session_profile_query(*entities):
+    """Query `entities` with the profile, meta and avatar columns the login session is built from."""
+    return (
+        db.session.query(
+            *entities,
+            Profile.location.label('profile_location'),
+            UserMeta.profile_pic,
+            UserMeta.address,
+            UserMeta.dob,
+            ProfileMedia.content_hash.label('avatar_hash'),
+            ProfileMedia.updated_at.label('avatar_updated_at'),
+        )
+        .select_from(User)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .outerjoin(UserMeta, UserMeta.user_id == User.id)
+        .outerjoin(ProfileMedia, ProfileMedia.user_id == User.id)
+    )
+
+
+def _session_profile_from_row(row):
+    return {
+        'location': row.profile_location,
+        'profile_pic': row.profile_pic,
+        'address': row.address,
+        'dob': row.dob,
+        'avatar_version': _avatar_version(row.avatar_hash, row.avatar_updated_at),
+    }
+
+
+def _load_session_profile(user_id):
+    row = _session_profile_query(User.id).filter(User.id == user_id).first()
+    return _session_profile_from_row(row) if row else None
+
+
+@app.before_request
+def _end_sessions_of_deleted_users():
+    """Sign out a session whose account was deleted or is waiting to be purged.
+
+    Each session re-reads its account at most every SESSION_USER_RECHECK_SECONDS,
+    so a deletion takes effect within that window on every worker.
+    """
+    user_id = session.get('user_id')
+    if user_id is None or request.endpoint == 'static':
+        return None
+    now = time.time()
+    checked_at = session.get('user_checked_at')
+    if isinstance(checked_at, (int, float)) and 0 <= now - checked_at < SESSION_USER_RECHECK_SECONDS:
+        return None
+    try:
+        row = db.session.query(User.deleted_at).filter(User.id == user_id).first()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Session account check skipped: %s', exc)
+        return None
+    if row is None or row.deleted_at is not None:
+        session.clear()
+        return None
+    session['user_checked_at'] = now
+    return None
+
+
+def _start_user_session(user, avatar_override=None, extras=None, session_profile=None):
+    """Populate the Flask session with user details after login.
+
+    `session_profile` is the dict from _load_login_account(); without it one query loads the same fields.
+    """
     extras = extras or {}
     session['user_id'] = user.id
+    session['user_checked_at'] = time.time()
     session['user_email'] = user.email
     session['is_admin'] = bool(user.is_admin)
     session['user_name'] = extras.get('name') or user.name
     session['user_location'] = extras.get('location')
     session['user_dob'] = extras.get('dob')
 
-    meta = None
-    profile = None
-    try:
-        meta = UserMeta.query.filter_by(user_id=user.id).first()
-        profile = Profile.query.filter_by(user_id=user.id).first()
-    except Exception:
-        meta = None
-        profile = None
+    if session_profile is None:
+        try:
+            session_profile = _load_session_profile(user.id)
+        except Exception:
+            session_profile = None
+    session_profile = session_profile or {}
 
     if avatar_override:
         session['avatar_url'] = avatar_override
     else:
-        pic_value = meta.profile_pic if meta and meta.profile_pic else None
+        pic_value = session_profile.get('profile_pic')
         if pic_value:
-            needs_bust = (pic_value or '').startswith('media/profile/')
-            session['avatar_url'] = _avatar_url_for(pic_value, user.id, cache_bust=needs_bust)
+            version = session_profile.get('avatar_version') if pic_value.startswith('media/profile/') else None
+            session['avatar_url'] = _avatar_url_for(pic_value, user.id, version=version, size=AVATAR_PROFILE_SIZE)
         else:
             session['avatar_url'] = None
 
     if not session.get('user_location'):
-        if profile and profile.location:
-            session['user_location'] = profile.location
-        elif meta and meta.address:
-            session['user_location'] = meta.address
-    if not session.get('user_dob') and meta and meta.dob:
-        session['user_dob'] = meta.dob
+        session['user_location'] = session_profile.get('location') or session_profile.get('address') or None
+    if not session.get('user_dob') and session_profile.get('dob'):
+        session['user_dob'] = session_profile['dob']
     if not session.get('user_name'):
         session['user_name'] = user.name
 
@@ -750,6 +2099,8 @@ def _get_or_create_oauth_user(email, name, provider, provider_user_id, *, avatar
     display_name = (name or '').strip() or normalized_email.split('@')[0]
     user = User.query.filter_by(email=normalized_email).first()
     created = False
+    if user is not None and user.deleted_at:
+        raise ValueError('This account is scheduled for deletion.')
 
     if user is None:
         placeholder_hash = f"oauth:{provider}:{provider_user_id or secrets.token_hex(8)}"
@@ -760,9 +2111,7 @@ def _get_or_create_oauth_user(email, name, provider, provider_user_id, *, avatar
         )
         db.session.add(user)
         db.session.flush()
-        username = _generate_unique_username(display_name)
-        profile = Profile(user_id=user.id, username=username)
-        db.session.add(profile)
+        profile = _add_profile_with_unique_username(user.id, display_name)
         created = True
     else:
         if not user.name and display_name:
@@ -771,9 +2120,7 @@ def _get_or_create_oauth_user(email, name, provider, provider_user_id, *, avatar
     # Ensure a profile exists for existing social sign-ins
     profile = Profile.query.filter_by(user_id=user.id).first()
     if not profile:
-        username = _generate_unique_username(display_name)
-        profile = Profile(user_id=user.id, username=username)
-        db.session.add(profile)
+        profile = _add_profile_with_unique_username(user.id, display_name)
 
     meta = UserMeta.query.filter_by(user_id=user.id).first()
     if not meta:
@@ -803,58 +2150,113 @@ def _get_or_create_oauth_user(email, name, provider, provider_user_id, *, avatar
     return user, created
 
 
-def _generate_unique_username(name):
-    """Generate a unique, lowercase username derived from the provided name."""
-    base = re.sub(r'[^a-z0-9]+', '', (name or '').lower())
-    if not base:
-        base = 'user'
+def _username_variants_query(base):
+    """`base` itself and usernames that continue it with a digit, at most
+    USERNAME_SUFFIX_DIGITS characters longer; callers keep only `<base><digits>` matches.
 
-    candidate = base
-    exists = Profile.query.filter_by(username=candidate).first()
-    if exists:
-        attempts = 0
-        while True:
-            suffix = f"{random.randint(1, 99):02d}"
-            candidate = f"{base}{suffix}"
-            if not Profile.query.filter_by(username=candidate).first():
-                break
-            attempts += 1
-            if attempts >= 25:
-                candidate = f"{base}{uuid.uuid4().hex[:4]}"
-                if not Profile.query.filter_by(username=candidate).first():
-                    break
-                attempts = 0
-    return candidate
+    LIKE rather than a `base0`..`base:` range, because where ':' sorts relative to the
+    digits depends on the collation (en_US/ICU put it first). The `>= base` bound holds in
+    any collation, since a name never sorts before its own prefix, and lets the username
+    index start the scan at `base`. `base` is [a-z0-9] only, so it needs no LIKE escaping.
+    The digit and length checks keep names like `username` out when `base` is `user`.
+    """
+    return select(Profile.username).where(
+        Profile.username >= base,
+        Profile.username.like(f"{base}%"),
+        or_(
+            Profile.username == base,
+            and_(
+                func.substr(Profile.username, len(base) + 1, 1).in_(list(string.digits)),
+                func.length(Profile.username) <= len(base) + USERNAME_SUFFIX_DIGITS,
+            ),
+        ),
+    )
+
+
+def _generate_unique_username(name, randomize=False):
+    """Pick a free lowercase username for `name`: the bare name, else the next numeric suffix.
+
+    One indexed query fetches the name and its `<name><digits>` variants, so common
+    names cost a single round-trip however many users share them. When the next
+    counter would not fit in USERNAME_SUFFIX_DIGITS, or with `randomize`, a random
+    suffix is used instead; the caller's insert retry covers the rare collision.
+    """
+    base = _sanitize_username(name) or 'user'
+    base = base[:USERNAME_MAX_LENGTH - USERNAME_SUFFIX_DIGITS]
+    if randomize:
+        return f"{base}{secrets.token_hex(USERNAME_SUFFIX_DIGITS // 2)}"
+    taken = set(db.session.execute(_username_variants_query(base)).scalars())
+    if base not in taken:
+        return base
+    suffix_pattern = re.compile(rf"{re.escape(base)}(\d+)")
+    suffixes = [int(match.group(1)) for match in map(suffix_pattern.fullmatch, taken) if match]
+    suffix = str(max(suffixes, default=0) + 1)
+    while len(suffix) > USERNAME_SUFFIX_DIGITS or f"{base}{suffix}" in taken:
+        suffix = str(secrets.randbelow(10 ** USERNAME_SUFFIX_DIGITS)).zfill(USERNAME_SUFFIX_DIGITS)
+    return f"{base}{suffix}"
+
+
+def _add_profile_with_unique_username(user_id, name):
+    """Add a Profile with a generated username, inside a savepoint.
+
+    uq_profile_username rejects a name a concurrent signup took between the lookup and
+    the insert; the lookup is then repeated, a bounded number of times.
+    """
+    for attempt in range(USERNAME_INSERT_ATTEMPTS):
+        username = _generate_unique_username(name, randomize=attempt == USERNAME_INSERT_ATTEMPTS - 1)
+        profile = Profile(user_id=user_id, username=username)
+        try:
+            with db.session.begin_nested():
+                db.session.add(profile)
+        except IntegrityError:
+            if attempt == USERNAME_INSERT_ATTEMPTS - 1:
+                raise
+            continue
+        return profile
 
 
 def _sanitize_username(value):
     if value is None:
         return None
-    username = re.sub(r'[^a-z0-9]+', '', value.strip().lower())
+    username = re.sub(r'[^a-z0-9]+', '', value.strip().lower())[:USERNAME_MAX_LENGTH]
     return username or None
 
 
-def _find_user_by_login_identifier(identifier):
+def _load_login_account(identifier):
+    """Resolve an email or username to (user, session_profile) in a single statement.
+
+    Each identifier form is an indexed lookup (user.email, profile.username) in a UNION ALL;
+    an email match wins over a username match. Returns (None, None) for unknown or deleted users.
+    """
+    query = _login_account_query(identifier)
+    row = query.first() if query is not None else None
+    if row is None or row[0].deleted_at:
+        return None, None
+    return row[0], _session_profile_from_row(row)
+
+
+def _login_account_query(identifier):
     ident = (identifier or '').strip()
     if not ident:
         return None
 
-    email_candidate = ident.lower()
-    user = User.query.filter_by(email=email_candidate).first()
-    if user:
-        return user
-
+    branches = [select(User.id.label('user_id'), literal(0).label('rank')).where(User.email == ident.lower())]
     sanitized = _sanitize_username(ident)
-    if not sanitized:
-        return None
+    if sanitized:
+        branches.append(
+            select(Profile.user_id.label('user_id'), literal(1).label('rank')).where(Profile.username == sanitized)
+        )
+    match = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery('login_match')
 
-    profile = Profile.query.filter_by(username=sanitized).first()
-    if profile:
-        try:
-            return User.query.get(profile.user_id)
-        except Exception:
-            return None
-    return None
+    return (
+        _session_profile_query(User)
+        .join(match, match.c.user_id == User.id)
+        .order_by(match.c.rank)
+    )
+
+
+def _find_user_by_login_identifier(identifier):
+    return _load_login_account(identifier)[0]
 
 
 def _username_taken(username, exclude_user_id=None):
@@ -866,28 +2268,395 @@ def _username_taken(username, exclude_user_id=None):
     return query.first() is not None
 
 
-def _send_otp_email(recipient_email, otp_code):
-    """Send a one-time password to the provided email address using Gmail SMTP."""
-    if not SMTP_EMAIL or not SMTP_APP_PASSWORD:
+class _SmtpMailTransport:
+    """Delivers over one SMTP connection that is reused across messages until it sits idle."""
+
+    def __init__(self, host, port, username='', password='', starttls=True, idle_seconds=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.idle_seconds = idle_seconds
+        self.connections_opened = 0
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        # A plain-text local stand-in (e.g. a debugging SMTP server) needs no login
+        return bool(self.username and self.password) or not self.starttls
+
+    @property
+    def sender(self):
+        return self.username or 'no-reply@localhost'
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return server
+
+    def _close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def send(self, recipient, message):
+        with self._lock:
+            if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+                self._close()
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.sendmail(self.sender, [recipient], message.as_string())
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped the reused connection; reconnect once
+                    self._server = self._connect()
+                    self._server.sendmail(self.sender, [recipient], message.as_string())
+            except smtplib.SMTPRecipientsRefused:
+                self._last_used = time.monotonic()
+                raise
+            except Exception:
+                self._close()
+                raise
+            self._last_used = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class _LogMailTransport:
+    """Writes messages to the app log instead of sending them (MAIL_TRANSPORT=log, local development)."""
+    configured = True
+    sender = 'no-reply@localhost'
+
+    def send(self, recipient, message):
+        app.logger.info('Mail to %s: %s\n%s', recipient, message['Subject'], message.get_payload())
+
+    def close(self):
+        pass
+
+
+_MAIL_TRANSPORT = {'transport': None}
+_MAIL_DISPATCHER = {'thread': None, 'stop': threading.Event(), 'wake': threading.Event()}
+_MAIL_LOCK = threading.Lock()
+_MAIL_STATS = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'expired': 0}
+
+
+def _build_mail_transport():
+    if MAIL_TRANSPORT == 'log':
+        return _LogMailTransport()
+    return _SmtpMailTransport(
+        MAIL_SMTP_HOST,
+        MAIL_SMTP_PORT,
+        username=SMTP_EMAIL,
+        password=SMTP_APP_PASSWORD,
+        starttls=MAIL_SMTP_STARTTLS,
+        idle_seconds=MAIL_SMTP_IDLE_SECONDS,
+    )
+
+
+def _mail_transport():
+    with _MAIL_LOCK:
+        if _MAIL_TRANSPORT['transport'] is None:
+            _MAIL_TRANSPORT['transport'] = _build_mail_transport()
+        return _MAIL_TRANSPORT['transport']
+
+
+def _set_mail_transport(transport):
+    """Swap the transport used by the dispatcher; returns the previous one (None if never built)."""
+    with _MAIL_LOCK:
+        previous = _MAIL_TRANSPORT['transport']
+        _MAIL_TRANSPORT['transport'] = transport
+    return previous
+
+
+def _queue_mail(recipient, subject, body='', expires_at=None, template=None, user_id=None):
+    """Add a message to the outbox in the caller's transaction; it is dispatched after commit.
+
+    With `template`, the body is rendered by _render_outbox_mail() when the message is sent.
+    """
+    if not _mail_transport().configured:
         raise RuntimeError('SMTP credentials are not configured. Set SMTP_EMAIL_ADDRESS and SMTP_APP_PASSWORD.')
+    entry = MailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        expires_at=expires_at,
+        template=template,
+        user_id=user_id,
+    )
+    db.session.add(entry)
+    _mark_caches_dirty(db.session, 'mail_outbox')
+    with _MAIL_LOCK:
+        _MAIL_STATS['queued'] += 1
+    return entry
+
+
+def _supersede_outbox_mail(*criteria):
+    """Fail queued or in-flight rows matching `criteria`, e.g. a reset replaced by a newer one.
+
+    A row being sent right now is marked too, so its dispatcher finds it no longer
+    'sending' and leaves the outcome (and the user's password) alone. Does not commit.
+    """
+    table = MailOutbox.__table__
+    # Core UPDATE: a bulk ORM update would make the cache hooks drop every dashboard
+    db.session.execute(
+        table.update()
+        .where(table.c.status.in_(('pending', 'sending')), *criteria)
+        .values(status='failed', body='', last_error='superseded by a newer message')
+    )
+
+
+def _render_outbox_mail(entry):
+    """Return (body, password_hash) for a claimed row, or None when its secret is gone.
+
+    `password_hash` is set for resets: it replaces the user's password once this body is delivered.
+    """
+    if entry.template == 'otp':
+        record = db.session.get(OTPVerification, entry.recipient)
+        if record is None or record.expiry_time <= datetime.utcnow():
+            return None
+        return _otp_mail_body(record.otp), None
+    if entry.template == 'password_reset':
+        temp_password = _generate_temp_password()
+        return _reset_password_mail_body(temp_password), _hash_password(temp_password)
+    return entry.body, None
+
+
+def _compose_mail(entry, sender, body=None):
+    message = MIMEText(entry.body if body is None else body)
+    message['Subject'] = entry.subject
+    message['From'] = sender
+    message['To'] = entry.recipient
+    return message
 
-    subject = 'Your IntervBot verification code'
-    body = (
+
+def _claim_due_mail(limit):
+    """Reserve up to `limit` due messages for this dispatcher; returns the claimed rows."""
+    now = datetime.utcnow()
+    due = (MailOutbox.status.in_(('pending', 'sending')), MailOutbox.next_attempt_at <= now)
+    candidate_ids = [
+        row[0]
+        for row in db.session.query(MailOutbox.id).filter(*due).order_by(MailOutbox.id).limit(limit)
+    ]
+    claimed_ids = []
+    for entry_id in candidate_ids:
+        # Conditional update so two dispatchers (threads or workers) never claim the same row;
+        # Core rather than a bulk ORM update, which would make the cache hooks drop every dashboard
+        updated = db.session.execute(
+            MailOutbox.__table__.update()
+            .where(MailOutbox.id == entry_id, *due)
+            .values(
+                status='sending',
+                attempts=MailOutbox.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=MAIL_CLAIM_SECONDS),
+            )
+        ).rowcount
+        if updated:
+            claimed_ids.append(entry_id)
+    db.session.commit()
+    if not claimed_ids:
+        return []
+    return MailOutbox.query.filter(MailOutbox.id.in_(claimed_ids)).order_by(MailOutbox.id).all()
+
+
+def _dispatch_pending_mail(limit=None):
+    """Send one batch of due outbox messages over a shared connection; returns rows processed.
+
+    Every outcome is written only while the row is still 'sending', so a row superseded
+    mid-send keeps its 'failed' status and a superseded reset never changes the password.
+    """
+    entries = _claim_due_mail(limit or MAIL_BATCH_SIZE)
+    if not entries:
+        return 0
+    transport = _mail_transport()
+    table = MailOutbox.__table__
+    for entry in entries:
+        claimed = and_(table.c.id == entry.id, table.c.status == 'sending')
+        now = datetime.utcnow()
+        outcome = 'sent'
+        rendered = None
+        if entry.expires_at is None or entry.expires_at > now:
+            rendered = _render_outbox_mail(entry)
+        if rendered is None:
+            outcome = 'expired'
+            db.session.execute(
+                table.update().where(claimed)
+                .values(status='failed', body='', last_error='expired before delivery')
+            )
+        else:
+            body, password_hash = rendered
+            try:
+                transport.send(entry.recipient, _compose_mail(entry, transport.sender, body))
+            except Exception as exc:
+                if entry.attempts >= MAIL_MAX_ATTEMPTS:
+                    outcome = 'failed'
+                    # A reset that never reached the user leaves their old password in place
+                    changes = {'status': 'failed', 'body': ''}
+                else:
+                    outcome = 'retried'
+                    delay = MAIL_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1)
+                    changes = {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=delay)}
+                db.session.execute(table.update().where(claimed).values(last_error=str(exc)[:500], **changes))
+                app.logger.warning('Mail %s to %s not sent (attempt %s): %s', entry.id, entry.recipient, entry.attempts, exc)
+            else:
+                delivered = db.session.execute(table.delete().where(claimed)).rowcount
+                if delivered and entry.user_id is not None and password_hash:
+                    # Core UPDATE: this is not a bulk change the ORM cache hooks need to see
+                    db.session.execute(
+                        User.__table__.update()
+                        .where(User.id == entry.user_id)
+                        .values(password_hash=password_hash)
+                    )
+        try:
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            # The claim lapses after MAIL_CLAIM_SECONDS and the row is picked up again
+            app.logger.warning('Mail outbox update for %s failed: %s', entry.id, exc)
+        with _MAIL_LOCK:
+            _MAIL_STATS[outcome] += 1
+    return len(entries)
+
+
+def _prune_failed_mail():
+    """Delete failed rows older than MAIL_FAILED_RETENTION_DAYS; returns rows removed."""
+    cutoff = datetime.utcnow() - timedelta(days=MAIL_FAILED_RETENTION_DAYS)
+    table = MailOutbox.__table__
+    removed = db.session.execute(
+        table.delete().where(table.c.status == 'failed', table.c.created_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return removed
+
+
+def _drain_mail_outbox():
+    processed = 0
+    while True:
+        batch = _dispatch_pending_mail()
+        processed += batch
+        if batch < MAIL_BATCH_SIZE:
+            _prune_failed_mail()
+            return processed
+
+
+def _mail_dispatcher_loop(stop_event, wake_event):
+    while not stop_event.is_set():
+        woken = wake_event.wait(MAIL_POLL_SECONDS)
+        wake_event.clear()
+        if stop_event.is_set():
+            break
+        with app.app_context():
+            try:
+                _drain_mail_outbox()
+            except Exception as exc:
+                db.session.rollback()
+                app.logger.warning('Mail dispatch failed: %s', exc)
+        if not woken:
+            # Nothing new for a whole poll interval: don't hold the SMTP session open
+            _mail_transport().close()
+
+
+def _ensure_mail_dispatcher():
+    thread = _MAIL_DISPATCHER['thread']
+    if thread is not None and thread.is_alive():
+        return
+    with _MAIL_LOCK:
+        thread = _MAIL_DISPATCHER['thread']
+        if thread is not None and thread.is_alive():
+            return
+        _MAIL_DISPATCHER['stop'] = threading.Event()
+        thread = threading.Thread(
+            target=_mail_dispatcher_loop,
+            args=(_MAIL_DISPATCHER['stop'], _MAIL_DISPATCHER['wake']),
+            name='mail-dispatcher',
+            daemon=True,
+        )
+        _MAIL_DISPATCHER['thread'] = thread
+        thread.start()
+
+
+def _wake_mail_dispatcher():
+    """Called after a commit that queued mail: hand it to the worker, or send inline when async is off."""
+    if MAIL_DISPATCH_ASYNC:
+        _ensure_mail_dispatcher()
+        _MAIL_DISPATCHER['wake'].set()
+        return
+    try:
+        # A fresh app context gets its own session; the committing one cannot emit SQL here
+        with app.app_context():
+            _drain_mail_outbox()
+    except Exception as exc:
+        app.logger.warning('Inline mail dispatch failed: %s', exc)
+
+
+def _resume_mail_outbox():
+    """Wake the dispatcher for messages left queued by a previous process."""
+    pending = (
+        db.session.query(func.count(MailOutbox.id))
+        .filter(MailOutbox.status.in_(('pending', 'sending')))
+        .scalar()
+    )
+    if pending and MAIL_DISPATCH_ASYNC:
+        _wake_mail_dispatcher()
+    return pending or 0
+
+
+def _mail_outbox_stats():
+    rows = db.session.query(MailOutbox.status, func.count(MailOutbox.id)).group_by(MailOutbox.status).all()
+    with _MAIL_LOCK:
+        stats = dict(_MAIL_STATS)
+    stats['outbox'] = {status: count for status, count in rows}
+    stats['async'] = MAIL_DISPATCH_ASYNC
+    stats['transport'] = MAIL_TRANSPORT
+    return stats
+
+
+@atexit.register
+def _stop_mail_dispatcher():
+    """Stop the worker and close the SMTP session; undelivered rows stay in the outbox."""
+    _MAIL_DISPATCHER['stop'].set()
+    _MAIL_DISPATCHER['wake'].set()
+    thread = _MAIL_DISPATCHER['thread']
+    if thread is not None and thread.is_alive():
+        thread.join(timeout=5)
+    transport = _MAIL_TRANSPORT['transport']
+    if transport is not None:
+        transport.close()
+
+
+def _otp_mail_body(otp_code):
+    return (
         f"Hello,\n\n"
         f"Your One Time Password is: {otp_code}\n"
         f"This code expires in 5 minutes. If you did not request it, you can ignore this message.\n\n"
         f"Thanks,\nIntervBot"
     )
 
-    message = MIMEText(body)
-    message['Subject'] = subject
-    message['From'] = SMTP_EMAIL
-    message['To'] = recipient_email
 
-    with smtplib.SMTP('smtp.gmail.com', 587) as server:
-        server.starttls()
-        server.login(SMTP_EMAIL, SMTP_APP_PASSWORD)
-        server.sendmail(SMTP_EMAIL, [recipient_email], message.as_string())
+def _send_otp_email(recipient_email, expires_at=None):
+    """Queue the verification email for the OTPVerification row of `recipient_email`.
+
+    The code is read from that row when the mail is sent, so it is not copied into the
+    outbox; an older OTP mail to the same address still waiting is dropped.
+    """
+    _supersede_outbox_mail(MailOutbox.recipient == recipient_email, MailOutbox.template == 'otp')
+    return _queue_mail(recipient_email, 'Your IntervBot verification code', expires_at=expires_at, template='otp')
 
 
 def _generate_temp_password(length=8):
@@ -898,13 +2667,8 @@ def _generate_temp_password(length=8):
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
 
-def _send_reset_password_email(recipient_email, temp_password):
-    """Send a temporary password to the provided email address using Gmail SMTP."""
-    if not SMTP_EMAIL or not SMTP_APP_PASSWORD:
-        raise RuntimeError('SMTP credentials are not configured. Set SMTP_EMAIL_ADDRESS and SMTP_APP_PASSWORD.')
-
-    subject = 'Your IntervBot temporary password'
-    body = (
+def _reset_password_mail_body(temp_password):
+    return (
         "Hello,\n\n"
         "We received a request to reset your IntervBot account password.\n\n"
         f"Your new temporary password is: {temp_password}\n"
@@ -913,15 +2677,21 @@ def _send_reset_password_email(recipient_email, temp_password):
         "Thanks,\nIntervBot"
     )
 
-    message = MIMEText(body)
-    message['Subject'] = subject
-    message['From'] = SMTP_EMAIL
-    message['To'] = recipient_email
 
-    with smtplib.SMTP('smtp.gmail.com', 587) as server:
-        server.starttls()
-        server.login(SMTP_EMAIL, SMTP_APP_PASSWORD)
-        server.sendmail(SMTP_EMAIL, [recipient_email], message.as_string())
+def _send_reset_password_email(user):
+    """Queue a temporary password email for `user`; it goes out once the caller commits.
+
+    The password is generated when the mail is sent and only takes effect once it is
+    delivered. A newer reset supersedes older ones, including one being sent right now.
+    """
+    _supersede_outbox_mail(MailOutbox.user_id == user.id, MailOutbox.template == 'password_reset')
+    return _queue_mail(
+        user.email,
+        'Your IntervBot temporary password',
+        expires_at=datetime.utcnow() + timedelta(seconds=PASSWORD_RESET_MAIL_TTL_SECONDS),
+        template='password_reset',
+        user_id=user.id,
+    )
 
 
 # Track time spent (per-user, per-day, in seconds)
@@ -936,6 +2706,530 @@ class TimeLog(db.Model):
     )
 
 
+class TimeLogRollup(db.Model):
+    """Per-user seconds summed by calendar week (Monday start) or month, kept in step with TimeLog."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    period = db.Column(db.String(8), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    seconds = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'period_start', name='uq_timelog_rollup_user_period'),
+    )
+
+
+class AppCounter(db.Model):
+    """Named running totals so admin metrics do not have to count whole tables."""
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+TIME_STATS_GRANULARITIES = {
+    # granularity: (default periods, max periods)
+    'day': (30, 365),
+    'week': (12, 104),
+    'month': (12, 60),
+}
+
+
+def _period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _shift_period(start, period, steps):
+    """Move a period start by `steps` periods (negative goes back)."""
+    if period == 'week':
+        return start + timedelta(weeks=steps)
+    if period == 'month':
+        month_index = start.year * 12 + (start.month - 1) + steps
+        return date(month_index // 12, month_index % 12 + 1, 1)
+    return start + timedelta(days=steps)
+
+
+# Heartbeat increments accumulated per (user_id, day) until the next flush
+_TIME_LOG_BUFFER = {}
+_TIME_LOG_BUFFER_LOCK = threading.Lock()
+_TIME_LOG_FLUSH_LOCK = threading.Lock()
+_TIME_LOG_FLUSHER = {'thread': None, 'stop': threading.Event()}
+_TIME_LOG_STATS = {'buffered': 0, 'flushes': 0, 'rows_written': 0, 'failures': 0}
+
+
+def _increment_rows(model, key_columns, rows, value_column='seconds', return_inserted=False):
+    """Add each row's value onto the matching row of `model`, inserting it when missing.
+
+    Uses a native INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and SQLite and a
+    portable UPDATE-then-INSERT elsewhere. With `return_inserted`, returns the set of
+    key tuples this call inserted, as decided by the writes themselves. Does not commit.
+    """
+    if not rows:
+        return set()
+    table = model.__table__
+    value_col = table.c[value_column]
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite' and return_inserted:
+        try:
+            with db.session.begin_nested():
+                return _increment_rows_sqlite_counted(table, key_columns, rows, value_column)
+        except (OperationalError, ProgrammingError) as exc:
+            app.logger.warning('Native upsert on %s unavailable, using fallback: %s', table.name, exc)
+        return _increment_rows_portable(model, key_columns, rows, value_column)
+    if dialect in ('postgresql', 'sqlite'):
+        insert_fn = pg_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = insert_fn(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in key_columns],
+            set_={value_column: value_col + stmt.excluded[value_column]},
+        )
+        if return_inserted:
+            # xmax is 0 only on a freshly inserted row version
+            stmt = stmt.returning(
+                *[table.c[name] for name in key_columns],
+                literal_column('(xmax = 0)', Boolean).label('inserted'),
+            )
+        try:
+            with db.session.begin_nested():
+                result = db.session.execute(stmt, rows)
+                if not return_inserted:
+                    return set()
+                return {tuple(row[:-1]) for row in result if row[-1]}
+        except (OperationalError, ProgrammingError) as exc:
+            # e.g. a legacy table without the unique key; ON CONFLICT needs it
+            app.logger.warning('Native upsert on %s unavailable, using fallback: %s', table.name, exc)
+    return _increment_rows_portable(model, key_columns, rows, value_column)
+
+
+def _increment_rows_sqlite_counted(table, key_columns, rows, value_column):
+    """SQLite has no xmax, so: one INSERT ... ON CONFLICT DO NOTHING RETURNING for every row,
+    whose result is exactly the inserted keys, then one executemany UPDATE for the rest.
+
+    The insert takes SQLite's single write lock, so no other writer can add or change
+    these rows before the update runs. Returns the set of inserted key tuples.
+    """
+    keys = [table.c[name] for name in key_columns]
+    insert = sqlite_insert(table).on_conflict_do_nothing(index_elements=keys).returning(*keys)
+    inserted = {tuple(row) for row in db.session.execute(insert, rows)}
+    existing = [row for row in rows if tuple(row[name] for name in key_columns) not in inserted]
+    if existing:
+        increment = (
+            table.update()
+            .where(*[table.c[name] == bindparam(f'key_{name}') for name in key_columns])
+            .values({value_column: table.c[value_column] + bindparam('increment')})
+        )
+        db.session.execute(increment, [
+            {**{f'key_{name}': row[name] for name in key_columns}, 'increment': row[value_column]}
+            for row in existing
+        ])
+    return inserted
+
+
+def _increment_rows_portable(model, key_columns, rows, value_column='seconds'):
+    """UPDATE value = value + n, INSERT when missing, re-UPDATE if the insert races.
+
+    Returns the set of key tuples that were inserted.
+    """
+    table = model.__table__
+    value_col = table.c[value_column]
+    inserted = set()
+    for row in rows:
+        increment = (
+            table.update()
+            .where(*[table.c[name] == row[name] for name in key_columns])
+            .values({value_column: value_col + row[value_column]})
+        )
+        if db.session.execute(increment).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**row))
+            inserted.add(tuple(row[name] for name in key_columns))
+        except IntegrityError:
+            # Another writer created the row first; add to theirs instead
+            db.session.execute(increment)
+    return inserted
+
+
+def _bump_counters(deltas):
+    rows = [{'name': name, 'value': int(delta)} for name, delta in deltas.items() if delta]
+    _increment_rows(AppCounter, ['name'], rows, value_column='value')
+
+
+def _get_counter(name):
+    counter = db.session.get(AppCounter, name)
+    return int(counter.value) if counter else 0
+
+
+def _time_log_rollup_rows(increments):
+    totals = {}
+    for (user_id, day), seconds in increments.items():
+        for period in ('week', 'month'):
+            key = (user_id, period, _period_start(day, period))
+            totals[key] = totals.get(key, 0) + seconds
+    return [
+        {'user_id': user_id, 'period': period, 'period_start': start, 'seconds': seconds}
+        for (user_id, period, start), seconds in totals.items()
+    ]
+
+
+def _upsert_time_log_increments(increments):
+    """Add `increments` ({(user_id, day): seconds}) to TimeLog, its rollups and the
+    admin counters in one transaction; returns the number of day rows touched."""
+    increments = {key: int(seconds) for key, seconds in increments.items() if seconds > 0}
+    if not increments:
+        return 0
+    excluded_ids = _get_excluded_user_ids()
+    counted = {key: seconds for key, seconds in increments.items() if key[0] not in excluded_ids}
+    generation = _begin_bundle_flush({user_id for user_id, _ in increments})
+    try:
+        # Rows count as new only if this upsert created them, so concurrent flushes
+        # from several workers cannot both claim the same row
+        inserted = _increment_rows(TimeLog, ['user_id', 'day'], [
+            {'user_id': user_id, 'day': day, 'seconds': seconds}
+            for (user_id, day), seconds in increments.items()
+        ], return_inserted=True)
+        new_rows = sum(1 for key in inserted if key in counted)
+        _increment_rows(TimeLogRollup, ['user_id', 'period', 'period_start'], _time_log_rollup_rows(increments))
+        _bump_counters({'time_log_rows': new_rows, 'time_log_seconds': sum(counted.values())})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _add_flushed_time_to_bundles(increments, generation)
+    return len(increments)
+
+
+def _forget_time_log_user(user):
+    """Take a user's time-log rows out of the counters and drop their unflushed seconds. Does not commit."""
+    if not user.is_excluded:
+        row_count, total = (
+            db.session.query(func.count(TimeLog.id), func.coalesce(func.sum(TimeLog.seconds), 0))
+            .filter(TimeLog.user_id == user.id)
+            .one()
+        )
+        _bump_counters({'time_log_rows': -row_count, 'time_log_seconds': -total})
+    _discard_pending_time_log(user.id)
+
+
+def _rebuild_time_log_rollups(batch_size=1000):
+    """Recompute every rollup and the time-log counters from TimeLog."""
+    excluded_ids = _get_excluded_user_ids()
+    # Accounts awaiting purge were already taken out of the counters when tombstoned
+    deleted_ids = {row[0] for row in db.session.query(User.id).filter(User.deleted_at.isnot(None)).all()}
+    totals = {}
+    row_count = 0
+    total_seconds = 0
+    for user_id, day, seconds in (
+        db.session.query(TimeLog.user_id, TimeLog.day, TimeLog.seconds).yield_per(batch_size)
+    ):
+        if user_id in deleted_ids:
+            continue
+        seconds = int(seconds or 0)
+        for period in ('week', 'month'):
+            key = (user_id, period, _period_start(day, period))
+            totals[key] = totals.get(key, 0) + seconds
+        if user_id not in excluded_ids:
+            row_count += 1
+            total_seconds += seconds
+    TimeLogRollup.query.delete(synchronize_session=False)
+    rows = [
+        {'user_id': user_id, 'period': period, 'period_start': start, 'seconds': seconds}
+        for (user_id, period, start), seconds in totals.items()
+    ]
+    for offset in range(0, len(rows), batch_size):
+        db.session.execute(TimeLogRollup.__table__.insert(), rows[offset:offset + batch_size])
+    AppCounter.query.filter(AppCounter.name.in_(['time_log_rows', 'time_log_seconds'])).delete(synchronize_session=False)
+    db.session.add_all([
+        AppCounter(name='time_log_rows', value=row_count),
+        AppCounter(name='time_log_seconds', value=total_seconds),
+    ])
+    db.session.commit()
+    return len(rows)
+
+
+def _reconcile_time_log_counters():
+    """Reset the time-log counters to what TimeLog holds for counted users.
+
+    Catches drift the incremental updates cannot see, such as a user whose email
+    moves them in or out of the exclusion list.
+    """
+    counted = (
+        select(TimeLog.id, TimeLog.seconds)
+        .join(User, User.id == TimeLog.user_id)
+        .where(User.is_excluded.is_(False), User.deleted_at.is_(None))
+        .subquery()
+    )
+    table = AppCounter.__table__
+    # Each counter is set from a subquery in one statement, so no increment lands between read and write
+    for name, value in (
+        ('time_log_rows', select(func.count(counted.c.id)).scalar_subquery()),
+        ('time_log_seconds', select(func.coalesce(func.sum(counted.c.seconds), 0)).scalar_subquery()),
+    ):
+        db.session.execute(table.update().where(table.c.name == name).values(value=value))
+    db.session.commit()
+
+
+def _ensure_time_log_rollups():
+    """Build rollups and counters once for databases that predate them.
+
+    Every worker calls this at startup; inserting the `time_log_rows` counter first
+    is the claim, so only the worker whose insert succeeds runs the rebuild. A failed
+    rebuild drops the claim again so the next start (or `flask rebuild-time-rollups`)
+    retries it.
+    """
+    if db.session.get(AppCounter, 'time_log_rows') is not None:
+        return False
+    try:
+        db.session.add(AppCounter(name='time_log_rows', value=0))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    try:
+        _rebuild_time_log_rollups()
+    except Exception:
+        db.session.rollback()
+        AppCounter.query.filter_by(name='time_log_rows').delete()
+        db.session.commit()
+        raise
+    return True
+
+
+def _user_owned_models():
+    """Tables keyed by user_id that are removed together with the user."""
+    return (Result, TimeLog, TimeLogRollup, Profile, UserMeta, ProfileMedia)
+
+
+def _user_row_count(user_id):
+    return sum(
+        db.session.query(func.count()).select_from(model).filter(model.user_id == user_id).scalar() or 0
+        for model in (Result, TimeLog)
+    )
+
+
+def _delete_user_rows(user_id, batch_size=None):
+    """DELETE ... WHERE user_id = ? on every user-owned table.
+
+    Without `batch_size` this is one statement per table in the caller's
+    transaction; with it, rows go in primary-key batches that commit as they go.
+    """
+    for model in _user_owned_models():
+        if batch_size is None:
+            model.query.filter(model.user_id == user_id).delete(synchronize_session=False)
+            continue
+        primary_key = model.__mapper__.primary_key[0]
+        while True:
+            ids = [row[0] for row in db.session.query(primary_key).filter(model.user_id == user_id).limit(batch_size)]
+            if not ids:
+                break
+            model.query.filter(primary_key.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+
+_USER_PURGE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-purge')
+
+
+def _purge_claim_expired(now):
+    return or_(User.purge_claimed_at.is_(None), User.purge_claimed_at < now - timedelta(seconds=USER_PURGE_CLAIM_SECONDS))
+
+
+def _claim_user_purge(user_id):
+    """Mark a tombstoned user's purge as taken by this worker.
+
+    Returns the claim time, which _release_user_purge() needs, or None when another
+    worker holds the purge.
+    """
+    now = datetime.utcnow()
+    # Core UPDATE so the claim does not invalidate caches keyed on user rows
+    claimed = db.session.execute(
+        User.__table__.update()
+        .where(User.id == user_id, User.deleted_at.isnot(None), _purge_claim_expired(now))
+        .values(purge_claimed_at=now)
+    ).rowcount
+    db.session.commit()
+    return now if claimed == 1 else None
+
+
+def _release_user_purge(user_id, claimed_at):
+    """Give up our claim so the purge can be retried at once rather than after it lapses."""
+    db.session.execute(
+        User.__table__.update()
+        .where(User.id == user_id, User.purge_claimed_at == claimed_at)
+        .values(purge_claimed_at=None)
+    )
+    db.session.commit()
+
+
+def _purge_user(user_id):
+    """Remove a tombstoned user's rows in batches, then the user itself."""
+    with app.app_context():
+        claimed_at = None
+        try:
+            claimed_at = _claim_user_purge(user_id)
+            if claimed_at is None:
+                return False
+            user = db.session.get(User, user_id)
+            if user is None:
+                return False
+            _delete_user_rows(user_id, batch_size=USER_PURGE_BATCH_SIZE)
+            db.session.delete(user)
+            db.session.commit()
+            return True
+        except Exception as exc:
+            db.session.rollback()
+            app.logger.exception(
+                'Purge of user %s failed; `flask purge-deleted-users` or the next start retries it: %s', user_id, exc
+            )
+            if claimed_at is not None:
+                try:
+                    _release_user_purge(user_id, claimed_at)
+                except Exception:
+                    db.session.rollback()
+            return False
+        finally:
+            db.session.remove()
+
+
+def _schedule_user_purge(user_id):
+    return _USER_PURGE_EXECUTOR.submit(_purge_user, user_id)
+
+
+def _pending_user_purges():
+    """IDs of tombstoned users whose purge nobody currently holds."""
+    return [
+        row[0]
+        for row in db.session.query(User.id)
+        .filter(User.deleted_at.isnot(None), _purge_claim_expired(datetime.utcnow()))
+        .all()
+    ]
+
+
+def _resume_user_purges():
+    """Re-queue purges that were interrupted by a restart.
+
+    Every worker runs this at startup; a purge another worker has claimed is
+    skipped here and again by the claim in _purge_user.
+    """
+    pending = _pending_user_purges()
+    for user_id in pending:
+        _schedule_user_purge(user_id)
+    return len(pending)
+
+
+def _flush_time_log_buffer():
+    """Write buffered heartbeat seconds to the database; returns rows written."""
+    with _TIME_LOG_FLUSH_LOCK:
+        with _TIME_LOG_BUFFER_LOCK:
+            if not _TIME_LOG_BUFFER:
+                return 0
+            pending = dict(_TIME_LOG_BUFFER)
+            _TIME_LOG_BUFFER.clear()
+        try:
+            written = _upsert_time_log_increments(pending)
+        except Exception as exc:
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            # Put the seconds back so the next flush retries them
+            with _TIME_LOG_BUFFER_LOCK:
+                for key, seconds in pending.items():
+                    _TIME_LOG_BUFFER[key] = _TIME_LOG_BUFFER.get(key, 0) + seconds
+                _TIME_LOG_STATS['failures'] += 1
+            app.logger.warning('Time log flush failed, %d rows kept for retry: %s', len(pending), exc)
+            return 0
+        with _TIME_LOG_BUFFER_LOCK:
+            _TIME_LOG_STATS['flushes'] += 1
+            _TIME_LOG_STATS['rows_written'] += written
+        return written
+
+
+def _time_log_flusher_loop(stop_event):
+    reconciled_at = time.monotonic()
+    while not stop_event.wait(TIME_LOG_FLUSH_INTERVAL_SECONDS):
+        with app.app_context():
+            _flush_time_log_buffer()
+            if time.monotonic() - reconciled_at >= TIME_LOG_RECONCILE_SECONDS:
+                reconciled_at = time.monotonic()
+                try:
+                    _reconcile_time_log_counters()
+                except Exception as exc:
+                    db.session.rollback()
+                    app.logger.warning('Time log counter reconcile failed: %s', exc)
+
+
+def _ensure_time_log_flusher():
+    thread = _TIME_LOG_FLUSHER['thread']
+    if thread is not None and thread.is_alive():
+        return
+    with _TIME_LOG_BUFFER_LOCK:
+        thread = _TIME_LOG_FLUSHER['thread']
+        if thread is not None and thread.is_alive():
+            return
+        _TIME_LOG_FLUSHER['stop'] = threading.Event()
+        thread = threading.Thread(
+            target=_time_log_flusher_loop,
+            args=(_TIME_LOG_FLUSHER['stop'],),
+            name='time-log-flusher',
+            daemon=True,
+        )
+        _TIME_LOG_FLUSHER['thread'] = thread
+        thread.start()
+
+
+def _buffer_time_log(user_id, day, seconds):
+    """Queue `seconds` for (user_id, day); flushes inline once the buffer is full."""
+    if seconds <= 0:
+        return
+    with _TIME_LOG_BUFFER_LOCK:
+        key = (user_id, day)
+        _TIME_LOG_BUFFER[key] = _TIME_LOG_BUFFER.get(key, 0) + seconds
+        _TIME_LOG_STATS['buffered'] += 1
+        full = len(_TIME_LOG_BUFFER) >= TIME_LOG_FLUSH_THRESHOLD
+    if full:
+        _flush_time_log_buffer()
+    else:
+        _ensure_time_log_flusher()
+
+
+def _pending_time_log_seconds(user_id):
+    """Return {day: seconds} buffered for a user but not yet flushed."""
+    with _TIME_LOG_BUFFER_LOCK:
+        return {day: seconds for (uid, day), seconds in _TIME_LOG_BUFFER.items() if uid == user_id}
+
+
+def _discard_pending_time_log(user_id):
+    with _TIME_LOG_BUFFER_LOCK:
+        for key in [key for key in _TIME_LOG_BUFFER if key[0] == user_id]:
+            del _TIME_LOG_BUFFER[key]
+
+
+def _time_log_buffer_stats():
+    with _TIME_LOG_BUFFER_LOCK:
+        stats = dict(_TIME_LOG_STATS)
+        stats['pending_rows'] = len(_TIME_LOG_BUFFER)
+    stats['write_behind'] = TIME_LOG_WRITE_BEHIND
+    stats['flush_interval_seconds'] = TIME_LOG_FLUSH_INTERVAL_SECONDS
+    return stats
+
+
+@atexit.register
+def _drain_time_log_buffer():
+    """Stop the flusher and write whatever is still buffered on shutdown."""
+    _TIME_LOG_FLUSHER['stop'].set()
+    thread = _TIME_LOG_FLUSHER['thread']
+    if thread is not None and thread.is_alive():
+        thread.join(timeout=5)
+    try:
+        with app.app_context():
+            _flush_time_log_buffer()
+    except Exception as exc:
+        app.logger.warning('Time log drain on shutdown failed: %s', exc)
+
+
 def _is_sqlite_database():
     try:
         return db.engine.url.get_backend_name() == 'sqlite'
@@ -945,6 +3239,7 @@ def _is_sqlite_database():
 
 # Ensure DB and tables exist
 with app.app_context():
+    _install_query_instrumentation(db.engine)
     db.create_all()
     # SQLite-only compatibility migrations for older local databases
     if _is_sqlite_database():
@@ -952,14 +3247,102 @@ with app.app_context():
         _ensure_user_admin_column()
         _ensure_usermeta_columns()
         _ensure_otp_attempts_column()
+    _ensure_result_scoring_columns()
+    _ensure_user_excluded_column()
+    _ensure_profile_media_columns()
+    _ensure_mail_outbox_columns()
+    _ensure_profile_username_index()
     # Ensure Profile table exists
     try:
         db.create_all()
     except Exception:
         pass
+    try:
+        flags_changed = _sync_excluded_user_flags()
+    except Exception as exc:
+        db.session.rollback()
+        flags_changed = 0
+        app.logger.warning('Excluded user flag sync skipped: %s', exc)
+    try:
+        _backfill_result_scoring_columns()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Result points backfill skipped: %s', exc)
+    try:
+        _ensure_time_log_rollups()
+        if flags_changed:
+            # Users moved in or out of the exclusion list take their rows with them
+            _reconcile_time_log_counters()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Time log rollup build skipped: %s', exc)
+    try:
+        _resume_user_purges()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Pending user purges not resumed: %s', exc)
+    try:
+        _resume_mail_outbox()
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.warning('Queued mail not resumed: %s', exc)
     _ensure_seed_admin()
     # Manual question management preferred; auto-generator removed
 
+@app.cli.command('backfill-result-points')
+def backfill_result_points_command():
+    """Recompute role/difficulty/points for results that predate those columns."""
+    _ensure_result_scoring_columns()
+    updated = _backfill_result_scoring_columns()
+    print(f"Backfilled {updated} result rows")
+
+
+@app.cli.command('rebuild-time-rollups')
+def rebuild_time_rollups_command():
+    """Recompute weekly/monthly time rollups and the admin time-log counters."""
+    _flush_time_log_buffer()
+    built = _rebuild_time_log_rollups()
+    print(f"Rebuilt {built} time rollup rows")
+
+
+@app.cli.command('dispatch-mail')
+def dispatch_mail_command():
+    """Send due outbox mail (including retries) and prune old failed rows; run it from a scheduler."""
+    sent = _drain_mail_outbox()
+    print(f"Processed {sent} outbox messages")
+
+
+@app.cli.command('dedupe-usernames')
+def dedupe_usernames_command():
+    """Rename duplicate usernames and create the unique username index."""
+    renamed = _dedupe_profile_usernames()
+    created = _ensure_profile_username_index()
+    print(f"Renamed {renamed} duplicate usernames; unique index {'present' if created else 'MISSING'}")
+
+
+@app.cli.command('purge-deleted-users')
+def purge_deleted_users_command():
+    """Finish purges of deleted accounts that failed or were interrupted; run it from a scheduler."""
+    pending = _pending_user_purges()
+    purged = sum(1 for user_id in pending if _purge_user(user_id))
+    print(f"Purged {purged} of {len(pending)} deleted users")
+
+
+@app.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Compile every template into the bytecode cache so cold workers skip the Jinja compile."""
+    compiled = _precompile_templates()
+    print(f"Precompiled {compiled} templates into {TEMPLATE_CACHE_DIR}")
+
+
+@app.cli.command('precompress-static')
+@click.option('--force', is_flag=True, help='Rewrite copies that are already up to date.')
+def precompress_static_command(force):
+    """Write .gz/.br copies of text static assets and questions.json for direct serving."""
+    written = _precompress_static_files(force=force)
+    print(f"Wrote {written} precompressed files ({', '.join(_available_encodings())})")
+
+
 @app.route('/')
 def start_page():
     """Serve the new start page."""
@@ -1892,6 +4275,150 @@ _forgot_password_form = """
 """
 
 
+# The inline auth pages sit behind the normal template loader so Jinja compiles
+# each one once and serves it from its template cache on later requests.
+AUTH_TEMPLATES = {
+    'auth/signup.html': _signup_form,
+    'auth/login.html': _login_form,
+    'auth/verify_otp.html': _verify_otp_form,
+    'auth/forgot_password.html': _forgot_password_form,
+}
+app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(AUTH_TEMPLATES)])
+
+
+def _install_template_bytecode_cache(directory=None):
+    """Persist compiled template code on disk so a fresh worker loads it instead of recompiling."""
+    directory = directory or TEMPLATE_CACHE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as exc:
+        # Read-only deploys still work; templates are just compiled per worker
+        app.logger.warning('Template bytecode cache disabled (%s): %s', directory, exc)
+        return None
+    cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.bytecode_cache = cache
+    return cache
+
+
+def _precompile_templates():
+    """Load every file and inline auth template, filling the in-memory and bytecode caches."""
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as exc:
+            app.logger.warning('Template %s failed to precompile: %s', name, exc)
+            continue
+        compiled += 1
+    return compiled
+
+
+_install_template_bytecode_cache()
+
+
+# -------- Auth attempt rate limiting --------
+class _RateLimitBackend(abc.ABC):
+    """Storage for token buckets. A shared implementation (e.g. Redis) lets all workers enforce one limit.
+
+    consume() must be atomic per key and return (allowed, retry_after_seconds).
+    """
+
+    @abc.abstractmethod
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        """Take `cost` tokens from `key`'s bucket; returns (allowed, retry_after_seconds)."""
+
+    @abc.abstractmethod
+    def reset(self, key=None):
+        """Refill `key`'s bucket, or every bucket when `key` is None."""
+
+
+class _MemoryRateLimitBackend(_RateLimitBackend):
+    """Token buckets in this process, so each worker enforces the limits on its own.
+
+    Least recently used keys are evicted beyond `max_keys`; an evicted bucket comes back full.
+    """
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((cost - tokens) / refill_per_second))
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+
+_RATE_LIMIT_BACKEND = {'backend': _MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS)}
+_RATE_LIMIT_STATS = Counter()
+_RATE_LIMIT_STATS_LOCK = threading.Lock()
+
+
+def _set_rate_limit_backend(backend):
+    """Swap the bucket storage; returns the previous backend."""
+    previous = _RATE_LIMIT_BACKEND['backend']
+    _RATE_LIMIT_BACKEND['backend'] = backend
+    return previous
+
+
+def _rate_limit_keys(scope, identifier):
+    keys = [(f"{scope}:ip:{request.remote_addr or 'unknown'}", RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE)]
+    identifier = (identifier or '').strip().lower()
+    if identifier:
+        keys.append((f"{scope}:id:{identifier}", RATE_LIMIT_IDENTIFIER_BURST, RATE_LIMIT_IDENTIFIER_PER_MINUTE))
+    return keys
+
+
+def _check_rate_limit(scope, identifier):
+    """Spend one token from the client-IP and identifier buckets; returns seconds to wait, or 0.
+
+    Uses only the in-memory/shared bucket store, so callers can reject before any DB query or hash.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    backend = _RATE_LIMIT_BACKEND['backend']
+    for key, burst, per_minute in _rate_limit_keys(scope, identifier):
+        allowed, retry_after = backend.consume(key, burst, per_minute / 60.0)
+        if not allowed:
+            with _RATE_LIMIT_STATS_LOCK:
+                _RATE_LIMIT_STATS[scope] += 1
+            return retry_after
+    return 0
+
+
+def _clear_identifier_rate_limit(scope, identifier):
+    """A successful attempt forgives earlier failures for that account (the IP bucket is kept)."""
+    identifier = (identifier or '').strip().lower()
+    if identifier:
+        _RATE_LIMIT_BACKEND['backend'].reset(f"{scope}:id:{identifier}")
+
+
+def _rate_limited_response(template, retry_after, **context):
+    flash(f'Too Many Attempts. Please try Again in {retry_after} Seconds')
+    response = app.make_response(render_template(template, **context))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
@@ -1903,17 +4430,17 @@ def signup():
         # Basic validation
         if not name or not email or not password:
             flash('Name, Email and Password are Required')
-            return render_template_string(_signup_form)
+            return render_template('auth/signup.html')
 
         # Check existing user
         existing = User.query.filter_by(email=email).first()
         if existing:
             flash('Account Already Exists')
-            return render_template_string(_signup_form)
+            return render_template('auth/signup.html')
 
         otp_code = f"{secrets.randbelow(1_000_000):06d}"
         expiry_time = datetime.utcnow() + timedelta(minutes=5)
-        password_hash = wz_generate_password_hash(password)
+        password_hash = _hash_password(password)
         session['pending_signup'] = {
             'email': email,
             'name': name,
@@ -1927,19 +4454,19 @@ def signup():
             entry = OTPVerification(email=email, otp=otp_code, expiry_time=expiry_time, attempts=0)
             db.session.add(entry)
             db.session.flush()
-            _send_otp_email(email, otp_code)
+            _send_otp_email(email, expires_at=expiry_time)
             db.session.commit()
         except Exception:
             db.session.rollback()
             session.pop('pending_signup', None)
             session.pop('pending_signup_email', None)
             flash('Failed to Send OTP. Please try Again')
-            return render_template_string(_signup_form)
+            return render_template('auth/signup.html')
 
         flash('Verification Code Sent to Your Email')
         return redirect(url_for('verify_otp'))
 
-    return render_template_string(_signup_form)
+    return render_template('auth/signup.html')
 
 
 @app.route('/verify-otp', methods=['GET', 'POST'])
@@ -1952,12 +4479,16 @@ def verify_otp():
 
         if not email or not otp_value:
             flash('Email and OTP are Required')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
+
+        retry_after = _check_rate_limit('verify_otp', email)
+        if retry_after:
+            return _rate_limited_response('auth/verify_otp.html', retry_after, email=email)
 
         record = OTPVerification.query.filter_by(email=email).first()
         if not record:
             flash('No Code Found. Please Signup Again')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         if record.attempts >= OTP_MAX_ATTEMPTS:
             try:
@@ -1968,7 +4499,7 @@ def verify_otp():
             session.pop('pending_signup', None)
             session.pop('pending_signup_email', None)
             flash('Too Many Incorrect Attempts. Please Signup Again')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         if record.expiry_time < datetime.utcnow():
             try:
@@ -1979,7 +4510,7 @@ def verify_otp():
             session.pop('pending_signup', None)
             session.pop('pending_signup_email', None)
             flash('Your Code is Expired. Resend Code')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         if record.otp != otp_value:
             try:
@@ -1997,14 +4528,14 @@ def verify_otp():
                 session.pop('pending_signup', None)
                 session.pop('pending_signup_email', None)
                 flash('Too Many Incorrect Attempts. Please Signup Again')
-                return render_template_string(_verify_otp_form, email=email)
+                return render_template('auth/verify_otp.html', email=email)
             flash('Incorrect Verification Code. Please Try Again')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         pending = session.get('pending_signup')
         if not pending or pending.get('email') != email:
             flash('Your Signup Session Expired. Resend Code')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         try:
             user = User(
@@ -2016,23 +4547,21 @@ def verify_otp():
             db.session.add(user)
             db.session.flush()
 
-            username = _generate_unique_username(pending.get('name'))
-            profile = Profile(user_id=user.id, username=username)
-            db.session.add(profile)
+            _add_profile_with_unique_username(user.id, pending.get('name'))
 
             OTPVerification.query.filter_by(email=email).delete()
             db.session.commit()
         except Exception:
             db.session.rollback()
             flash('Failed to Create Account. Please try Again')
-            return render_template_string(_verify_otp_form, email=email)
+            return render_template('auth/verify_otp.html', email=email)
 
         session.pop('pending_signup', None)
         session.pop('pending_signup_email', None)
         flash('Account Created Successfully')
         return redirect(url_for('login'))
 
-    return render_template_string(_verify_otp_form, email=prefill_email)
+    return render_template('auth/verify_otp.html', email=prefill_email)
 
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
@@ -2044,37 +4573,28 @@ def forgot_password():
 
         if not email:
             flash('Email is Required')
-            return render_template_string(_forgot_password_form, email=email)
+            return render_template('auth/forgot_password.html', email=email)
 
         user = User.query.filter_by(email=email).first()
         if not user:
             flash('No Account Exists with this Email')
-            return render_template_string(_forgot_password_form, email=email)
-
-        temp_password = _generate_temp_password()
-        new_hash = wz_generate_password_hash(temp_password)
-        old_hash = user.password_hash
+            return render_template('auth/forgot_password.html', email=email)
 
+        # The temporary password is generated and stored when the mail is delivered,
+        # so a reset that never arrives does not lock the user out
         try:
-            user.password_hash = new_hash
-            db.session.add(user)
-            db.session.commit()
+            _send_reset_password_email(user)
         except Exception:
             db.session.rollback()
-            flash('Unable to Reset Password. Try Again')
-            return render_template_string(_forgot_password_form, email=email)
+            flash('Failed to Send Password. Please try Again')
+            return render_template('auth/forgot_password.html', email=email)
 
         try:
-            _send_reset_password_email(email, temp_password)
+            db.session.commit()
         except Exception:
-            try:
-                user.password_hash = old_hash
-                db.session.add(user)
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
-            flash('Failed to Send Password. Please try Again')
-            return render_template_string(_forgot_password_form, email=email)
+            db.session.rollback()
+            flash('Unable to Reset Password. Try Again')
+            return render_template('auth/forgot_password.html', email=email)
 
         flash('Temporary Password Sent to Your Email')
         return redirect(url_for('login'))
@@ -2082,7 +4602,7 @@ def forgot_password():
     if request.method == 'GET' and prefill_email:
         prefill_email = prefill_email.strip().lower()
 
-    return render_template_string(_forgot_password_form, email=prefill_email)
+    return render_template('auth/forgot_password.html', email=prefill_email)
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -2093,20 +4613,26 @@ def login():
 
         if not identifier or not password:
             flash('Email and Password are Required')
-            return render_template_string(_login_form)
+            return render_template('auth/login.html')
 
-        user = _find_user_by_login_identifier(identifier)
+        retry_after = _check_rate_limit('login', identifier)
+        if retry_after:
+            return _rate_limited_response('auth/login.html', retry_after)
+
+        user, session_profile = _load_login_account(identifier)
         if not user or not user.check_password(password):
             flash('Invalid credentials')
-            return render_template_string(_login_form)
+            return render_template('auth/login.html')
 
         # Login success
-        _start_user_session(user)
+        _clear_identifier_rate_limit('login', identifier)
+        _rehash_password_if_stale(user, password)
+        _start_user_session(user, session_profile=session_profile)
 
         # redirect to landing page as requested
         return redirect(url_for('landing'))
 
-    return render_template_string(_login_form)
+    return render_template('auth/login.html')
 
 
 @app.route('/auth/<provider>')
@@ -2245,37 +4771,39 @@ def dashboard():
     if not session.get('user_id'):
         flash('Please Login to View Dashboard')
         return redirect(url_for('login'))
-    # Prefer session email; fallback to DB if needed
-    user_email = session.get('user_email')
-    if not user_email and session.get('user_id'):
+    user_id = session['user_id']
+    bootstrap = bootstrap_etags = None
+    if DASHBOARD_BOOTSTRAP:
         try:
-            u = User.query.get(session['user_id'])
-            user_email = u.email if u else None
-        except Exception:
-            user_email = None
-    # Determine avatar url quickly from session or fallback to DB
+            bootstrap, bootstrap_etags = _dashboard_bootstrap(user_id)
+        except Exception as exc:
+            # The page still loads its data over the JSON APIs
+            app.logger.warning('Dashboard bootstrap failed for user %s: %s', user_id, exc)
+    # Prefer session email and avatar; fall back to the profile if needed
+    user_email = session.get('user_email')
     avatar_url = session.get('avatar_url')
-    if not avatar_url and session.get('user_id'):
+    if not user_email or not avatar_url:
         try:
-            meta = UserMeta.query.filter_by(user_id=session['user_id']).first()
-            if meta and meta.profile_pic:
-                avatar_url = _avatar_url_for(meta.profile_pic, session['user_id'], cache_bust=False)
+            profile = bootstrap['profile']['profile'] if bootstrap else _profile_payload(user_id)
         except Exception:
-            avatar_url = None
-    leaderboard_entries = _build_leaderboard(limit=50)
-    leaderboard_entry = None
-    current_user_id = session.get('user_id')
-    if current_user_id:
-        for entry in leaderboard_entries:
-            if entry.get('user_id') == current_user_id:
-                leaderboard_entry = entry
-                break
+            profile = {}
+        user_email = user_email or profile.get('email') or None
+        avatar_url = avatar_url or profile.get('avatar_url')
+    leaderboard_rank = _get_leaderboard_rank(session.get('user_id'), neighbours=0)
+    leaderboard_entry = _get_leaderboard_entry(session.get('user_id'))
 
     return render_template(
         'dashboard.html',
         user_email=user_email,
         avatar_url=avatar_url,
+        dashboard_bootstrap=bootstrap,
+        dashboard_bootstrap_etags=bootstrap_etags,
         leaderboard_entry=leaderboard_entry,
+        leaderboard_rank={
+            'rank': leaderboard_rank['rank'],
+            'total': leaderboard_rank['total'],
+            'percentile': leaderboard_rank['percentile'],
+        },
     )
 
 
@@ -2285,6 +4813,19 @@ def leaderboard():
     return render_template('leaderboard.html', leaderboard_entries=entries)
 
 
+@app.route('/api/leaderboard/me')
+def api_leaderboard_me():
+    """Return the current user's rank, percentile and nearest competitors."""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    neighbours = request.args.get('neighbours', default=2, type=int)
+    if neighbours is None or neighbours < 0:
+        neighbours = 2
+    neighbours = min(neighbours, 10)
+    data = _get_leaderboard_rank(session['user_id'], neighbours=neighbours)
+    return jsonify({'success': True, **data})
+
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -2310,20 +4851,22 @@ def _require_admin():
 
 @admin_bp.route('/')
 def admin_dashboard():
-    excluded_ids = _get_excluded_user_ids()
+    user_query = User.query.filter(User.is_excluded.is_(False), User.deleted_at.is_(None))
 
-    user_query = User.query
-    timelog_query = TimeLog.query
-
-    if excluded_ids:
-        excluded_list = list(excluded_ids)
-        user_query = user_query.filter(~User.id.in_(excluded_list))
-        timelog_query = timelog_query.filter(~TimeLog.user_id.in_(excluded_list))
-
-    total_users = user_query.count()
-    total_time_logs = timelog_query.count()
+    total_users = (
+        db.session.query(func.count(User.id))
+        .filter(User.is_excluded.is_(False), User.deleted_at.is_(None))
+        .scalar()
+        or 0
+    )
+    total_time_logs = _get_counter('time_log_rows')
 
-    recent_users = user_query.order_by(User.id.desc()).limit(5).all()
+    recent_users = (
+        user_query.options(load_only(User.id, User.name, User.email, User.is_admin))
+        .order_by(User.id.desc())
+        .limit(5)
+        .all()
+    )
 
     return render_template(
         'index.html',
@@ -2336,19 +4879,67 @@ def admin_dashboard():
     )
 
 
+@admin_bp.route('/metrics/leaderboard')
+def admin_leaderboard_metrics():
+    return jsonify({'success': True, 'leaderboard_cache': _leaderboard_cache_stats()})
+
+
+@admin_bp.route('/metrics/compression')
+def admin_compression_metrics():
+    return jsonify({'success': True, 'compression': _compression_stats()})
+
+
+@admin_bp.route('/metrics/dashboard')
+def admin_dashboard_metrics():
+    return jsonify({'success': True, 'dashboard_bundles': _dashboard_bundle_stats()})
+
+
+@admin_bp.route('/metrics/queries')
+def admin_query_metrics():
+    return jsonify({
+        'success': True,
+        'repeat_threshold': QUERY_REPEAT_THRESHOLD,
+        'endpoints': _query_metrics_snapshot(),
+    })
+
+
+@admin_bp.route('/metrics/time_log')
+def admin_time_log_metrics():
+    return jsonify({'success': True, 'time_log_buffer': _time_log_buffer_stats()})
+
+
+@admin_bp.route('/metrics/mail')
+def admin_mail_metrics():
+    return jsonify({'success': True, 'mail': _mail_outbox_stats()})
+
+
+@admin_bp.route('/metrics/password_hashing')
+def admin_password_hash_metrics():
+    return jsonify({'success': True, 'password_hashing': _password_hash_stats()})
+
+
+@admin_bp.route('/metrics/rate_limits')
+def admin_rate_limit_metrics():
+    with _RATE_LIMIT_STATS_LOCK:
+        rejected = dict(_RATE_LIMIT_STATS)
+    return jsonify({'success': True, 'enabled': RATE_LIMIT_ENABLED, 'rejected': rejected})
+
+
 @admin_bp.route('/users')
 def admin_users():
-    excluded_ids = _get_excluded_user_ids()
-    users_query = User.query
-    if excluded_ids:
-        users_query = users_query.filter(~User.id.in_(list(excluded_ids)))
-    users = users_query.order_by(User.id.desc()).all()
+    users_query = User.query.filter(User.is_excluded.is_(False), User.deleted_at.is_(None))
+    # Only the columns the table renders; never ship password hashes to the template
+    users = (
+        users_query.options(load_only(User.id, User.name, User.email, User.is_admin))
+        .order_by(User.id.desc())
+        .all()
+    )
     profile_map = {}
     user_ids = [u.id for u in users]
     if user_ids:
         profile_map = {
-            p.user_id: p
-            for p in Profile.query.filter(Profile.user_id.in_(user_ids)).all()
+            row.user_id: row
+            for row in db.session.query(Profile.user_id, Profile.location).filter(Profile.user_id.in_(user_ids)).all()
         }
     return render_template(
         'index.html',
@@ -2403,7 +4994,7 @@ def admin_reset_password(user_id):
         return redirect(url_for('admin.admin_users'))
 
     try:
-        user.password_hash = wz_generate_password_hash(temp_password)
+        user.password_hash = _hash_password(temp_password)
         db.session.commit()
         flash(f'Password Resets For {user.name}')
     except Exception as exc:
@@ -2472,25 +5063,24 @@ def admin_delete_user(user_id):
         return redirect(url_for('admin.admin_users'))
 
     user = User.query.filter_by(id=user_id).first()
-    if not user:
+    if not user or user.deleted_at:
         flash('User Not Found')
         return redirect(url_for('admin.admin_users'))
 
     try:
-        for record in Profile.query.filter_by(user_id=user_id).all():
-            db.session.delete(record)
-        for record in UserMeta.query.filter_by(user_id=user_id).all():
-            db.session.delete(record)
-        for record in Result.query.filter_by(user_id=user_id).all():
-            db.session.delete(record)
-        for record in TimeLog.query.filter_by(user_id=user_id).all():
-            db.session.delete(record)
-        media_entry = ProfileMedia.query.filter_by(user_id=user_id).first()
-        if media_entry:
-            db.session.delete(media_entry)
-
-        db.session.delete(user)
-        db.session.commit()
+        # Large accounts are tombstoned now and purged in batches off the request
+        run_async = request.form.get('mode') == 'async' or _user_row_count(user_id) > USER_PURGE_ASYNC_THRESHOLD
+        _forget_time_log_user(user)
+        if run_async:
+            user.deleted_at = datetime.utcnow()
+            _mark_caches_dirty(db.session, 'leaderboard')
+            db.session.commit()
+            _schedule_user_purge(user_id)
+            flash('User Deletion Scheduled')
+        else:
+            _delete_user_rows(user_id)
+            db.session.delete(user)
+            db.session.commit()
     except Exception as exc:
         db.session.rollback()
         flash(f'Failed to delete user: {exc}')
@@ -2500,22 +5090,264 @@ def admin_delete_user(user_id):
 app.register_blueprint(admin_bp)
 
 
+def _avatar_content_hash(blob):
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _avatar_version(content_hash, updated_at):
+    """Stable URL token for an avatar: hash prefix, or the update time for unhashed legacy rows."""
+    if content_hash:
+        return content_hash[:16]
+    if updated_at:
+        return str(int(updated_at.replace(tzinfo=timezone.utc).timestamp()))
+    return None
+
+
+def _avatar_versions_for(user_ids):
+    """Return {user_id: version token} for users with DB-backed avatars, without loading blobs."""
+    if not user_ids:
+        return {}
+    rows = (
+        db.session.query(ProfileMedia.user_id, ProfileMedia.content_hash, ProfileMedia.updated_at)
+        .filter(ProfileMedia.user_id.in_(list(user_ids)))
+        .all()
+    )
+    return {user_id: _avatar_version(content_hash, updated_at) for user_id, content_hash, updated_at in rows}
+
+
+def _avatar_not_modified(etag, updated_at):
+    """True when the request's validators show the client already has this avatar."""
+    if request.if_none_match:
+        return bool(etag) and request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    if since and updated_at:
+        return updated_at.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    return False
+
+
+def _avatar_cache_path(content_hash, content_type):
+    extension = AVATAR_FILE_EXTENSIONS.get((content_type or '').lower(), 'bin')
+    return os.path.join(AVATAR_CACHE_DIR, content_hash[:2], f"{content_hash}.{extension}")
+
+
+def _write_avatar_cache_file(path, blob):
+    """Atomically write `blob` to `path` in the avatar cache; returns the path or None."""
+    if os.path.exists(path):
+        return path
+    try:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(blob)
+        # Atomic rename so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+        return path
+    except OSError as exc:
+        app.logger.warning('Could not write avatar cache file %s: %s', path, exc)
+        return None
+
+
+def _materialize_avatar(content_hash, content_type, blob):
+    """Write an avatar blob to the content-addressed cache; returns the path or None."""
+    return _write_avatar_cache_file(_avatar_cache_path(content_hash, content_type), blob)
+
+
+def _avatar_thumbnail_path(content_hash, size, image_format):
+    return os.path.join(AVATAR_CACHE_DIR, content_hash[:2], f"{content_hash}-{size}.{image_format}")
+
+
+_AVATAR_THUMBNAIL_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='avatar-thumbs')
+_AVATAR_THUMBNAIL_JOBS = {}
+_AVATAR_THUMBNAIL_LOCK = threading.Lock()
+
+
+def _render_avatar_thumbnails(content_hash, source):
+    """Decode an avatar once and write every size/format thumbnail, without metadata.
+
+    `source` is the original image as bytes or a cache file path. Returns the
+    number of files written; undecodable uploads are logged and skipped.
+    """
+    written = 0
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            if image.width * image.height > AVATAR_MAX_PIXELS:
+                raise ValueError(f'image too large ({image.width}x{image.height})')
+            # Apply EXIF orientation before the metadata is dropped
+            image = ImageOps.exif_transpose(image).convert('RGBA')
+            for size in AVATAR_THUMBNAIL_SIZES:
+                thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                for image_format in AVATAR_THUMBNAIL_FORMATS:
+                    buffer = io.BytesIO()
+                    if image_format == 'webp':
+                        thumb.save(buffer, format='WEBP', quality=82, method=4)
+                    else:
+                        thumb.save(buffer, format='PNG', optimize=True)
+                    if _write_avatar_cache_file(_avatar_thumbnail_path(content_hash, size, image_format), buffer.getvalue()):
+                        written += 1
+    except Exception as exc:
+        app.logger.warning('Avatar thumbnails skipped for %s: %s', content_hash, exc)
+    finally:
+        with _AVATAR_THUMBNAIL_LOCK:
+            _AVATAR_THUMBNAIL_JOBS.pop(content_hash, None)
+    return written
+
+
+# Pillow format used to re-encode each accepted upload type
+AVATAR_PIL_FORMATS = {
+    'image/png': 'PNG',
+    'image/jpeg': 'JPEG',
+    'image/gif': 'GIF',
+    'image/webp': 'WEBP',
+}
+
+
+def _strip_avatar_metadata(blob, content_type):
+    """Re-encode an uploaded avatar without EXIF/XMP/text metadata (GPS, camera, timestamps).
+
+    EXIF orientation is applied to the pixels first and the colour profile is kept.
+    Uploads Pillow is missing for, cannot decode or refuses as too large are
+    returned unchanged.
+    """
+    image_format = AVATAR_PIL_FORMATS.get(content_type)
+    if Image is None or image_format is None:
+        return blob
+    try:
+        with Image.open(io.BytesIO(blob)) as image:
+            if image.width * image.height > AVATAR_MAX_PIXELS:
+                raise ValueError(f'image too large ({image.width}x{image.height})')
+            icc_profile = image.info.get('icc_profile')
+            buffer = io.BytesIO()
+            if image_format == 'GIF' and getattr(image, 'is_animated', False):
+                loop = image.info.get('loop', 0)
+                image.info.pop('comment', None)
+                image.save(buffer, format='GIF', save_all=True, loop=loop, comment=b'')
+                return buffer.getvalue()
+            image = ImageOps.exif_transpose(image)
+            # Pillow writes back comments, EXIF and XMP it finds in `info`
+            image.info = {}
+            options = {'icc_profile': icc_profile} if icc_profile and image_format != 'GIF' else {}
+            if image_format == 'JPEG':
+                if image.mode not in ('RGB', 'L', 'CMYK'):
+                    image = image.convert('RGB')
+                options['quality'] = 90
+            elif image_format == 'WEBP':
+                options['quality'] = 90
+            image.save(buffer, format=image_format, **options)
+            return buffer.getvalue()
+    except Exception as exc:
+        app.logger.warning('Avatar stored without re-encoding: %s', exc)
+        return blob
+
+
+def _schedule_avatar_thumbnails(content_hash, source):
+    """Queue thumbnail generation off the request thread; returns the job's future."""
+    if Image is None or not content_hash:
+        return None
+    with _AVATAR_THUMBNAIL_LOCK:
+        future = _AVATAR_THUMBNAIL_JOBS.get(content_hash)
+        if future is None:
+            future = _AVATAR_THUMBNAIL_EXECUTOR.submit(_render_avatar_thumbnails, content_hash, source)
+            _AVATAR_THUMBNAIL_JOBS[content_hash] = future
+    return future
+
+
+def _requested_avatar_variant():
+    """Return (size, format) for a `?size=` request, or None to serve the original."""
+    requested = request.args.get('size', type=int)
+    if Image is None or not requested or requested <= 0:
+        return None
+    size = next((candidate for candidate in AVATAR_THUMBNAIL_SIZES if candidate >= requested), AVATAR_THUMBNAIL_SIZES[-1])
+    # Only an explicit image/webp counts; */* alone does not mean the browser decodes WebP
+    accepts_webp = any(value == 'image/webp' for value, _quality in request.accept_mimetypes)
+    return size, ('webp' if accepts_webp else 'png')
+
+
 @app.route('/media/profile/<int:user_id>')
 def profile_media(user_id):
-    media = ProfileMedia.query.filter_by(user_id=user_id).first()
-    if not media or not media.data:
+    row = (
+        db.session.query(ProfileMedia.content_type, ProfileMedia.content_hash, ProfileMedia.updated_at)
+        .filter(ProfileMedia.user_id == user_id)
+        .first()
+    )
+    if not row:
         abort(404)
-    buffer = io.BytesIO(media.data)
-    buffer.seek(0)
+    content_type, content_hash, updated_at = row
+    mimetype = content_type or 'image/png'
+    immutable = request.args.get('v') == _avatar_version(content_hash, updated_at)
+    cache_control = (
+        f'public, max-age={AVATAR_IMMUTABLE_MAX_AGE}, immutable' if immutable else 'private, max-age=86400'
+    )
+
+    variant = _requested_avatar_variant() if content_hash else None
+    thumbnail_path = _avatar_thumbnail_path(content_hash, *variant) if variant else None
+    thumbnail_ready = bool(thumbnail_path) and os.path.exists(thumbnail_path)
+    etag = f"{content_hash}-{variant[0]}.{variant[1]}" if thumbnail_ready else content_hash
+
+    if variant and not thumbnail_ready:
+        # Serve the original for now and let the client pick up the thumbnail next time
+        cache_control = 'no-cache'
+
+    if _avatar_not_modified(etag, updated_at):
+        response = app.response_class(status=304)
+        if etag:
+            response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if variant:
+            response.vary.add('Accept')
+        return response
+
+    if thumbnail_ready:
+        response = send_file(
+            thumbnail_path,
+            mimetype=AVATAR_THUMBNAIL_FORMATS[variant[1]],
+            download_name=f"avatar-{user_id}-{variant[0]}.{variant[1]}",
+            etag=etag,
+            last_modified=updated_at,
+        )
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept')
+        return response
+
+    path = _avatar_cache_path(content_hash, mimetype) if content_hash else None
+    if not path or not os.path.exists(path):
+        # Cache miss: the DB blob is the source of truth
+        media = db.session.get(ProfileMedia, user_id)
+        blob = media.data if media else None
+        if not blob:
+            abort(404)
+        if not content_hash:
+            content_hash = _avatar_content_hash(blob)
+            # Keep updated_at as-is so Last-Modified and existing URLs stay valid
+            db.session.execute(
+                ProfileMedia.__table__.update()
+                .where(ProfileMedia.user_id == user_id)
+                .values(content_hash=content_hash, updated_at=updated_at)
+            )
+            db.session.commit()
+        path = _materialize_avatar(content_hash, mimetype, blob)
+        if variant:
+            _schedule_avatar_thumbnails(content_hash, path or blob)
+        if not path:
+            buffer = io.BytesIO(blob)
+            response = send_file(buffer, mimetype=mimetype, etag=content_hash, last_modified=updated_at)
+            response.headers['Cache-Control'] = cache_control
+            return response
+    elif variant:
+        _schedule_avatar_thumbnails(content_hash, path)
+
     response = send_file(
-        buffer,
-        mimetype=media.content_type or 'image/png',
+        path,
+        mimetype=mimetype,
         as_attachment=False,
-        download_name=f"avatar-{user_id}.png",
+        download_name=f"avatar-{user_id}.{AVATAR_FILE_EXTENSIONS.get(mimetype, 'png')}",
+        etag=content_hash,
+        last_modified=updated_at,
     )
-    response.headers['Cache-Control'] = 'private, max-age=86400'
-    if media.updated_at:
-        response.headers['Last-Modified'] = http_date(media.updated_at)
+    # A versioned URL never changes content, so it can be cached as immutable
+    response.headers['Cache-Control'] = cache_control
+    if variant:
+        response.vary.add('Accept')
     return response
 
 
@@ -2557,16 +5389,25 @@ def profile_picture():
         if not media:
             media = ProfileMedia(user_id=user_id)
         media.content_type = mimetype or 'image/png'
+        blob = _strip_avatar_metadata(blob, media.content_type)
         media.data = blob
+        media.content_hash = _avatar_content_hash(blob)
         db.session.add(media)
         meta.profile_pic = f"media/profile/{user_id}"
         db.session.commit()
+        _materialize_avatar(media.content_hash, media.content_type, blob)
+        _schedule_avatar_thumbnails(media.content_hash, blob)
         if legacy_path and os.path.exists(legacy_path):
             try:
                 os.remove(legacy_path)
             except Exception:
                 pass
-        resolved_url = _avatar_url_for(meta.profile_pic, user_id, cache_bust=True)
+        resolved_url = _avatar_url_for(
+            meta.profile_pic,
+            user_id,
+            version=_avatar_version(media.content_hash, media.updated_at),
+            size=AVATAR_PROFILE_SIZE,
+        )
         # Update session avatar for immediate persistence across navigation
         try:
             session['avatar_url'] = resolved_url
@@ -2688,11 +5529,59 @@ def update_profile():
         for k in ('bio', 'university', 'location', 'pronouns'):
             if k in data:
                 setattr(prof, k, (data.get(k) or '').strip() if data.get(k) is not None else None)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # uq_profile_username caught a concurrent update that took the name after our check
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Username already taken. Choose another.'}), 400
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _profile_payload(user_id):
+    """The /api/profile document for a user, read in one joined query."""
+    row = (
+        db.session.query(
+            User.name,
+            User.email,
+            User.gender,
+            Profile.username,
+            Profile.bio,
+            Profile.university,
+            Profile.location,
+            Profile.pronouns,
+            UserMeta.website,
+            UserMeta.linkedin,
+            UserMeta.github,
+            UserMeta.dob,
+            UserMeta.profile_pic,
+            ProfileMedia.content_hash,
+            ProfileMedia.updated_at,
+        )
+        .select_from(User)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .outerjoin(UserMeta, UserMeta.user_id == User.id)
+        .outerjoin(ProfileMedia, ProfileMedia.user_id == User.id)
+        .filter(User.id == user_id)
+        .first()
+    )
+    keys = ('name', 'email', 'gender', 'username', 'bio', 'university', 'location', 'pronouns', 'website', 'linkedin', 'github', 'dob')
+    data = {key: (getattr(row, key) if row else None) or '' for key in keys}
+    data['avatar_path'] = row.profile_pic if row and row.profile_pic else None
+    # convenience URL for front-end
+    data['avatar_url'] = (
+        _avatar_url_for(
+            data['avatar_path'],
+            user_id,
+            version=_avatar_version(row.content_hash, row.updated_at),
+            size=AVATAR_PROFILE_SIZE,
+        )
+        if data['avatar_path'] else None
+    )
+    return data
+
+
 # New unified profile API for dashboard persistence
 @app.route('/api/profile', methods=['GET', 'POST'])
 def api_profile():
@@ -2702,27 +5591,7 @@ def api_profile():
 
     if request.method == 'GET':
         try:
-            user = User.query.get(user_id)
-            meta = UserMeta.query.filter_by(user_id=user_id).first()
-            prof = Profile.query.filter_by(user_id=user_id).first()
-            data = {
-                'name': user.name if user else '',
-                'email': user.email if user else '',
-                'username': prof.username if prof and prof.username else '',
-                'bio': prof.bio if prof and prof.bio else '',
-                'university': prof.university if prof and prof.university else '',
-                'location': prof.location if prof and prof.location else '',
-                'website': meta.website if meta and meta.website else '',
-                'linkedin': meta.linkedin if meta and meta.linkedin else '',
-                'github': meta.github if meta and meta.github else '',
-                'gender': user.gender if user and user.gender else '',
-                'dob': meta.dob if meta and meta.dob else '',
-                'pronouns': prof.pronouns if prof and prof.pronouns else '',
-                'avatar_path': meta.profile_pic if meta and meta.profile_pic else None,
-            }
-            # convenience URL for front-end
-            data['avatar_url'] = _avatar_url_for(data['avatar_path'], user_id) if data['avatar_path'] else None
-            return jsonify({'success': True, 'profile': data})
+            return jsonify({'success': True, 'profile': _profile_payload(user_id)})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -2767,7 +5636,12 @@ def api_profile():
                 val = payload.get(key)
                 setattr(prof, key, (val or '').strip() if isinstance(val, str) else val)
 
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # uq_profile_username caught a concurrent update that took the name after our check
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Username already taken. Choose another.'}), 400
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2793,7 +5667,7 @@ def change_password():
         return jsonify({'success': False, 'error': 'Current password is incorrect.'}), 400
 
     try:
-        user.password_hash = wz_generate_password_hash(new_password)
+        user.password_hash = _hash_password(new_password)
         db.session.add(user)
         db.session.commit()
         return jsonify({'success': True})
@@ -2831,8 +5705,8 @@ def get_questions():
 @app.route('/questions.json')
 def serve_questions_json():
     try:
-        # Use send_from_directory to ensure correct mimetype and caching headers
-        return send_from_directory(app.root_path, 'questions.json', mimetype='application/json')
+        # Serves the .br/.gz copy from `flask precompress-static` when the client accepts it
+        return _send_precompressed(app.root_path, 'questions.json', mimetype='application/json')
     except FileNotFoundError:
         return jsonify({'success': False, 'error': 'Questions dataset not found.'}), 404
 
@@ -3007,8 +5881,22 @@ def submit_answer():
                 except Exception:
                     details['duration_seconds'] = 0.0
                     details['duration_minutes'] = 0.0
+                scoring = _result_scoring_fields(
+                    'interview',
+                    avg or 0.0,
+                    session_data.get('role'),
+                    session_data.get('difficulty'),
+                )
+                scoring.update(_result_detail_summary(details))
                 try:
-                    r = Result(user_id=user_id, title=title, score=avg or 0.0, kind='interview', details=json.dumps(details))
+                    r = Result(
+                        user_id=user_id,
+                        title=title,
+                        score=avg or 0.0,
+                        kind='interview',
+                        details=json.dumps(details),
+                        **scoring,
+                    )
                     db.session.add(r)
                     db.session.commit()
                 except Exception:
@@ -3065,57 +5953,217 @@ def end_session(session_id):
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Session not found'}), 404
 
+RESULT_LIST_FIELDS = (
+    'sno',
+    'id',
+    'type',
+    'title',
+    'score',
+    'date',
+    'time',
+    'role',
+    'difficulty',
+    'question_count',
+    'duration',
+)
+# Fields that require decoding the details blob; only returned when asked for
+RESULT_HEAVY_FIELDS = ('questions',)
+RESULTS_PAGE_DEFAULT = 50
+RESULTS_PAGE_MAX = 200
+
+
+def _parse_result_fields(raw):
+    """Resolve a `fields=` projection into the set of result keys to return."""
+    requested = {part.strip() for part in (raw or '').split(',') if part.strip()}
+    allowed = requested & set(RESULT_LIST_FIELDS + RESULT_HEAVY_FIELDS)
+    if not allowed:
+        return set(RESULT_LIST_FIELDS)
+    allowed.add('id')
+    return allowed
+
+
+def _encode_results_cursor(row, position):
+    payload = {
+        'ts': row.timestamp.isoformat() if row.timestamp else None,
+        'id': row.id,
+        'n': position,
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def _decode_results_cursor(raw):
+    """Decode a results cursor; raises ValueError when it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(raw.encode('ascii')).decode('utf-8'))
+        timestamp = datetime.fromisoformat(payload['ts']) if payload.get('ts') else None
+        return {'ts': timestamp, 'id': int(payload['id']), 'n': max(0, int(payload.get('n') or 0))}
+    except (TypeError, ValueError, KeyError, UnicodeError, AttributeError):
+        raise ValueError('Invalid cursor')
+
+
+def _serialize_result_row(row, sno, fields, details=None):
+    """Build the API representation of a result from its (projected) columns."""
+    dt = row.timestamp or datetime.utcnow()
+    question_count = row.question_count
+    duration_seconds = row.duration_seconds
+    if details is not None and question_count is None:
+        fallback = _result_detail_summary(details)
+        question_count = fallback['question_count']
+        duration_seconds = fallback['duration_seconds']
+    full = {
+        'sno': sno,
+        'id': row.id,
+        'type': (row.kind or 'interview').capitalize(),
+        'title': row.title,
+        'score': row.score,
+        'date': dt.strftime('%Y-%m-%d'),
+        'time': dt.strftime('%I:%M %p'),
+        'role': row.role or '',
+        'difficulty': row.difficulty or '',
+        'question_count': int(question_count or 0),
+        'duration': round(duration_seconds / 60.0, 2) if duration_seconds is not None else None,
+    }
+    if 'questions' in fields:
+        full['questions'] = _load_details_dict(details).get('questions') or []
+    return {key: value for key, value in full.items() if key in fields}
+
+
+def _results_summary(user_id):
+    """Count a user's results per kind and average their scores in SQL."""
+    rows = (
+        db.session.query(
+            Result.kind,
+            func.count(Result.id),
+            func.count(Result.score),
+            func.sum(Result.score),
+        )
+        .filter(Result.user_id == user_id)
+        .group_by(Result.kind)
+        .all()
+    )
+    summary = {'total': 0, 'quiz': 0, 'interview': 0, 'average_score': None}
+    scored = 0
+    score_sum = 0.0
+    for kind, count, score_count, total_score in rows:
+        bucket = 'quiz' if (kind or '').lower() == 'quiz' else 'interview'
+        summary[bucket] += int(count or 0)
+        summary['total'] += int(count or 0)
+        scored += int(score_count or 0)
+        score_sum += float(total_score or 0.0)
+    if scored:
+        summary['average_score'] = round(score_sum / scored, 1)
+    return summary
+
+
+def _results_page(user_id, fields, limit, cursor=None):
+    """One keyset page of a user's results, newest first; returns (rows, next_cursor)."""
+    columns = [
+        Result.id,
+        Result.kind,
+        Result.title,
+        Result.score,
+        Result.timestamp,
+        Result.role,
+        Result.difficulty,
+        Result.question_count,
+        Result.duration_seconds,
+    ]
+    wants_details = bool(fields & set(RESULT_HEAVY_FIELDS))
+    if wants_details:
+        columns.append(Result.details)
+
+    query = db.session.query(*columns).filter(Result.user_id == user_id)
+    if cursor:
+        if cursor['ts'] is not None:
+            query = query.filter(or_(
+                Result.timestamp < cursor['ts'],
+                and_(Result.timestamp == cursor['ts'], Result.id < cursor['id']),
+            ))
+        else:
+            query = query.filter(Result.id < cursor['id'])
+    rows = query.order_by(Result.timestamp.desc(), Result.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    details_by_id = {}
+    if wants_details:
+        details_by_id = {row.id: row.details for row in rows}
+    else:
+        # Rows not yet backfilled still need their details for counts/durations
+        legacy_ids = [row.id for row in rows if row.question_count is None]
+        if legacy_ids:
+            details_by_id = dict(
+                db.session.query(Result.id, Result.details).filter(Result.id.in_(legacy_ids)).all()
+            )
+
+    offset = cursor['n'] if cursor else 0
+    out = [
+        _serialize_result_row(row, offset + idx, fields, details_by_id.get(row.id))
+        for idx, row in enumerate(rows, start=1)
+    ]
+    next_cursor = _encode_results_cursor(rows[-1], offset + len(rows)) if has_more and rows else None
+    return out, next_cursor
+
+
 # Return only real results saved in DB for the logged-in user
 @app.route('/api/results')
 def api_results():
+    """List the user's results newest first.
+
+    Supports `limit` + `cursor` keyset pagination, a `fields=` projection
+    (`questions` is opt-in), and `summary=1` for per-kind counts only.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     user_id = session['user_id']
     try:
-        _ensure_result_details_column()
-        rows = Result.query.filter_by(user_id=user_id).order_by(Result.timestamp.desc()).all()
-        out = []
-        for idx, r in enumerate(rows, start=1):
-            # Defaults
-            role = ''
-            difficulty = ''
-            questions = []
-            duration_minutes = None
+        if request.args.get('summary') in ('1', 'true'):
+            return jsonify({'success': True, 'summary': _results_summary(user_id)})
+
+        fields = _parse_result_fields(request.args.get('fields'))
+        limit = request.args.get('limit', default=RESULTS_PAGE_DEFAULT, type=int)
+        if limit is None or limit <= 0:
+            limit = RESULTS_PAGE_DEFAULT
+        limit = min(limit, RESULTS_PAGE_MAX)
+
+        cursor = None
+        raw_cursor = request.args.get('cursor')
+        if raw_cursor:
             try:
-                if r.details:
-                    d = json.loads(r.details)
-                    role = (d.get('role') or '')
-                    difficulty = (d.get('difficulty') or '')
-                    questions = d.get('questions') or []
-                    raw_minutes = d.get('duration_minutes')
-                    raw_seconds = d.get('duration_seconds')
-                    if raw_minutes is not None:
-                        try:
-                            duration_minutes = float(raw_minutes)
-                        except (TypeError, ValueError):
-                            duration_minutes = None
-                    elif raw_seconds is not None:
-                        try:
-                            duration_minutes = float(raw_seconds) / 60.0
-                        except (TypeError, ValueError):
-                            duration_minutes = None
-            except Exception:
-                pass
-            dt = r.timestamp or datetime.utcnow()
-            out.append({
-                'sno': idx,
-                'id': r.id,
-                'type': (r.kind or 'interview').capitalize(),
-                'title': r.title,
-                'score': r.score,
-                'date': dt.strftime('%Y-%m-%d'),
-                'time': dt.strftime('%I:%M %p'),
-                'role': role,
-                'difficulty': difficulty,
-                'questions': questions,
-                'duration': duration_minutes,
-            })
-        return jsonify({'success': True, 'results': out})
+                cursor = _decode_results_cursor(raw_cursor)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+
+        out, next_cursor = _results_page(user_id, fields, limit, cursor)
+        return jsonify({'success': True, 'results': out, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/results/<int:result_id>', methods=['GET'])
+def get_result(result_id):
+    """Return one result with its full details payload (questions, answers, feedback)."""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    user_id = session['user_id']
+    try:
+        record = (
+            Result.query.options(undefer(Result.details))
+            .filter_by(id=result_id, user_id=user_id)
+            .first()
+        )
+        if not record:
+            return jsonify({'success': False, 'error': 'Result not found'}), 404
+        details = _load_details_dict(record.details)
+        data = _serialize_result_row(
+            record,
+            None,
+            set(RESULT_LIST_FIELDS + RESULT_HEAVY_FIELDS),
+            details,
+        )
+        data.pop('sno', None)
+        data['details'] = details
+        return jsonify({'success': True, 'result': data})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -3180,7 +6228,9 @@ def save_quiz_result():
             details['duration_seconds'] = round(duration_seconds, 2)
             details['duration_minutes'] = round(duration_seconds / 60.0, 2)
         _ensure_result_details_column()
-        r = Result(user_id=user_id, title=title, score=pct, kind='quiz', details=json.dumps(details))
+        scoring = _result_scoring_fields('quiz', pct, role, difficulty)
+        scoring.update(_result_detail_summary(details))
+        r = Result(user_id=user_id, title=title, score=pct, kind='quiz', details=json.dumps(details), **scoring)
         db.session.add(r)
         db.session.commit()
         return jsonify({'success': True})
@@ -3211,14 +6261,10 @@ def time_log():
         if seconds > 3600:
             seconds = 3600
         today = date.today()
-        row = TimeLog.query.filter_by(user_id=user_id, day=today).first()
-        if not row:
-            row = TimeLog(user_id=user_id, day=today, seconds=seconds)
-            db.session.add(row)
+        if TIME_LOG_WRITE_BEHIND:
+            _buffer_time_log(user_id, today, seconds)
         else:
-            row.seconds = int(row.seconds or 0) + seconds
-            db.session.add(row)
-        db.session.commit()
+            _upsert_time_log_increments({(user_id, today): seconds})
         return jsonify({'success': True})
     except Exception as e:
         try:
@@ -3228,37 +6274,102 @@ def time_log():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _stored_time_by_period(user_id, granularity, start_day, end_start):
+    """{period_start: seconds} already written to TimeLog (days) or its rollups (weeks, months)."""
+    if granularity == 'day':
+        rows = (
+            db.session.query(TimeLog.day, TimeLog.seconds)
+            .filter(TimeLog.user_id == user_id)
+            .filter(TimeLog.day >= start_day)
+            .filter(TimeLog.day <= end_start)
+            .all()
+        )
+    else:
+        rows = (
+            db.session.query(TimeLogRollup.period_start, TimeLogRollup.seconds)
+            .filter(TimeLogRollup.user_id == user_id)
+            .filter(TimeLogRollup.period == granularity)
+            .filter(TimeLogRollup.period_start >= start_day)
+            .filter(TimeLogRollup.period_start <= end_start)
+            .all()
+        )
+    return {start: int(seconds or 0) for start, seconds in rows}
+
+
+def _time_series_payload(user_id, granularity, periods, stored=None):
+    """The /api/time_stats document. `stored` reuses a cached _stored_time_by_period() result;
+    heartbeats still in the write-behind buffer are always added on top."""
+    end_start = _period_start(date.today(), granularity)
+    start_day = _shift_period(end_start, granularity, -(periods - 1))
+    if stored is None:
+        stored = _stored_time_by_period(user_id, granularity, start_day, end_start)
+    by_period = dict(stored)
+    for day, seconds in _pending_time_log_seconds(user_id).items():
+        start = _period_start(day, granularity)
+        if start_day <= start <= end_start:
+            by_period[start] = by_period.get(start, 0) + seconds
+
+    starts = [_shift_period(start_day, granularity, step) for step in range(periods)]
+    return {
+        'success': True,
+        'granularity': granularity,
+        'labels': [start.strftime('%Y-%m-%d') for start in starts],
+        'series': [by_period.get(start, 0) for start in starts],
+    }
+
+
+@app.route('/api/dashboard_bootstrap')
+def api_dashboard_bootstrap():
+    """Return the dashboard's profile, first results page and daily time series in one response.
+
+    `sections` mirrors the /api/profile, /api/results?limit=200 and /api/time_stats?days=N
+    responses and `etags` holds one ETag per section. Sections whose ETag the client
+    sends back in If-None-Match are left out of `sections` and listed in `unchanged`.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    user_id = session['user_id']
+    default_days, max_days = TIME_STATS_GRANULARITIES['day']
+    days = request.args.get('days', default=default_days, type=int)
+    if days is None or days <= 0:
+        days = default_days
+    days = min(days, max_days)
+    try:
+        sections, etags = _dashboard_bootstrap(user_id, days)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    unchanged = [name for name, etag in etags.items() if request.if_none_match.contains(etag)]
+    return jsonify({
+        'success': True,
+        'sections': {name: payload for name, payload in sections.items() if name not in unchanged},
+        'etags': etags,
+        'unchanged': unchanged,
+    })
+
+
 @app.route('/api/time_stats')
 def time_stats():
-    """Return per-day seconds for the last N days (default 30, max 365)."""
+    """Return seconds per day, week or month for the current user.
+
+    `granularity=day` (default) covers the last `days` days (default 30, max 365);
+    `week` and `month` cover the last `periods` periods and read the rollup table.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     user_id = session['user_id']
+    granularity = (request.args.get('granularity') or 'day').strip().lower()
+    if granularity not in TIME_STATS_GRANULARITIES:
+        return jsonify({'success': False, 'error': 'Invalid granularity'}), 400
     try:
-        days = request.args.get('days', default=30, type=int)
-        if days is None or days <= 0:
-            days = 30
-        if days > 365:
-            days = 365
-        end_day = date.today()
-        start_day = end_day - timedelta(days=days-1)
-        # Fetch rows in range
-        rows = (
-            TimeLog.query
-            .filter(TimeLog.user_id == user_id)
-            .filter(TimeLog.day >= start_day)
-            .filter(TimeLog.day <= end_day)
-            .all()
-        )
-        by_day = {r.day: int(r.seconds or 0) for r in rows}
-        labels = []
-        series = []
-        cur = start_day
-        while cur <= end_day:
-            labels.append(cur.strftime('%Y-%m-%d'))
-            series.append(by_day.get(cur, 0))
-            cur += timedelta(days=1)
-        return jsonify({'success': True, 'labels': labels, 'series': series})
+        default_periods, max_periods = TIME_STATS_GRANULARITIES[granularity]
+        count_arg = 'days' if granularity == 'day' else 'periods'
+        periods = request.args.get(count_arg, default=default_periods, type=int)
+        if periods is None or periods <= 0:
+            periods = default_periods
+        periods = min(periods, max_periods)
+
+        return jsonify(_time_series_payload(user_id, granularity, periods))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -3268,9 +6379,26 @@ def handle_not_found(error):
     return render_template('404.html'), 404
 
 
+@app.errorhandler(_PasswordHashingBusy)
+def handle_password_hashing_busy(_error):
+    if request.path.startswith('/api'):
+        response = jsonify({'success': False, 'error': 'Server is busy, please retry shortly.'})
+    elif request.endpoint in ('login', 'signup'):
+        flash('Server is Busy. Please try Again Shortly')
+        response = app.make_response(render_template(f'auth/{request.endpoint}.html'))
+    else:
+        response = app.make_response(render_template('404.html'))
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
 @app.errorhandler(500)
 def handle_server_error(error):
     return render_template('404.html'), 500
 
+# Compile templates after every filter and global above is registered
+if TEMPLATE_WARMUP:
+    app.logger.info('Warmed %s templates', _precompile_templates())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import math
+import time
+
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+ALGORITHMS = ('scrypt', 'pbkdf2', 'bcrypt')
+
+# Cost units: log2(N) for scrypt, thousands of iterations for pbkdf2, log2 rounds for bcrypt.
+# The floors keep calibration on a slow host from producing weak hashes; the scrypt
+# ceiling bounds memory (128 * r * N bytes, 64 MB at 16) per concurrent hash.
+COST_LIMITS = {
+    'scrypt': (14, 16),
+    'pbkdf2': (200, 2000),
+    'bcrypt': (10, 14),
+}
+DEFAULT_COSTS = {
+    'scrypt': 15,
+    'pbkdf2': 600,
+    'bcrypt': 12,
+}
+# Costs that double the work per step, as opposed to pbkdf2 which scales linearly
+_EXPONENTIAL_COSTS = {'scrypt', 'bcrypt'}
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+# bcrypt only reads the first 72 bytes of a password
+_BCRYPT_MAX_BYTES = 72
+
+
+def _bcrypt_secret(password):
+    return password.encode('utf-8')[:_BCRYPT_MAX_BYTES]
+
+
+def hash_parameters(stored):
+    """
+    Return (algorithm, cost) for a stored hash, or None for a format this module does not produce
+    """
+    stored = stored or ''
+    if stored.startswith(BCRYPT_PREFIXES):
+        try:
+            return 'bcrypt', int(stored.split('$')[2])
+        except (IndexError, ValueError):
+            return None
+
+    method = stored.split('$', 1)[0]
+    parts = method.split(':')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 4:
+            n, r, p = (int(value) for value in parts[1:])
+            if r != 8 or p != 1:
+                return None
+            return 'scrypt', int(math.log2(n))
+        if parts[0] == 'pbkdf2' and len(parts) == 3 and parts[1] == 'sha256':
+            return 'pbkdf2', int(parts[2]) // 1000
+    except ValueError:
+        return None
+    return None
+
+
+def verify_password(stored, password):
+    """
+    Check a password against a bcrypt or werkzeug hash; malformed hashes never match
+    """
+    stored = stored or ''
+    if not stored:
+        return False
+
+    if stored.startswith(BCRYPT_PREFIXES):
+        try:
+            return bcrypt.checkpw(_bcrypt_secret(password), stored.encode('utf-8'))
+        except ValueError:
+            return False
+
+    if ':' in stored:
+        try:
+            return check_password_hash(stored, password)
+        except ValueError:
+            return False
+
+    return False
+
+
+class HashPolicy:
+    """
+    The algorithm and cost used for new password hashes
+    """
+
+    def __init__(self, algorithm='scrypt', cost=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+        low, high = COST_LIMITS[algorithm]
+        self.algorithm = algorithm
+        self.cost = min(high, max(low, cost if cost is not None else DEFAULT_COSTS[algorithm]))
+
+    def hash(self, password):
+        if self.algorithm == 'bcrypt':
+            return bcrypt.hashpw(_bcrypt_secret(password), bcrypt.gensalt(self.cost)).decode('utf-8')
+        if self.algorithm == 'scrypt':
+            method = f"scrypt:{2 ** self.cost}:8:1"
+        else:
+            method = f"pbkdf2:sha256:{self.cost * 1000}"
+        return generate_password_hash(password, method=method)
+
+    def needs_rehash(self, stored):
+        """
+        True when a hash uses another algorithm or a lower cost than this policy.
+
+        Higher costs are left alone so workers that calibrated slightly differently
+        do not keep rewriting each other's hashes.
+        """
+        parameters = hash_parameters(stored)
+        if parameters is None:
+            return True
+        algorithm, cost = parameters
+        return algorithm != self.algorithm or cost < self.cost
+
+    def describe(self):
+        return {'algorithm': self.algorithm, 'cost': self.cost}
+
+
+def calibrate_policy(algorithm, target_ms, samples=3, timer=time.perf_counter):
+    """
+    Pick the highest cost for `algorithm` whose hash time stays within `target_ms` on this host.
+
+    Times the cheapest allowed cost (best of `samples`) and extrapolates, so calibration
+    costs a few fast hashes rather than a search over expensive ones.
+    """
+    low, high = COST_LIMITS[algorithm]
+    probe = HashPolicy(algorithm, low)
+    best = None
+    for _ in range(max(1, samples)):
+        started = timer()
+        probe.hash('calibration-probe')
+        elapsed_ms = (timer() - started) * 1000
+        best = elapsed_ms if best is None else min(best, elapsed_ms)
+
+    if best <= 0:
+        return HashPolicy(algorithm, high)
+    ratio = target_ms / best
+    if algorithm in _EXPONENTIAL_COSTS:
+        cost = low + int(math.floor(math.log2(ratio))) if ratio >= 1 else low
+    else:
+        cost = int(low * ratio)
+    return HashPolicy(algorithm, cost)
@@ -956,18 +956,16 @@ document.addEventListener('DOMContentLoaded', () => {
                     .join('');
             };
 
-            fetch('/api/results')
+            fetch('/api/results?summary=1')
                 .then((resp) => resp.ok ? resp.json() : Promise.reject(resp))
                 .then((data) => {
-                    if (!data || !data.success || !Array.isArray(data.results)) {
+                    if (!data || !data.success || !data.summary) {
                         return;
                     }
-                    const counts = data.results.reduce((acc, row) => {
-                        const kind = (row.type || '').toString().toLowerCase();
-                        if (kind === 'quiz') acc.quiz += 1;
-                        else acc.interview += 1;
-                        return acc;
-                    }, { quiz: 0, interview: 0 });
+                    const counts = {
+                        quiz: Number(data.summary.quiz) || 0,
+                        interview: Number(data.summary.interview) || 0,
+                    };
                     donutChart.data.datasets[0].data = [counts.quiz, counts.interview];
                     donutChart.update();
                     renderLegend([counts.quiz, counts.interview]);